@@ -0,0 +1,99 @@
+"""Half-edge adjacency queries against scanning the index list.
+
+    python benchmarks/bench_halfedge.py [--model teapot.obj] [--queries 200]
+
+Times, on the model: building the half-edge structure, finding the faces
+around random vertices and the neighbors of random faces with it and by
+scanning every face, growing a selection ten steps from one face, and
+extruding the grown region. The extrusion updates the structure in place;
+the time to rebuild it from scratch afterwards is shown for comparison.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import headless
+
+from objects.halfedge import HalfEdgeMesh  # noqa: E402
+from objects.primatives import ImportedMesh  # noqa: E402
+
+
+def scan_vertex_faces(indices, v):
+    return [i // 3 for i, u in enumerate(indices) if u == v]
+
+
+def scan_face_neighbors(indices, f):
+    corners = set(indices[3 * f:3 * f + 3])
+    return [g for g in range(len(indices) // 3) if g != f and
+            len(corners & set(indices[3 * g:3 * g + 3])) >= 2]
+
+
+def median_us(query, items):
+    times = []
+    for item in items:
+        start = time.perf_counter()
+        query(item)
+        times.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(times)
+
+
+def timed_ms(call):
+    start = time.perf_counter()
+    result = call()
+    return result, (time.perf_counter() - start) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', default=os.path.join(headless.ROOT,
+                                                        'teapot.obj'))
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    mesh = ImportedMesh(args.model)
+    mesh.make_geometry_private()
+    indices = mesh.indices
+    halfedges, build = timed_ms(
+        lambda: HalfEdgeMesh(indices, len(mesh.vertices)))
+    face_count = len(indices) // 3
+    vertices = [rng.randrange(len(mesh.vertices))
+                for _ in range(args.queries)]
+    faces = [rng.randrange(face_count) for _ in range(args.queries)]
+
+    print(f'mesh            {len(mesh.vertices)} vertices, '
+          f'{face_count} triangles')
+    print(f'build           {build:.1f} ms')
+    # The scans are slow enough that a few queries give a stable median
+    fan = median_us(halfedges.vertex_faces, vertices)
+    fan_scan = median_us(lambda v: scan_vertex_faces(indices, v),
+                         vertices[:20])
+    neighbors = median_us(halfedges.face_neighbors, faces)
+    neighbors_scan = median_us(lambda f: scan_face_neighbors(indices, f),
+                               faces[:5])
+    print(f'vertex faces    {fan:.1f} us (scan {fan_scan:.0f} us)')
+    print(f'face neighbors  {neighbors:.1f} us '
+          f'(scan {neighbors_scan:.0f} us)')
+
+    def grow():
+        region = {faces[0]}
+        for _ in range(10):
+            region = halfedges.grow(region)
+        return region
+
+    region, grown = timed_ms(grow)
+    print(f'grow x10        {grown:.2f} ms ({len(region)} faces)')
+
+    mesh.selected_face = 3 * faces[0]
+    mesh.selected_region = region
+    mesh.halfedges  # build it so the extrusion updates it in place
+    _, extrude = timed_ms(mesh.start_extrude_selected_face)
+    _, rebuild = timed_ms(
+        lambda: HalfEdgeMesh(mesh.indices, len(mesh.vertices)))
+    print(f'extrude region  {extrude:.2f} ms (rebuild {rebuild:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Memory and time of the undo history over a long editing session.
+
+    python benchmarks/bench_history.py [--model teapot.obj] [--edits 1000]
+
+Plays back a scripted session on the model: vertex and face drags,
+extrusions and object moves, rotations and scales, each a gesture of several
+mouse moves recorded as one step. Reports the bytes the history keeps (edit
+data alone and with the Python objects holding it), the time spent starting
+and recording each step and the median time to undo and redo one, then
+undoes everything and checks the mesh is back where it started.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import headless
+
+from history import History  # noqa: E402
+
+
+def gestures(app, mesh, rng):
+    # Endless (name, setup) gestures cycling through every kind of edit
+    face_count = len(mesh.indices) // 3
+
+    def vertex():
+        app.edit_mode = True
+        mesh.selection_mode = 'vertex'
+        mesh.selected_vertex = rng.randrange(len(mesh.vertices))
+        app.transform_mode = 'move'
+
+    def face():
+        app.edit_mode = True
+        mesh.selection_mode = 'face'
+        mesh.selected_face = 3 * rng.randrange(1, face_count)
+        app.transform_mode = 'move'
+
+    def extrude():
+        app.edit_mode = True
+        mesh.selection_mode = 'face'
+        mesh.selected_face = 3 * rng.randrange(face_count)
+        app.transform_mode = None
+
+    def whole(mode):
+        def setup():
+            app.edit_mode = False
+            app.transform_mode = mode
+        return setup
+
+    kinds = [('vertex', vertex), ('face', face), ('extrude', extrude),
+             ('move', whole('move')), ('rotate', whole('rotate')),
+             ('scale', whole('scale'))]
+    while True:
+        for kind in kinds:
+            yield kind
+
+
+def footprint(history):
+    # Bytes of every object the history keeps, containers included
+    def size(value):
+        total = sys.getsizeof(value)
+        if isinstance(value, tuple):
+            total += sum(size(item) for item in value)
+        return total
+
+    edits = list(history.undo_stack) + history.redo_stack
+    return sum(sys.getsizeof(edit) +
+               sum(size(getattr(edit, name)) for name in edit.__slots__
+                   if name != 'mesh')
+               for edit in edits)
+
+
+def state(mesh):
+    return (np.array(mesh.vertices, dtype=float),
+            np.array(mesh.indices), np.array(mesh.transform_matrix))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', default=os.path.join(headless.ROOT,
+                                                        'teapot.obj'))
+    parser.add_argument('--edits', type=int, default=1000)
+    parser.add_argument('--moves', type=int, default=5,
+                        help='mouse moves per gesture')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    app = headless.make_app()
+    app.axis_constraint = None
+    mesh = headless.make_scene(app, args.model)
+    start = state(mesh)
+
+    history = History(limit=args.edits)
+    record = []
+    kinds = gestures(app, mesh, rng)
+    for _ in range(args.edits):
+        name, setup = next(kinds)
+        setup()
+        tick = time.perf_counter()
+        history.begin(mesh)
+        record.append((time.perf_counter() - tick) * 1e3)
+        if name == 'extrude':
+            mesh.start_extrude_selected_face()
+        for _ in range(args.moves):
+            dx, dy = rng.uniform(-5, 5), rng.uniform(-5, 5)
+            if name == 'extrude':
+                mesh.update_extrusion(app, dy)
+            else:
+                mesh.transform(app, dx, dy)
+        if name == 'extrude':
+            mesh.finish_extrusion()
+        tick = time.perf_counter()
+        history.end()
+        record[-1] += (time.perf_counter() - tick) * 1e3
+
+    print(f'mesh          {len(mesh.vertices)} vertices, '
+          f'{len(mesh.indices) // 3} triangles')
+    print(f'steps         {len(history.undo_stack)}')
+    print(f'edit data     {history.nbytes() / 1024:.1f} KB')
+    print(f'with objects  {footprint(history) / 1024:.1f} KB')
+    print(f'record        {statistics.median(record):.2f} ms per step')
+
+    undo = []
+    while history.undo_stack:
+        tick = time.perf_counter()
+        history.undo()
+        undo.append((time.perf_counter() - tick) * 1e6)
+    restored = all(np.array_equal(a, b) for a, b in zip(state(mesh), start))
+
+    redo = []
+    while history.redo_stack:
+        tick = time.perf_counter()
+        history.redo()
+        redo.append((time.perf_counter() - tick) * 1e6)
+
+    print(f'undo          {statistics.median(undo):.0f} us per step')
+    print(f'redo          {statistics.median(redo):.0f} us per step')
+    print(f'restored      {restored}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Instanced cubes against separate meshes and one merged mesh.
+
+    python benchmarks/bench_instancing.py [--count 1000] [--frames 30]
+
+Draws the same block of cubes three ways on a camera orbit: one Cube object
+per cube, one InstancedMesh with an instance per cube, and a single Mesh
+holding every cube's triangles. Reports the median frame time of each with
+draw calls going to a NullBackend, so the numbers are the transform,
+shading and triangle setup cost.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import headless
+
+from objects.mesh import Mesh  # noqa: E402
+from objects.primatives import Cube  # noqa: E402
+from objects.lights import PointLight  # noqa: E402
+from objects.instanced_mesh import InstancedMesh, grid_transforms  # noqa
+
+
+def separate(transforms):
+    meshes = []
+    for matrix in transforms:
+        cube = Cube(0.25)
+        cube.transform_matrix = matrix.tolist()
+        meshes.append(cube)
+    return meshes
+
+
+def merged(transforms):
+    cube = Cube(0.25)
+    vertices = np.asarray(cube.vertices, dtype=float)
+    faces = np.asarray(cube.indices).reshape(-1, 3)
+    stacked = (vertices @ transforms.transpose(0, 2, 1)).reshape(-1, 4)
+    indices = (faces[None] + len(vertices) *
+               np.arange(len(transforms))[:, None, None]).reshape(-1)
+    return [Mesh(stacked.tolist(), indices.tolist())]
+
+
+def instanced(transforms):
+    return [InstancedMesh(Cube(0.25), transforms)]
+
+
+def median_ms(objects, frames, width, height, raster):
+    app = headless.make_app(width, height)
+    app.use_rasterizer = raster
+    app.world.add_object(PointLight(10))
+    for obj in objects:
+        app.world.add_object(obj)
+    app.world.render(app)  # first-use caches
+
+    times = []
+    for _ in range(frames):
+        app.camera.orbit(628 / frames, 0)
+        start = time.perf_counter()
+        app.world.render(app)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), len(app.world.triangles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, default=1000,
+                        help='number of cubes, rounded down to a cube')
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--size', default='1250x800',
+                        help='framebuffer as WIDTHxHEIGHT')
+    parser.add_argument('--raster', action='store_true',
+                        help='use the depth-buffered rasterizer')
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split('x'))
+    side = round(args.count ** (1 / 3))
+    transforms = grid_transforms((side, side, side), 0.5)
+    print(f'{len(transforms)} cubes at {width}x{height}')
+
+    print(f'{"":<12}{"frame":>11}{"drawn":>8}')
+    for name, build in (('separate', separate), ('instanced', instanced),
+                        ('merged', merged)):
+        ms, drawn = median_ms(build(transforms), args.frames, width, height,
+                              args.raster)
+        print(f'{name:<12}{ms:>9.2f}ms{drawn:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Microbenchmark of the matrix helpers against the nested-list originals.
+
+    python benchmarks/bench_matrix.py [--number 20000] [--points 10000]
+
+Times the operations the camera, the gizmo and object transforms run on
+every mouse event and frame: a 4x4 product, building a rotation, rotating
+an object's transform, the camera's look-at and projection-view update,
+the normal matrix and an inverse, once with the original nested-list code
+(copied below) and once with Matrix4. Transforming a block of points is
+compared against two matrix-vector products per point.
+"""
+import argparse
+import math
+import random
+import timeit
+
+import numpy as np
+
+import headless
+
+from matrix_util import *  # noqa: E402,F403
+
+
+def legacy_matrix_multiply(a, b):
+    result = []
+    for i in range(4):
+        row = []
+        for j in range(4):
+            sum = 0
+            for k in range(4):
+                sum += a[i][k] * b[k][j]
+            row.append(sum)
+        result.append(row)
+    return result
+
+
+def legacy_matrix_vector_multiply(matrix, vector):
+    result = []
+    for i in range(4):
+        sum = 0
+        for j in range(4):
+            sum += matrix[i][j] * vector[j]
+        result.append(sum)
+    return result
+
+
+def legacy_dot(a, b):
+    return sum([a[i] * b[i] for i in range(len(a))])
+
+
+def legacy_rotation_matrix(angle, axis):
+    def rotation_x(angle):
+        c = math.cos(angle)
+        s = math.sin(angle)
+        return [[1, 0, 0, 0], [0, c, -s, 0], [0, s, c, 0], [0, 0, 0, 1]]
+
+    def rotation_y(angle):
+        c = math.cos(angle)
+        s = math.sin(angle)
+        return [[c, 0, s, 0], [0, 1, 0, 0], [-s, 0, c, 0], [0, 0, 0, 1]]
+
+    def rotation_z(angle):
+        c = math.cos(angle)
+        s = math.sin(angle)
+        return [[c, -s, 0, 0], [s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]
+
+    x, y, z = normalize(axis)
+    return legacy_matrix_multiply(
+        rotation_z(angle * z),
+        legacy_matrix_multiply(rotation_y(angle * y), rotation_x(angle * x)))
+
+
+def legacy_look_at(perspective, position, target, up):
+    z = normalize(subtract(position, target))
+    x = normalize(cross(up, z))
+    y = cross(z, x)
+    view = [
+        [x[0], x[1], x[2], -legacy_dot(x, position)],
+        [y[0], y[1], y[2], -legacy_dot(y, position)],
+        [z[0], z[1], z[2], -legacy_dot(z, position)],
+        [0, 0, 0, 1]
+    ]
+    return legacy_matrix_multiply(perspective, view)
+
+
+def look_at(perspective, position, target, up):
+    return (Matrix4.from_rows(perspective) @
+            Matrix4.look_at(position, target, up)).rows()
+
+
+def legacy_transform_points(projection_view, model, points):
+    return [legacy_matrix_vector_multiply(
+        projection_view, legacy_matrix_vector_multiply(model, v))
+        for v in points]
+
+
+def transform_points(projection_view, model, points):
+    return (Matrix4.from_rows(projection_view) @
+            Matrix4.from_rows(model)).transform_points(points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=20000,
+                        help='calls per small operation')
+    parser.add_argument('--points', type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    app = headless.make_app()
+    perspective = app.camera.perspective_matrix
+    model = Matrix4.trs([1, 2, 3], 0.7, [1, 2, 0.5], [2, 1, 1]).rows()
+    other = Matrix4.trs([-1, 0, 2], 1.3, [0, 1, 1], [1, 3, 1]).rows()
+    axis = [0.3, 0.5, 0.8]
+    position = [3, 2, 5]
+    points = [[rng.uniform(-1, 1) for _ in range(3)] + [1]
+              for _ in range(args.points)]
+    point_array = np.array(points)
+
+    cases = [
+        ('4x4 product',
+         lambda: legacy_matrix_multiply(model, other),
+         lambda: matrix_multiply(model, other)),
+        ('rotation matrix',
+         lambda: legacy_rotation_matrix(0.7, axis),
+         lambda: rotation_matrix(0.7, axis)),
+        ('rotate transform',
+         lambda: legacy_matrix_multiply(legacy_rotation_matrix(0.7, axis),
+                                        model),
+         lambda: Matrix4.from_rows(model).rotated(0.7, axis).rows()),
+        ('look-at',
+         lambda: legacy_look_at(perspective, position, [0, 0, 0],
+                                [0, 1, 0]),
+         lambda: look_at(perspective, position, [0, 0, 0], [0, 1, 0])),
+        ('normal matrix',
+         lambda: np.linalg.inv(np.array(model, dtype=float)[:3, :3]).T,
+         lambda: normal_matrix(model)),
+        ('inverse',
+         lambda: np.linalg.inv(np.array(model, dtype=float)),
+         lambda: Matrix4.from_rows(model).inverse()),
+    ]
+
+    print(f'{"operation":<20}{"before":>12}{"after":>12}{"speedup":>10}')
+    for name, before, after in cases:
+        old = min(timeit.repeat(before, number=args.number, repeat=3))
+        new = min(timeit.repeat(after, number=args.number, repeat=3))
+        print(f'{name:<20}{old / args.number * 1e6:>10.2f}us'
+              f'{new / args.number * 1e6:>10.2f}us{old / new:>9.1f}x')
+
+    # Points go through the legacy pair of products per vertex and through
+    # one combined matrix applied to the whole array
+    old = min(timeit.repeat(
+        lambda: legacy_transform_points(perspective, model, points),
+        number=1, repeat=3))
+    new = min(timeit.repeat(
+        lambda: transform_points(perspective, model, point_array),
+        number=1, repeat=3))
+    print(f'{f"{args.points} points":<20}{old * 1e3:>10.2f}ms'
+          f'{new * 1e3:>10.2f}ms{old / new:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Compare OBJ loading times for the bundled models.
+
+    python benchmarks/bench_obj_loader.py [model.obj ...]
+
+For each model this times the original line-by-line loader, a cold parse
+with the bulk loader, the import-time mesh optimization, writing the binary
+cache, and a warm load from the cache. The cache is written to a temporary
+directory.
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from objects import obj_loader  # noqa: E402
+from objects.mesh_optimizer import optimize_mesh  # noqa: E402
+
+MODELS = ['sphere.obj', 'suzanne.obj', 'teapot.obj']
+
+
+def legacy_load_obj(file_path):
+    # The loader ImportedMesh used before objects/obj_loader.py
+    vertices = []
+    indices = []
+
+    with open(file_path, 'r') as f:
+        for line in f:
+            if line.startswith('v '):  # vertices
+                parts = line.strip().split()
+                x, y, z = map(float, parts[1:4])
+                # Add homogeneous coordinate w=1
+                vertices.append([x, y, z, 1])
+            elif line.startswith('f '):  # face info/indices
+                parts = line.strip().split()
+                # obj file indices start from 1 so we subtract 1
+                face_indices = [int(part.split('/')[0]) -
+                                1 for part in parts[1:]]
+                if len(face_indices) == 3:
+                    indices.extend(face_indices)
+                elif len(face_indices) > 3:
+                    raise ValueError(
+                        'Only triangles are supported for now')
+    return vertices, indices
+
+
+def best_of(func, repeat):
+    # Best wall time in milliseconds over a few runs
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    models = sys.argv[1:] or [os.path.join(ROOT, m) for m in MODELS]
+    repeat = 5
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print(f'{"model":<14}{"faces":>8}{"legacy":>11}{"cold":>11}'
+              f'{"optimize":>11}{"write":>11}{"warm":>11}{"speedup":>9}')
+        for model in models:
+            cache = os.path.join(cache_dir, os.path.basename(model) + '.geom')
+            vertices, indices = obj_loader.parse_obj(model)
+
+            legacy = best_of(lambda: legacy_load_obj(model), repeat)
+            cold = best_of(lambda: obj_loader.parse_obj(model), repeat)
+            optimize = best_of(lambda: optimize_mesh(vertices, indices),
+                               repeat)
+            write = best_of(lambda: obj_loader.write_cache(
+                cache, vertices, indices), repeat)
+            warm = best_of(lambda: obj_loader.read_cache(cache), repeat)
+
+            print(f'{os.path.basename(model):<14}{len(indices) // 3:>8}'
+                  f'{legacy:>9.2f}ms{cold:>9.2f}ms{optimize:>9.2f}ms'
+                  f'{write:>9.2f}ms'
+                  f'{warm:>9.2f}ms{legacy / warm:>8.0f}x')
+
+
+if __name__ == '__main__':
+    main()
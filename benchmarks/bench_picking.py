@@ -0,0 +1,91 @@
+"""Object picking time against the number of objects in the scene.
+
+    python benchmarks/bench_picking.py [--counts 10 100 1000] [--clicks 200]
+
+Scatters cubes of random size, position and rotation in front of the camera
+and clicks the centers of random cubes. Reports the median time per click
+of the world-space ray picker (scene BVH, then the triangles of the objects
+the ray reaches) and of the old screen-space bounding box loop, and how
+often the two pick different objects. The box loop picks the last object
+whose screen bounds contain the click, which is often not the one in front.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import headless
+
+from matrix_util import *  # noqa: E402,F403
+from objects.primatives import Cube  # noqa: E402
+from objects.lights import PointLight  # noqa: E402
+
+
+def scatter(app, count, seed=0):
+    rng = random.Random(seed)
+    app.world.add_object(PointLight(10))
+    spread = count ** (1 / 3) * 1.5
+    for _ in range(count):
+        cube = Cube(rng.uniform(0.2, 1.0))
+        cube.apply_rotation(rng.uniform(0, 6.28),
+                            normalize([rng.uniform(-1, 1) for _ in range(3)]))
+        cube.apply_translation([rng.uniform(-spread, spread)
+                                for _ in range(3)])
+        app.world.add_object(cube)
+    app.camera.radius = spread * 4
+    app.camera.orbit(0, 0)
+
+
+def box_pick(app, x, y):
+    # The selection loop picking replaced
+    for obj in reversed(app.world.objects):
+        if obj.is_selectable and obj.check_selection(x, y):
+            return obj
+    return None
+
+
+def median_us(pick, clicks):
+    times = []
+    picked = []
+    for x, y in clicks:
+        start = time.perf_counter()
+        picked.append(pick(x, y))
+        times.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(times), picked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--counts', type=int, nargs='+',
+                        default=[10, 100, 1000])
+    parser.add_argument('--clicks', type=int, default=200)
+    parser.add_argument('--size', default='1250x800',
+                        help='framebuffer as WIDTHxHEIGHT')
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split('x'))
+    rng = random.Random(1)
+
+    print(f'{"objects":>8}{"ray":>12}{"boxes":>12}{"differ":>8}')
+    for count in args.counts:
+        app = headless.make_app(width, height)
+        scatter(app, count)
+        app.world.render(app)  # screen coordinates for the box loop
+        app.world.pick(app, 0, 0)  # build the scene BVH
+
+        # Clicks on the projected centers of random cubes
+        cubes = [obj for obj in app.world.objects if isinstance(obj, Cube)]
+        clicks = [cube.screen_array[:, :2].mean(axis=0).tolist()
+                  for cube in rng.choices(cubes, k=args.clicks)]
+
+        ray_us, ray_picked = median_us(
+            lambda x, y: app.world.pick(app, x, y), clicks)
+        box_us, box_picked = median_us(
+            lambda x, y: box_pick(app, x, y), clicks)
+        differ = sum((hit[0] if hit else None) is not obj
+                     for hit, obj in zip(ray_picked, box_picked))
+        print(f'{count:>8}{ray_us:>10.0f}us{box_us:>10.0f}us{differ:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Batched geometric predicates against the per-triangle Python loops.
+
+    python benchmarks/bench_predicates.py [--model teapot.obj] [--points 20]
+
+Projects the model and times, once with the original per-triangle code
+(copied below) and once with the batched kernels in matrix_util: testing a
+screen point against every projected triangle, the area of every projected
+triangle and the object-space face normals. The point tests also count how
+often the two disagree, on the model and on random triangles millions of
+pixels across, as faces reaching past the camera project to, where the
+original's fixed area tolerance breaks down. Finally it times cutting the
+grid's lines to the window.
+"""
+import argparse
+import os
+import random
+import timeit
+
+import numpy as np
+
+import headless
+
+from matrix_util import *  # noqa: E402,F403
+
+
+def legacy_point_in_triangle(px, py, v1, v2, v3):
+    total_area = tri_area(v1[0], v1[1], v2[0], v2[1], v3[0], v3[1])
+    area1 = tri_area(px, py, v2[0], v2[1], v3[0], v3[1])
+    area2 = tri_area(v1[0], v1[1], px, py, v3[0], v3[1])
+    area3 = tri_area(v1[0], v1[1], v2[0], v2[1], px, py)
+    return abs(total_area - (area1 + area2 + area3)) < 0.0001
+
+
+def legacy_hits(x, y, tris):
+    return [i for i, (v0, v1, v2) in enumerate(tris)
+            if legacy_point_in_triangle(x, y, v0, v1, v2)]
+
+
+def legacy_areas(tris):
+    return [tri_area(v0[0], v0[1], v1[0], v1[1], v2[0], v2[1])
+            for v0, v1, v2 in tris]
+
+
+def legacy_normals(vertices, indices):
+    normals = []
+    for i in range(0, len(indices), 3):
+        v0 = vertices[indices[i]]
+        v1 = vertices[indices[i+1]]
+        v2 = vertices[indices[i+2]]
+        normals.append(cross(subtract(v1, v0), subtract(v2, v0)))
+    return normals
+
+
+def disagreements(points, tris):
+    # Points the original and the edge-function test classify differently
+    new = points_in_triangles(points, tris)
+    old = [legacy_point_in_triangle(p[0], p[1], *t)
+           for p, t in zip(points.tolist(), tris.tolist())]
+    return int(np.count_nonzero(new != np.array(old)))
+
+
+def best_ms(call, number=1):
+    return min(timeit.repeat(call, number=number, repeat=3)) / number * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', default=os.path.join(headless.ROOT,
+                                                        'teapot.obj'))
+    parser.add_argument('--points', type=int, default=20,
+                        help='screen points tested against every triangle')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    app = headless.make_app()
+    mesh = headless.make_scene(app, args.model)
+    mesh.update_screen_coords(app)
+    screen = mesh.screen_array[:, :2]
+    tris = screen[mesh.face_array]
+    tri_lists = tris.tolist()
+    points = [(rng.uniform(0, app.width), rng.uniform(0, app.height))
+              for _ in range(args.points)]
+
+    print(f'mesh            {len(mesh.vertices)} vertices, '
+          f'{len(tris)} triangles')
+    print(f'{"operation":<16}{"before":>12}{"after":>12}{"speedup":>10}')
+    cases = [
+        ('point in tris',
+         lambda: [legacy_hits(x, y, tri_lists) for x, y in points],
+         lambda: [np.nonzero(points_in_triangles((x, y), tris))[0]
+                  for x, y in points], len(points)),
+        ('triangle areas', lambda: legacy_areas(tri_lists),
+         lambda: triangle_areas(tris), 1),
+        ('face normals',
+         lambda: legacy_normals(mesh.vertices, mesh.indices),
+         lambda: triangle_normals(mesh.vertex_array, mesh.face_array), 1),
+    ]
+    for name, before, after, calls in cases:
+        old = best_ms(before) / calls
+        new = best_ms(after) / calls
+        print(f'{name:<16}{old:>10.3f}ms{new:>10.3f}ms{old / new:>9.0f}x')
+
+    model = disagreements(np.repeat(np.array(points), len(tris) // len(
+        points) + 1, axis=0)[:len(tris)], tris)
+    # Sums of areas this large round off by more than the tolerance
+    gen = np.random.default_rng(0)
+    big = gen.uniform(-1e6, 1e6, (20000, 3, 2))
+    big_points = gen.uniform(-1e6, 1e6, (20000, 2))
+    print(f'disagreements   {model} on the model, '
+          f'{disagreements(big_points, big)} of 20000 large triangles')
+
+    grid = next(obj for obj in app.world.objects
+                if getattr(obj, 'layer', None) == 'grid')
+    grid.update_screen_coords(app)
+    clip = best_ms(lambda: grid.visible_lines(app), 100)
+    print(f'grid clipping   {clip:.3f} ms for {len(grid.indices) // 2} lines')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Headless render benchmark over the bundled models.
+
+    python benchmarks/bench_render.py [--frames 120] [--save-baseline]
+
+Renders sphere.obj, suzanne.obj and teapot.obj through World.render on a
+scripted camera orbit with the NumPy vertex pipeline, the pure-Python
+fallback, the depth-buffered rasterizer and the NumPy pipeline with levels
+of detail, with draw calls going to a NullBackend instead of a cmu_graphics
+window. Only the lod case lets meshes drop to a coarser level, and it
+orbits far enough out that they do. Every case runs --repeat times and
+keeps its fastest run. Reports vertices/sec, triangles/sec and per-stage
+times, and compares frame times against the JSON baseline. Exits with
+status 1 if any frame time is still more than --threshold slower after
+being measured again --retries times.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import headless
+
+from objects.mesh import Mesh  # noqa: E402
+from profiler import profiler  # noqa: E402
+
+MODELS = ['sphere.obj', 'suzanne.obj', 'teapot.obj']
+BASELINE = os.path.join(headless.ROOT, 'benchmarks', 'baselines',
+                        'render.json')
+# Far enough that the orbit's zoom in still keeps a coarse level
+LOD_DISTANCE = 2.5
+
+
+def run_case(model, use_numpy, raster, lod, frames, width, height):
+    Mesh.use_numpy = use_numpy
+    app = headless.make_app(width, height)
+    app.use_rasterizer = raster
+    if not lod:
+        app.lod_pixel_error = 0
+    mesh = headless.make_scene(app, os.path.join(headless.ROOT, model))
+
+    # One untimed frame so file loading and first-use caches don't count
+    app.world.render(app)
+    if lod:
+        pull_back(app, mesh)
+        app.world.render(app)
+
+    profiler.enabled = True
+    profiler.reset()
+    app.backend.calls.clear()
+    triangles = 0
+    levels = 0
+
+    start = time.perf_counter()
+    for d_azimuth, d_elevation, d_zoom in headless.orbit_script(frames):
+        if d_zoom:
+            app.camera.zoom(app, d_zoom)
+        app.camera.orbit(d_azimuth, d_elevation)
+
+        profiler.begin_frame()
+        app.world.render(app)
+        profiler.end_frame()
+        triangles += len(app.world.triangles)
+        levels += mesh.lod.index if mesh.lod is not None else 0
+    elapsed = time.perf_counter() - start
+    profiler.enabled = False
+
+    return {
+        'frames': frames,
+        'vertices': len(mesh.vertices),
+        'faces': len(mesh.indices) // 3,
+        'vertices_per_sec': len(mesh.vertices) * frames / elapsed,
+        'triangles_per_sec': len(mesh.indices) // 3 * frames / elapsed,
+        'drawn_triangles_per_frame': triangles / frames,
+        'draw_calls_per_frame': sum(app.backend.calls.values()) / frames,
+        'lod_level_per_frame': levels / frames,
+        'frame_ms': dict(zip(('p50', 'p95', 'p99'),
+                             profiler.percentiles('frame'))),
+        'stages_p50_ms': {stage: profiler.percentiles(stage)[0]
+                          for stage in profiler.stages()
+                          if stage != 'frame'},
+    }
+
+
+def pull_back(app, mesh):
+    # Move the camera out to LOD_DISTANCE times the distance at which the
+    # mesh's first coarse level fits in app.lod_pixel_error. Closer than
+    # that the bundled models are always drawn in full.
+    error = mesh.asset.lods[1].error * mesh.pixels_per_unit(app)
+    app.camera.radius *= LOD_DISTANCE * error / app.lod_pixel_error
+    app.camera.orbit(0, 0)
+
+
+def best_run(runs):
+    # The run with the lowest p50 frame time, the one least disturbed by
+    # whatever else the machine was doing
+    return min(runs, key=lambda run: run['frame_ms']['p50'])
+
+
+def change(result, old_result):
+    # Relative change in p50 frame time, positive when slower
+    old = old_result['frame_ms']['p50']
+    new = result['frame_ms']['p50']
+    return (new - old) / old if old else 0.0
+
+
+def slower(results, baseline, threshold):
+    # Names of cases more than threshold slower than the baseline
+    return [name for name, result in results.items()
+            if name in baseline and
+            change(result, baseline[name]) > threshold]
+
+
+def compare(results, baseline, threshold):
+    # Returns the names of cases whose p50 frame time regressed
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]['frame_ms']['p50']
+        new = result['frame_ms']['p50']
+        delta = change(result, baseline[name])
+        status = 'ok'
+        if delta > threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        print(f'  {name:<24} {old:8.2f}ms -> {new:8.2f}ms '
+              f'({delta:+.0%}) {status}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--models', nargs='+', default=MODELS)
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case, the fastest one is kept')
+    parser.add_argument('--size', default='1250x800',
+                        help='viewport as WIDTHxHEIGHT')
+    parser.add_argument('--no-python', action='store_true',
+                        help='skip the pure-Python fallback path')
+    parser.add_argument('--no-raster', action='store_true',
+                        help='skip the rasterizer path')
+    parser.add_argument('--no-lod', action='store_true',
+                        help='skip the level of detail path')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed p50 frame time increase (0.25 = 25%%)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='times a case that looks regressed is '
+                        'measured again before it fails the check')
+    parser.add_argument('--output', help='also write results to this file')
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split('x'))
+    paths = [('numpy', True, False, False)]
+    if not args.no_python:
+        paths.append(('python', False, False, False))
+    if not args.no_raster:
+        paths.append(('raster', True, True, False))
+    if not args.no_lod:
+        paths.append(('lod', True, False, True))
+
+    cases = {f'{os.path.splitext(model)[0]}/{path_name}':
+             (model, use_numpy, raster, lod)
+             for model in args.models
+             for path_name, use_numpy, raster, lod in paths}
+
+    def measure(name):
+        return best_run([run_case(*cases[name], args.frames, width, height)
+                         for _ in range(args.repeat)])
+
+    results = {}
+    for name in cases:
+        result = results[name] = measure(name)
+        stages = ', '.join(f'{stage} {ms:.2f}' for stage, ms
+                           in result['stages_p50_ms'].items())
+        print(f'{name:<18} p50 {result["frame_ms"]["p50"]:7.2f}ms  '
+              f'p95 {result["frame_ms"]["p95"]:7.2f}ms  '
+              f'{result["vertices_per_sec"] / 1e6:6.2f}M verts/s  '
+              f'{result["triangles_per_sec"] / 1e6:6.2f}M tris/s')
+        print(f'{"":<18} stages p50 ms: {stages}')
+
+    report = {
+        'machine': {'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'processor': platform.processor()},
+        'settings': {'frames': args.frames, 'size': args.size,
+                     'repeat': args.repeat},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline found, run with --save-baseline to create one')
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+
+    # Frame times on a busy machine can jump by half for seconds at a
+    # time, so a case only fails if it is still slow when measured again
+    for _ in range(args.retries):
+        retry = slower(results, baseline, args.threshold)
+        if not retry:
+            break
+        print(f'Measuring {", ".join(retry)} again')
+        for name in retry:
+            results[name] = best_run([results[name], measure(name)])
+
+    print(f'Compared to {args.baseline}:')
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f'{len(regressions)} case(s) regressed by more than '
+              f'{args.threshold:.0%}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Saving and opening .pyprism scene files.
+
+    python benchmarks/bench_scene.py [--meshes 50] [--edited 10]
+
+Builds a scene of --meshes models (suzanne, sphere and teapot in turn,
+each moved somewhere else), of which --edited have their own edited copy
+of the geometry, plus a block of instanced cubes. Times saving it and
+opening it, and for comparison loading the models' geometry from the OBJ
+files, both by parsing the text and from the geometry cache (which doesn't
+restore edits or transforms). Checks the opened scene matches the saved
+one. Then moves one mesh and edits another and times saving again, which
+only appends what changed.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import headless
+
+from objects import obj_loader  # noqa: E402
+from objects.primatives import CubeArray, ImportedMesh  # noqa: E402
+from scene_file import SceneFile  # noqa: E402
+
+MODELS = ['suzanne.obj', 'sphere.obj', 'teapot.obj']
+
+
+def timed_ms(call):
+    start = time.perf_counter()
+    result = call()
+    return result, (time.perf_counter() - start) * 1e3
+
+
+def build(app, count, edited, rng):
+    meshes = []
+    for i in range(count):
+        mesh = ImportedMesh(os.path.join(headless.ROOT,
+                                         MODELS[i % len(MODELS)]))
+        mesh.apply_translation([rng.uniform(-5, 5) for _ in range(3)])
+        if i < edited:
+            mesh.make_geometry_private()
+            mesh.vertices[0][1] += 0.5
+            mesh.mark_geometry_dirty()
+        app.world.add_object(mesh)
+        meshes.append(mesh)
+    app.world.add_object(CubeArray((5, 5, 5)))
+    return meshes
+
+
+def rebuild(count, use_cache):
+    # Geometry of the models from their OBJ files, each file loaded once
+    loaded = []
+    geometry = {}
+    for i in range(count):
+        path = os.path.join(headless.ROOT, MODELS[i % len(MODELS)])
+        if path not in geometry:
+            geometry[path] = obj_loader.load_obj(path, use_cache=use_cache)
+        loaded.append(geometry[path])
+    return loaded
+
+
+def snapshot(app):
+    return [(type(obj).__name__, np.asarray(obj.vertices, dtype=float),
+             np.asarray(obj.transform_matrix, dtype=float))
+            for obj in app.world.objects if hasattr(obj, 'transform_matrix')
+            and hasattr(obj, 'asset')]
+
+
+def same(a, b):
+    return len(a) == len(b) and all(
+        x[0] == y[0] and np.array_equal(x[1], y[1]) and
+        np.array_equal(x[2], y[2]) for x, y in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--meshes', type=int, default=50)
+    parser.add_argument('--edited', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    app = headless.make_app()
+    headless.make_scene(app, os.path.join(headless.ROOT, 'suzanne.obj'))
+    meshes = build(app, args.meshes, args.edited, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'scene.pyprism')
+        scene = SceneFile(path)
+        written, save = timed_ms(lambda: scene.save(app))
+        print(f'scene           {len(app.world.objects)} objects, '
+              f'{os.path.getsize(path) / 1024:.0f} KB')
+        print(f'save            {save:.1f} ms ({written / 1024:.0f} KB)')
+
+        opened = headless.make_app()
+        _, load = timed_ms(lambda: SceneFile(path).load(opened))
+        _, parse = timed_ms(lambda: rebuild(args.meshes, use_cache=False))
+        _, cached = timed_ms(lambda: rebuild(args.meshes, use_cache=True))
+        print(f'open            {load:.1f} ms (parse OBJ {parse:.0f} ms, '
+              f'geometry cache {cached:.1f} ms)')
+        print(f'matches         {same(snapshot(app), snapshot(opened))}')
+
+        meshes[-1].apply_translation([0, 1, 0])
+        written, move = timed_ms(lambda: scene.save(app))
+        print(f'save after move {move:.1f} ms ({written / 1024:.1f} KB)')
+        mesh = meshes[0]
+        mesh.vertices[1][1] += 0.5
+        mesh.mark_geometry_dirty()
+        written, edit = timed_ms(lambda: scene.save(app))
+        print(f'save after edit {edit:.1f} ms ({written / 1024:.1f} KB)')
+
+
+if __name__ == '__main__':
+    main()
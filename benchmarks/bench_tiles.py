@@ -0,0 +1,85 @@
+"""Scaling of the tile-parallel rasterizer with worker count.
+
+    python benchmarks/bench_tiles.py [--model teapot.obj] [--max-workers N]
+
+Renders the model's triangle buffer over a short camera orbit with the
+single-process Rasterizer, then with TiledRasterizer for 1 to N workers and
+each tile size, and reports the median frame time and the speedup over the
+single-process rasterizer. Worker counts above the number of cores can't
+scale.
+"""
+import argparse
+import os
+import statistics
+import time
+
+import headless
+
+from rendering.rasterizer import Rasterizer  # noqa: E402
+from rendering.tiled_rasterizer import TiledRasterizer  # noqa: E402
+
+
+def capture_frames(model, frames, width, height):
+    # Triangle buffers of a turntable around the model, copied so they can
+    # be replayed through every rasterizer
+    app = headless.make_app(width, height)
+    app.use_rasterizer = True
+    headless.make_scene(app, os.path.join(headless.ROOT, model))
+
+    buffers = []
+    for _ in range(frames):
+        app.camera.orbit(628 / frames, 0)
+        app.world.render(app)
+        buffer = type(app.world.triangles)()
+        for column in vars(buffer):
+            getattr(buffer, column).extend(
+                getattr(app.world.triangles, column))
+        buffers.append(buffer)
+    return buffers
+
+
+def median_ms(rasterizer, buffers):
+    rasterizer.draw_buffer(buffers[0])  # warm up workers and allocations
+    times = []
+    for buffer in buffers:
+        start = time.perf_counter()
+        rasterizer.draw_buffer(buffer)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', default='teapot.obj')
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--size', default='1920x1080',
+                        help='framebuffer as WIDTHxHEIGHT')
+    parser.add_argument('--max-workers', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('--tile-sizes', type=int, nargs='+',
+                        default=[64, 128, 256])
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split('x'))
+    buffers = capture_frames(args.model, args.frames, width, height)
+    print(f'{args.model} at {width}x{height}, {len(buffers[0])} triangles, '
+          f'{os.cpu_count()} cores')
+
+    single = median_ms(Rasterizer(width, height), buffers)
+    print(f'{"single process":<20}{single:9.2f}ms')
+
+    workers = sorted({1, 2, 4, 8, 16, 32, 64, args.max_workers} &
+                     set(range(1, args.max_workers + 1)))
+    print(f'{"tile":>6}{"workers":>9}{"frame":>11}{"speedup":>9}')
+    for tile_size in args.tile_sizes:
+        for count in workers:
+            rasterizer = TiledRasterizer(width, height, tile_size, count)
+            try:
+                ms = median_ms(rasterizer, buffers)
+            finally:
+                rasterizer.close()
+            print(f'{tile_size:>6}{count:>9}{ms:>9.2f}ms{single / ms:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Helpers for running scenes without a cmu_graphics window.
+
+Importing this module puts src/ on sys.path. Scenes made with make_app()
+draw to a NullBackend unless another backend is passed in, so nothing
+needs a window.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+
+def make_app(width=1250, height=800, backend=None):
+    # Same camera as the interactive app, drawing to a NullBackend
+    import batch_render
+    from rendering.backends import NullBackend
+
+    return batch_render.make_app(width, height, backend or NullBackend())
+
+
+def make_scene(app, model_path):
+    # Same objects as onAppStart with the given model instead of suzanne
+    from objects.primatives import Grid, ImportedMesh
+    from objects.lights import PointLight
+    from objects.gizmo import Gizmo
+
+    mesh = ImportedMesh(model_path)
+    app.world.add_object(Grid(size=5))
+    app.world.add_object(PointLight(10))
+    app.world.add_object(mesh)
+    app.world.add_object(Gizmo())
+    return mesh
+
+
+def orbit_script(frames):
+    # Scripted camera motion as (d_azimuth, d_elevation, d_zoom) per frame:
+    # a full turntable, an elevation sweep up and back, then a zoom in/out
+    steps = []
+    turn = frames // 2
+    sweep = frames // 4
+    zoom = frames - turn - sweep
+    steps += [(628 / max(turn, 1), 0, 0)] * turn
+    steps += [(0, 150 / max(sweep // 2, 1), 0)] * (sweep // 2)
+    steps += [(0, -150 / max(sweep - sweep // 2, 1), 0)] * \
+        (sweep - sweep // 2)
+    steps += [(5, 0, -40 if i < zoom // 2 else 40) for i in range(zoom)]
+    return steps
@@ -0,0 +1,257 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import types
+from multiprocessing import Pool
+
+import numpy as np
+
+from objects.primatives import *
+from objects.lights import *
+from objects import assets
+from rendering.backends import ImageBackend
+from rendering.camera import *
+from rendering.world import *
+
+# Render OBJ files or JSON scene descriptions from a ring of viewpoints to
+# PNG sequences without opening a window, spread over worker processes.
+#
+#   python src/batch_render.py teapot.obj suzanne.obj --views 12
+#   python src/batch_render.py scene.json --mode orbit --workers 8
+#
+# A scene file holds one scene or a list of them:
+#   {"name": "row", "light": [10, 10, 10],
+#    "objects": [{"model": "teapot.obj", "translate": [0, 0, 0],
+#                 "rotate": [0, 90, 0], "scale": [1, 1, 1]}]}
+# Model paths are relative to the scene file. Rotations are in degrees.
+
+
+def make_app(width, height, backend):
+    # The subset of the cmu_graphics app state that World.render reads
+    app = types.SimpleNamespace(width=width, height=height, is_ortho=False,
+                                edit_mode=False, selected_object=None,
+                                use_rasterizer=False, raster_workers=1,
+                                raster_tile_size=128, lod_pixel_error=1.0,
+                                backend=backend)
+    app.camera = Camera(x=0, y=0, z=-5, aspect_ratio=width / height,
+                        fov=60, near=0.1, far=1000)
+    app.camera.orbit(10, 10)
+    app.world = World(app.camera, width, height)
+    return app
+
+
+def load_scenes(path):
+    # OBJ files become a scene with just that model
+    if not path.endswith('.json'):
+        name = os.path.splitext(os.path.basename(path))[0]
+        return [{'name': name, 'objects': [{'model': path}]}]
+
+    with open(path) as f:
+        data = json.load(f)
+    scenes = data if isinstance(data, list) else [data]
+    base = os.path.dirname(os.path.abspath(path))
+    default_name = os.path.splitext(os.path.basename(path))[0]
+    for i, scene in enumerate(scenes):
+        scene.setdefault('name', default_name if len(scenes) == 1
+                         else f'{default_name}_{i}')
+        for obj in scene['objects']:
+            obj['model'] = os.path.join(base, obj['model'])
+    return scenes
+
+
+def build_scene(app, scene, grid=False):
+    # Adds the scene's objects to the app's world and returns its meshes
+    if grid:
+        app.world.add_object(Grid(size=5))
+    app.world.add_object(PointLight(10, *scene.get('light', [1, -1, 1])))
+
+    meshes = []
+    for obj in scene['objects']:
+        mesh = ImportedMesh(obj['model'])
+        if 'scale' in obj:
+            mesh.apply_scaling(obj['scale'])
+        for angle, axis in zip(obj.get('rotate', [0, 0, 0]),
+                               ([1, 0, 0], [0, 1, 0], [0, 0, 1])):
+            if angle:
+                mesh.apply_rotation(math.radians(angle), axis)
+        if 'translate' in obj:
+            mesh.apply_translation(obj['translate'])
+        app.world.add_object(mesh)
+        meshes.append(mesh)
+    return meshes
+
+
+def frame_meshes(camera, meshes, margin=1.1):
+    # Aim the camera at the center of the meshes' bounding sphere and back
+    # off until the whole sphere fits in the field of view
+    points = []
+    for mesh in meshes:
+        if not len(mesh.vertices):
+            continue
+        # Corners of the object-space bounding box in world space
+        vertices = mesh.vertex_array[:, :3]
+        lo = vertices.min(axis=0)
+        hi = vertices.max(axis=0)
+        corners = np.array([[x, y, z, 1] for x in (lo[0], hi[0])
+                            for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+        points.append(corners @ np.array(mesh.transform_matrix).T)
+    if not points:
+        return
+
+    points = np.concatenate(points)[:, :3]
+    center = points.mean(axis=0)
+    radius = np.linalg.norm(points - center, axis=1).max()
+    camera.target = center.tolist()
+    camera.radius = max(radius * margin / math.sin(math.radians(
+        camera.fov) / 2), camera.near * 2)
+
+
+def viewpoints(count, mode='turntable', elevation=20):
+    # (azimuth, elevation) in radians for each frame. A turntable circles
+    # at a fixed elevation; an orbit also swings up and down once per turn.
+    views = []
+    for i in range(count):
+        azimuth = 2 * math.pi * i / count
+        if mode == 'orbit':
+            tilt = elevation + 45 * math.sin(azimuth)
+        else:
+            tilt = elevation
+        views.append((azimuth, math.radians(max(-89, min(89, tilt)))))
+    return views
+
+
+def set_view(camera, azimuth, elevation):
+    # Same as Camera.snap_to_axis, for any angle
+    camera.azimuth = azimuth
+    camera.elevation = elevation
+    camera.orbit(0, 0)
+
+
+def output_names(scenes):
+    # One folder name per scene. Scenes loaded from different folders can
+    # share a name (a/chair.obj and b/chair.obj), later ones get a suffix.
+    names = []
+    taken = set()
+    for scene in scenes:
+        name = scene['name']
+        count = 1
+        while name in taken:
+            count += 1
+            name = f'{scene["name"]}_{count}'
+        taken.add(name)
+        names.append(name)
+    return names
+
+
+# Worker process state, set up once per process by _init_worker
+_settings = None
+_current = None  # (scene index, app) of the scene the worker last rendered
+
+
+def _init_worker(scenes, width, height, options):
+    global _settings, _current
+    _settings = (scenes, width, height, options)
+    _current = None
+
+
+def _scene_app(scene_index):
+    # Consecutive views of a scene reuse its app, so every worker builds a
+    # scene and loads its geometry once
+    global _current
+    if _current is not None and _current[0] == scene_index:
+        return _current[1]
+
+    scenes, width, height, options = _settings
+    scene = scenes[scene_index]
+
+    # Keep only the geometry of the scene being rendered
+    assets.registry.retain(obj['model'] for obj in scene['objects'])
+
+    app = make_app(width, height,
+                   ImageBackend(width, height, options['background']))
+    app.use_rasterizer = options['raster']
+    meshes = build_scene(app, scene, options['grid'])
+    frame_meshes(app.camera, meshes)
+    _current = (scene_index, app)
+    return app
+
+
+def _render_view(task):
+    scene_index, azimuth, elevation, out_path = task
+    app = _scene_app(scene_index)
+    set_view(app.camera, azimuth, elevation)
+    app.world.render(app)
+    app.backend.save(out_path)
+    return out_path
+
+
+def render_all(scenes, out_dir, views, width, height, workers=None,
+               options=None):
+    # Renders every scene from every viewpoint and returns the written paths
+    options = {'raster': False, 'grid': False, 'background': (64, 64, 64),
+               **(options or {})}
+    tasks = []
+    for i, name in enumerate(output_names(scenes)):
+        scene_dir = os.path.join(out_dir, name)
+        os.makedirs(scene_dir, exist_ok=True)
+        for j, (azimuth, elevation) in enumerate(views):
+            tasks.append((i, azimuth, elevation,
+                          os.path.join(scene_dir, f'{name}_{j:04d}.png')))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(scenes, width, height, options)
+        return [_render_view(task) for task in tasks]
+
+    # Tasks are ordered scene by scene; handing them out in chunks keeps a
+    # scene's views on the same worker where possible
+    chunksize = max(1, min(len(views), len(tasks) // (workers * 4)))
+    with Pool(workers, initializer=_init_worker,
+              initargs=(scenes, width, height, options)) as pool:
+        return list(pool.imap(_render_view, tasks, chunksize=chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Render OBJ files or scene files to PNG sequences.')
+    parser.add_argument('inputs', nargs='+',
+                        help='.obj files or .json scene files')
+    parser.add_argument('--out', default='renders',
+                        help='output directory, one folder per scene')
+    parser.add_argument('--views', type=int, default=12,
+                        help='viewpoints per scene')
+    parser.add_argument('--mode', choices=['turntable', 'orbit'],
+                        default='turntable')
+    parser.add_argument('--elevation', type=float, default=20,
+                        help='camera elevation in degrees')
+    parser.add_argument('--size', default='256x256',
+                        help='image size as WIDTHxHEIGHT')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--raster', action='store_true',
+                        help='use the depth-buffered rasterizer')
+    parser.add_argument('--grid', action='store_true',
+                        help='draw the ground grid')
+    args = parser.parse_args(argv)
+
+    width, height = map(int, args.size.split('x'))
+    scenes = []
+    for path in args.inputs:
+        scenes.extend(load_scenes(path))
+
+    start = time.perf_counter()
+    paths = render_all(scenes, args.out,
+                       viewpoints(args.views, args.mode, args.elevation),
+                       width, height, args.workers,
+                       {'raster': args.raster, 'grid': args.grid})
+    elapsed = time.perf_counter() - start
+    print(f'Rendered {len(paths)} images of {len(scenes)} scenes to '
+          f'{args.out} in {elapsed:.2f}s ({len(paths) / elapsed:.1f} '
+          f'images/s)')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
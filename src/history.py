@@ -0,0 +1,231 @@
+from collections import deque
+
+import numpy as np
+
+from objects.lights import Light
+
+
+def _rows(array, rows, dtype, width=1):
+    # Values of the given rows of a list or array, as an array
+    values = np.array([array[row] for row in rows], dtype=dtype)
+    return values.reshape(-1, width) if width > 1 else values.reshape(-1)
+
+
+def _tail(array, start, dtype, width=1):
+    # Rows from start on, as an array
+    values = np.array(array[start:], dtype=dtype)
+    return values.reshape(-1, width) if width > 1 else values.reshape(-1)
+
+
+def _pose(obj, instance):
+    # Everything a move, rotation or scale of obj can change, flattened:
+    # its transform, then the light's position or the moved instance's
+    # transform
+    parts = [np.asarray(obj.transform_matrix, dtype=float).ravel()]
+    if isinstance(obj, Light):
+        parts.append(np.array(obj.position(), dtype=float))
+    elif instance is not None:
+        parts.append(obj.instance_transforms[instance].ravel())
+    return np.concatenate(parts)
+
+
+def _set_pose(obj, instance, pose):
+    obj.transform_matrix = pose[:16].reshape(4, 4).tolist()
+    if isinstance(obj, Light):
+        obj.x, obj.y, obj.z = pose[16:].tolist()
+    elif instance is not None:
+        obj.instance_transforms[instance] = pose[16:].reshape(4, 4)
+    obj.mark_transform_dirty()
+
+
+class _Edit:
+    # One undoable step on one object, packed into a single bytes object
+    # since thousands of small arrays would cost more than the data. The
+    # data is a header of counts followed by the rows of the vertices that
+    # changed, their values before and after, and the vertices added; then
+    # the same for the indices. If the object's pose changed, it follows
+    # before and after.
+    __slots__ = ('mesh', 'data')
+
+    # Vertex and index counts before, after; changed vertex rows, changed
+    # index rows; pose length (0 if unchanged) and moved instance (-1 for
+    # none)
+    HEADER = 8
+
+    def __init__(self, mesh, counts, vertices, indices, pose=None,
+                 instance=None):
+        self.mesh = mesh
+        header = list(counts)
+        header += [len(vertices[0]), len(indices[0]),
+                   0 if pose is None else len(pose[0]),
+                   -1 if instance is None else instance]
+        parts = [np.array(header, dtype=np.int32)]
+        parts += vertices + indices
+        if pose is not None:
+            parts += pose
+        self.data = b''.join(part.tobytes() for part in parts)
+
+    def unpack(self):
+        # The sections of data as a dict of arrays
+        header = np.frombuffer(self.data, np.int32, self.HEADER).tolist()
+        old_vertices, old_indices, new_vertices, new_indices, \
+            vertex_rows, index_rows, pose, instance = header
+        sections = {'counts': ((old_vertices, old_indices),
+                               (new_vertices, new_indices)),
+                    'instance': None if instance < 0 else instance}
+        offset = self.HEADER * 4
+
+        def take(name, dtype, count, width=1):
+            nonlocal offset
+            array = np.frombuffer(self.data, dtype, count * width, offset)
+            sections[name] = array.reshape(-1, width) if width > 1 \
+                else array
+            offset += array.nbytes
+
+        for name, dtype, width, rows, old, new in (
+                ('vertex', float, 4, vertex_rows, old_vertices,
+                 new_vertices),
+                ('index', np.int64, 1, index_rows, old_indices,
+                 new_indices)):
+            take(name + '_rows', np.int32, rows)
+            take(name + '_before', dtype, rows, width)
+            take(name + '_after', dtype, rows, width)
+            take(name + '_added', dtype, new - old, width)
+        if pose:
+            take('old_pose', float, pose)
+            take('new_pose', float, pose)
+        return sections
+
+
+class History:
+    # Undo/redo for edits. Every edit is a gesture between begin() and end()
+    # (pressing and releasing a transform or extrude key), however many
+    # mouse events it spans. begin() keeps the rows of the mesh the
+    # selection lets the gesture change, and the pose of the object or of
+    # its selected instance; end() stores those that changed and the rows
+    # added, so recording, undoing and redoing a step cost time in the size
+    # of the change rather than of the mesh.
+    #
+    # Steps are only ever undone and redone one after another, each from
+    # the state the previous one left, so there is no chain of deltas for
+    # periodic whole-mesh snapshots to shortcut, and none are kept.
+    def __init__(self, limit=1000):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+        self._mesh = None
+        self._state = None
+
+    def begin(self, mesh):
+        self.end()
+        self._mesh = mesh
+        vertex_rows, faces = mesh.selected_rows()
+        index_rows = [3 * face + i for face in faces for i in range(3)]
+        instance = getattr(mesh, 'selected_instance', None)
+        self._state = (
+            (len(mesh.vertices), len(mesh.indices)),
+            np.array(vertex_rows, dtype=np.int32),
+            _rows(mesh.vertices, vertex_rows, float, 4),
+            np.array(index_rows, dtype=np.int32),
+            _rows(mesh.indices, index_rows, np.int64),
+            instance, _pose(mesh, instance))
+
+    def end(self):
+        # Records the gesture, if it changed anything
+        if self._mesh is None:
+            return
+        mesh = self._mesh
+        (vertex_count, index_count), vertex_rows, vertices_before, \
+            index_rows, indices_before, instance, pose_before = self._state
+        self._mesh = None
+        self._state = None
+
+        counts = (vertex_count, index_count,
+                  len(mesh.vertices), len(mesh.indices))
+        vertices = self.changed(vertex_rows, vertices_before, _rows(
+            mesh.vertices, vertex_rows, float, 4)) + \
+            [_tail(mesh.vertices, vertex_count, float, 4)]
+        indices = self.changed(index_rows, indices_before, _rows(
+            mesh.indices, index_rows, np.int64)) + \
+            [_tail(mesh.indices, index_count, np.int64)]
+        pose_after = _pose(mesh, instance)
+        pose = None
+        if not np.array_equal(pose_before, pose_after):
+            pose = [pose_before, pose_after]
+        if pose is None and not len(vertices[0]) and \
+                not len(indices[0]) and counts[:2] == counts[2:]:
+            return
+
+        self.undo_stack.append(_Edit(mesh, counts, vertices, indices, pose,
+                                     instance))
+        self.redo_stack.clear()
+
+    @staticmethod
+    def changed(rows, before, after):
+        # The rows whose values differ, with their values before and after
+        different = before != after
+        if different.ndim > 1:
+            different = different.any(axis=1)
+        return [rows[different], before[different], after[different]]
+
+    def undo(self):
+        # Returns the mesh that changed, or None if there was nothing to undo
+        self.end()
+        if not self.undo_stack:
+            return None
+        edit = self.undo_stack.pop()
+        self.apply(edit, undo=True)
+        self.redo_stack.append(edit)
+        return edit.mesh
+
+    def redo(self):
+        self.end()
+        if not self.redo_stack:
+            return None
+        edit = self.redo_stack.pop()
+        self.apply(edit, undo=False)
+        self.undo_stack.append(edit)
+        return edit.mesh
+
+    def apply(self, edit, undo):
+        mesh = edit.mesh
+        sections = edit.unpack()
+        (old_vertices, old_indices), _ = sections['counts']
+        vertex_count, index_count = sections['counts'][0 if undo else 1]
+
+        if 'old_pose' in sections:
+            _set_pose(mesh, sections['instance'],
+                      sections['old_pose' if undo else 'new_pose'])
+
+        if len(sections['vertex_rows']) or len(sections['index_rows']) or \
+                sections['counts'][0] != sections['counts'][1]:
+            mesh.make_geometry_private()
+            values = 'before' if undo else 'after'
+            for name, target, kept in (
+                    ('vertex', mesh.vertices, old_vertices),
+                    ('index', mesh.indices, old_indices)):
+                rows = sections[f'{name}_rows'].tolist()
+                for row, value in zip(rows,
+                                      sections[f'{name}_{values}'].tolist()):
+                    target[row] = value
+                # Rows the step added are cut off or put back
+                del target[kept:]
+                if not undo:
+                    target.extend(sections[f'{name}_added'].tolist())
+            mesh.mark_geometry_dirty(topology_changed=bool(
+                len(sections['index_rows']) or
+                sections['counts'][0] != sections['counts'][1]))
+
+        # Drop selections that point past the restored geometry
+        if mesh.selected_vertex is not None and \
+                mesh.selected_vertex >= vertex_count:
+            mesh.selected_vertex = None
+        if mesh.selected_face is not None and \
+                mesh.selected_face >= index_count:
+            mesh.selected_face = None
+        mesh.selected_region = {face for face in mesh.selected_region
+                                if 3 * face < index_count}
+
+    def nbytes(self):
+        # Bytes of edit data kept for undo and redo
+        return sum(len(edit.data) for edit in self.undo_stack) + \
+            sum(len(edit.data) for edit in self.redo_stack)
@@ -1,4 +1,5 @@
 from cmu_graphics import *
+import os
 import time
 
 from objects.primatives import *
@@ -6,31 +7,51 @@ from objects.lights import *
 from objects.gizmo import *
 from rendering.camera import *
 from rendering.world import *
+from rendering.backends import CMUBackend
+from rendering.layers import *
+from profiler import profiler
+from history import History
+from scene_file import SceneFile
 from ui import *
 
 
 class FrameStats:
     def __init__(self):
-        self.last_time = time.time()
+        self.last_time = time.perf_counter_ns()
+        self.last_frame_time = 0.0
 
-    def frame_time(self):
-        now = time.time()
-        frame_time = (now - self.last_time) * 1000
+    def tick(self):
+        # Call once per frame, returns the time since the last call in ms
+        now = time.perf_counter_ns()
+        self.last_frame_time = (now - self.last_time) / 1e6
         self.last_time = now
-        return frame_time
+        return self.last_frame_time
+
+    def frame_time(self):
+        return self.last_frame_time
 
     def fps(self):
-        return 1 / (self.frame_time())
+        if self.last_frame_time == 0:
+            return 0.0
+        return 1000 / self.last_frame_time
 
 
 def onAppStart(app):
     app.setMaxShapeCount(2000000)
     app.background = rgb(64, 64, 64)
+    app.backend = CMUBackend()
     app.frame_stats = FrameStats()
     app.is_orbiting = False
     app.is_zooming = False
     app.edit_mode = False
     app.is_ortho = False
+    app.use_rasterizer = False
+    app.raster_workers = 1      # > 1 rasterizes tiles in worker processes
+    app.raster_tile_size = 128
+    app.lod_pixel_error = 1.0   # 0 always draws meshes at full detail
+    app.lod_in_background = True  # decimate new models off the frame path
+    app.use_layers = False      # redraw only the layers that changed
+    app.status = ''             # last save or open, under the FPS
     app.prev_mouse = (0, 0)
     app.is_extruding = False
     app.is_panning = False
@@ -58,6 +79,7 @@ def onAppStart(app):
     app.is_transforming = False
     app.selection_mode = 'vertex'  # or 'face'
     app.show_help = False
+    app.show_profiler = False
 
     app.help_x = 30
     app.help_y = app.height - 30
@@ -66,6 +88,10 @@ def onAppStart(app):
     app.add_menu_x = app.width//5
     app.add_menu_y = 10
 
+    app.history = History()
+    app.scene_file = SceneFile('scene.pyprism')
+    app.layers = LayerStack(world_layers() + [Layer('ui', uiKey, drawUiLayer)])
+
 
 def onResize(app):
     app.add_menu_x = app.width//5
@@ -78,7 +104,7 @@ def onMouseMove(app, mouseX, mouseY):
     app.prev_mouse = (mouseX, mouseY)
 
     if app.is_extruding and app.selected_object:
-        app.selected_object.update_extrusion(dy)
+        app.selected_object.update_extrusion(app, dy)
     elif app.is_transforming and app.selected_object:
         app.selected_object.transform(app, dx, dy)
     elif app.is_panning:
@@ -108,7 +134,7 @@ def onMousePress(app, mouseX, mouseY):
         # and Plane. Key was to use index of option element to adjust the
         # window in which to check for mouse click.
         for i, option in enumerate(['Cube', 'Plane', 'Suzanne', 'Sphere',
-                                    'Teapot']):
+                                    'Teapot', 'Cube Array']):
             if (menu_x <= mouseX <= menu_x + menu_w and
                     menu_y + i*menu_h <= mouseY <= menu_y + (i+1)*menu_h):
                 if option == 'Cube':
@@ -121,6 +147,8 @@ def onMousePress(app, mouseX, mouseY):
                     app.world.add_object(ImportedMesh("sphere.obj"))
                 elif option == 'Teapot':
                     app.world.add_object(ImportedMesh("teapot.obj"))
+                elif option == 'Cube Array':
+                    app.world.add_object(CubeArray())
                 app.show_add_menu = False
                 return
 
@@ -133,7 +161,7 @@ def onMousePress(app, mouseX, mouseY):
                 idx += 1
                 y = y_start + (idx * 20)
                 if y - 10 <= mouseY <= y + 10:
-                    app.selected_object = obj
+                    selectObject(app, obj)
                     return
 
     # Check if help button is clicked
@@ -151,24 +179,51 @@ def onMousePress(app, mouseX, mouseY):
             if obj.is_editable:
                 if obj.selection_mode == 'vertex':
                     if obj.check_vertex_selection(mouseX, mouseY):
-                        app.selected_object = obj
+                        selectObject(app, obj)
                         break
                 else:  # face selection mode
                     if obj.check_face_selection(mouseX, mouseY):
-                        app.selected_object = obj
+                        selectObject(app, obj)
                         break
     else:
-        # Select mesh
-        for obj in reversed(app.world.objects):  # Check from topmost object
-            if obj.is_selectable and obj.check_selection(mouseX, mouseY):
-                app.selected_object = obj
-                break
-            else:
-                app.selected_object = None
+        # Select the frontmost object under the cursor
+        hit = app.world.pick(app, mouseX, mouseY)
+        selectObject(app, None if hit is None else hit[0])
+        if hit is not None and hit[2] is not None:
+            hit[0].on_pick(hit[2])
+
+
+def selectObject(app, obj):
+    # Selects a whole object. A pick narrows it down to one instance of an
+    # InstancedMesh afterwards with on_pick; every other way of selecting
+    # drops the instance left from earlier so transforms don't go to it.
+    for selected in (app.selected_object, obj):
+        if getattr(selected, 'selected_instance', None) is not None:
+            selected.selected_instance = None
+    app.selected_object = obj
 
 
 def onKeyPress(app, key, modifiers):
-    if key == 'space':
+    if 'control' in modifiers and key in ['z', 'y']:
+        if key == 'z':
+            app.history.undo()
+        else:
+            app.history.redo()
+    elif 'control' in modifiers and key in ['s', 'o']:
+        path = app.scene_file.path
+        try:
+            if key == 's':
+                app.scene_file.save(app)
+                app.status = f'Saved {path}'
+            elif os.path.exists(path):
+                app.scene_file.load(app)
+                selectObject(app, None)
+                app.history = History()
+                app.status = f'Opened {path}'
+        except (ValueError, OSError, KeyError) as e:
+            app.status = f'Could not {"save" if key == "s" else "open"} ' \
+                f'{path}: {e}'
+    elif key == 'space':
         app.is_orbiting = True
     elif key == 'q':
         app.is_zooming = True
@@ -180,14 +235,17 @@ def onKeyPress(app, key, modifiers):
         if app.selected_object:
             app.transform_mode = 'move'
             app.is_transforming = True
+            app.history.begin(app.selected_object)
     elif key == 'r':
         if app.selected_object:
             app.transform_mode = 'rotate'
             app.is_transforming = True
+            app.history.begin(app.selected_object)
     elif key == 's':
         if app.selected_object:
             app.transform_mode = 'scale'
             app.is_transforming = True
+            app.history.begin(app.selected_object)
     elif key in ['x', 'y', 'z'] and app.transform_mode:
         app.axis_constraint = key
     elif key == 'x':
@@ -199,6 +257,10 @@ def onKeyPress(app, key, modifiers):
     elif key == '5':
         app.is_ortho = not app.is_ortho
         app.camera.is_ortho(app)
+    elif key == '6':
+        app.use_rasterizer = not app.use_rasterizer
+    elif key == '7':
+        app.use_layers = not app.use_layers and layers_supported()
     elif key == '1':  # Add these new controls
         if app.selected_object:
             app.selected_object.selection_mode = 'vertex'
@@ -209,15 +271,33 @@ def onKeyPress(app, key, modifiers):
             app.selected_object.selected_vertice = None
     elif key == 'backspace':
         app.world.remove_object(app.selected_object)
-        app.selected_object = None
+        selectObject(app, None)
         app.transform_mode = None
         app.axis_constraint = None
         app.is_transforming = False
+    elif key == 'p':
+        app.show_profiler = not app.show_profiler
+        profiler.enabled = app.show_profiler
+        profiler.reset()
+    elif key == 'P':
+        profiler.export_json('profile_trace.json')
+        profiler.export_csv('profile_trace.csv')
+    elif key in ['=', '+', '-', 'l']:
+        obj = app.selected_object
+        if app.edit_mode and obj and obj.is_editable and \
+                obj.selection_mode == 'face':
+            if key == '-':
+                obj.shrink_selection()
+            elif key == 'l':
+                obj.select_face_loop(*app.prev_mouse)
+            else:
+                obj.grow_selection()
     elif key == 'e':
         if (app.selected_object and
             app.selected_object.selection_mode == 'face' and
                 app.selected_object.selected_face is not None):
             app.is_extruding = True
+            app.history.begin(app.selected_object)
             app.selected_object.start_extrude_selected_face()
 
 
@@ -232,21 +312,42 @@ def onKeyRelease(app, key):
         app.transform_mode = None
         app.is_transforming = False
         app.axis_constraint = None
+        app.history.end()
     elif key == 'e':
         app.is_extruding = False
         if app.selected_object:
             app.selected_object.finish_extrusion()
+        app.history.end()
+
+
+def drawUiLayer(app):
+    with profiler.scope('ui'):
+        drawUi(app)
 
 
 def redrawAll(app):
-    app.world.render(app)
+    app.frame_stats.tick()
+    profiler.begin_frame()
+
+    if app.use_layers:
+        app.world.resize(app)
+        app.layers.render(app)
+    else:
+        app.world.render(app)
+        drawUiLayer(app)
+
+    profiler.end_frame()
 
-    drawUi(app)
+    app.backend.label(f"Frame time: {app.frame_stats.frame_time():.2f}ms",
+                      app.width//5 + 20, 10, 'white', align='left')
+    app.backend.label(f"FPS: {app.frame_stats.fps():.2f}",
+                      app.width//5 + 20, 25, 'white', align='left')
+    if app.status:
+        app.backend.label(app.status, app.width//5 + 20, 40, 'white',
+                          align='left')
 
-    drawLabel(f"Frame time: {app.frame_stats.frame_time(
-    ):.2f}ms", app.width//5 + 20, 10, fill='white', align='left')
-    drawLabel(f"FPS: {app.frame_stats.fps():.2f}", app.width //
-              5 + 20, 25, fill='white', align='left')
+    if app.show_profiler:
+        drawProfilerOverlay(app, profiler)
 
 
 def main():
@@ -1,27 +1,337 @@
 import math
 
+import numpy as np
+
+
+class Vec3:
+    # 3D vector with named fields. Behaves as a sequence of three numbers,
+    # so it can be passed wherever a [x, y, z] list is expected.
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def of(cls, v):
+        return v if isinstance(v, Vec3) else cls(v[0], v[1], v[2])
+
+    def __add__(self, other):
+        return Vec3(self.x + other[0], self.y + other[1], self.z + other[2])
+
+    def __sub__(self, other):
+        return Vec3(self.x - other[0], self.y - other[1], self.z - other[2])
+
+    def __mul__(self, scalar):
+        return Vec3(self.x * scalar, self.y * scalar, self.z * scalar)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vec3(-self.x, -self.y, -self.z)
+
+    def dot(self, other):
+        return self.x * other[0] + self.y * other[1] + self.z * other[2]
+
+    def cross(self, other):
+        return Vec3(self.y * other[2] - self.z * other[1],
+                    self.z * other[0] - self.x * other[2],
+                    self.x * other[1] - self.y * other[0])
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def normalized(self):
+        l = self.length()
+        if l == 0:
+            return Vec3()
+        return Vec3(self.x / l, self.y / l, self.z / l)
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __getitem__(self, i):
+        return (self.x, self.y, self.z)[i]
+
+    def __eq__(self, other):
+        try:
+            return tuple(self) == tuple(other)
+        except TypeError:
+            return False
+
+    def __repr__(self):
+        return f'Vec3({self.x}, {self.y}, {self.z})'
+
+    def tolist(self):
+        return [self.x, self.y, self.z]
+
+
+class Matrix4:
+    # 4x4 matrix stored as a flat row-major tuple of 16 numbers. Products
+    # and the fused constructors below are written out element by element,
+    # which in Python is several times faster than looping over nested
+    # lists (and than NumPy, whose call overhead dominates at this size).
+    # rows() gives the nested lists the rest of the code stores.
+    __slots__ = ('m',)
+
+    def __init__(self, m):
+        self.m = tuple(m)
+
+    @classmethod
+    def from_rows(cls, rows):
+        if isinstance(rows, Matrix4):
+            return rows
+        r0, r1, r2, r3 = rows
+        return cls((*r0, *r1, *r2, *r3))
+
+    def rows(self):
+        m = self.m
+        return [list(m[0:4]), list(m[4:8]), list(m[8:12]), list(m[12:16])]
+
+    @classmethod
+    def identity(cls):
+        return cls((1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1))
+
+    @classmethod
+    def translation(cls, tx, ty, tz):
+        return cls((1, 0, 0, tx, 0, 1, 0, ty, 0, 0, 1, tz, 0, 0, 0, 1))
+
+    @classmethod
+    def scaling(cls, sx, sy, sz):
+        return cls((sx, 0, 0, 0, 0, sy, 0, 0, 0, 0, sz, 0, 0, 0, 0, 1))
+
+    @staticmethod
+    def _rotation3(angle, axis):
+        # Rz(angle * z) @ Ry(angle * y) @ Rx(angle * x) for the normalized
+        # axis, the same rotation rotation_matrix() has always built, as
+        # one closed-form 3x3 instead of two matrix products
+        x, y, z = normalize(axis)
+        ca, sa = math.cos(angle * x), math.sin(angle * x)
+        cb, sb = math.cos(angle * y), math.sin(angle * y)
+        cc, sc = math.cos(angle * z), math.sin(angle * z)
+        return (cc * cb, cc * sb * sa - sc * ca, cc * sb * ca + sc * sa,
+                sc * cb, sc * sb * sa + cc * ca, sc * sb * ca - cc * sa,
+                -sb, cb * sa, cb * ca)
+
+    @classmethod
+    def rotation(cls, angle, axis):
+        r = cls._rotation3(angle, axis)
+        return cls((r[0], r[1], r[2], 0, r[3], r[4], r[5], 0,
+                    r[6], r[7], r[8], 0, 0, 0, 0, 1))
+
+    @classmethod
+    def trs(cls, translation=(0, 0, 0), angle=0.0, axis=(0, 0, 1),
+            scale=(1, 1, 1)):
+        # translation @ rotation @ scaling in one step
+        r = cls._rotation3(angle, axis)
+        sx, sy, sz = scale
+        tx, ty, tz = translation
+        return cls((r[0] * sx, r[1] * sy, r[2] * sz, tx,
+                    r[3] * sx, r[4] * sy, r[5] * sz, ty,
+                    r[6] * sx, r[7] * sy, r[8] * sz, tz,
+                    0, 0, 0, 1))
+
+    @classmethod
+    def look_at(cls, position, target, up):
+        # View matrix of a camera at position looking at target
+        # gluLookAt https://registry.khronos.org/OpenGL-Refpages/gl2.1/xhtml/gluLookAt.xml
+        px, py, pz = position[0], position[1], position[2]
+        zx, zy, zz = normalize((px - target[0], py - target[1],
+                                pz - target[2]))
+        xx, xy, xz = normalize((up[1] * zz - up[2] * zy,
+                                up[2] * zx - up[0] * zz,
+                                up[0] * zy - up[1] * zx))
+        yx, yy, yz = zy * xz - zz * xy, zz * xx - zx * xz, zx * xy - zy * xx
+        return cls((xx, xy, xz, -(xx * px + xy * py + xz * pz),
+                    yx, yy, yz, -(yx * px + yy * py + yz * pz),
+                    zx, zy, zz, -(zx * px + zy * py + zz * pz),
+                    0, 0, 0, 1))
+
+    def __matmul__(self, other):
+        a0, a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11, a12, a13, a14, \
+            a15 = self.m
+        b0, b1, b2, b3, b4, b5, b6, b7, b8, b9, b10, b11, b12, b13, b14, \
+            b15 = other.m
+        return Matrix4((
+            a0 * b0 + a1 * b4 + a2 * b8 + a3 * b12,
+            a0 * b1 + a1 * b5 + a2 * b9 + a3 * b13,
+            a0 * b2 + a1 * b6 + a2 * b10 + a3 * b14,
+            a0 * b3 + a1 * b7 + a2 * b11 + a3 * b15,
+            a4 * b0 + a5 * b4 + a6 * b8 + a7 * b12,
+            a4 * b1 + a5 * b5 + a6 * b9 + a7 * b13,
+            a4 * b2 + a5 * b6 + a6 * b10 + a7 * b14,
+            a4 * b3 + a5 * b7 + a6 * b11 + a7 * b15,
+            a8 * b0 + a9 * b4 + a10 * b8 + a11 * b12,
+            a8 * b1 + a9 * b5 + a10 * b9 + a11 * b13,
+            a8 * b2 + a9 * b6 + a10 * b10 + a11 * b14,
+            a8 * b3 + a9 * b7 + a10 * b11 + a11 * b15,
+            a12 * b0 + a13 * b4 + a14 * b8 + a15 * b12,
+            a12 * b1 + a13 * b5 + a14 * b9 + a15 * b13,
+            a12 * b2 + a13 * b6 + a14 * b10 + a15 * b14,
+            a12 * b3 + a13 * b7 + a14 * b11 + a15 * b15))
+
+    def translated(self, tx, ty, tz):
+        # translation(tx, ty, tz) @ self, without the full product
+        m = list(self.m)
+        for i, t in ((0, tx), (4, ty), (8, tz)):
+            for j in range(4):
+                m[i + j] += t * m[12 + j]
+        return Matrix4(m)
+
+    def scaled(self, sx, sy, sz):
+        # scaling(sx, sy, sz) @ self, without the full product
+        m = self.m
+        return Matrix4(tuple(v * sx for v in m[0:4]) +
+                       tuple(v * sy for v in m[4:8]) +
+                       tuple(v * sz for v in m[8:12]) + m[12:16])
+
+    def rotated(self, angle, axis):
+        # rotation(angle, axis) @ self, without the full product
+        r = self._rotation3(angle, axis)
+        m = self.m
+        out = []
+        for i in (0, 3, 6):
+            r0, r1, r2 = r[i], r[i + 1], r[i + 2]
+            out += (r0 * m[j] + r1 * m[4 + j] + r2 * m[8 + j]
+                    for j in range(4))
+        return Matrix4(out + list(m[12:16]))
+
+    def transpose(self):
+        m = self.m
+        return Matrix4(m[0::4] + m[1::4] + m[2::4] + m[3::4])
+
+    def transform(self, v):
+        # Matrix times a homogeneous [x, y, z, w] vector
+        m = self.m
+        x, y, z, w = v[0], v[1], v[2], v[3]
+        return [m[0] * x + m[1] * y + m[2] * z + m[3] * w,
+                m[4] * x + m[5] * y + m[6] * z + m[7] * w,
+                m[8] * x + m[9] * y + m[10] * z + m[11] * w,
+                m[12] * x + m[13] * y + m[14] * z + m[15] * w]
+
+    def transform_points(self, points):
+        # Batched transform of an Nx4 array of homogeneous points, or of Nx3
+        # points (taken with w = 1, returning the Nx3 affine part)
+        points = np.asarray(points, dtype=float)
+        matrix = np.array(self.m, dtype=float).reshape(4, 4)
+        if points.ndim == 2 and points.shape[1] == 3:
+            return points @ matrix[:3, :3].T + matrix[:3, 3]
+        return points @ matrix.T
+
+    def determinant3(self):
+        # Determinant of the upper-left 3x3
+        a, b, c, _, d, e, f, _, g, h, i = self.m[:11]
+        return a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+
+    def inverse_transpose3(self):
+        # Inverse-transpose of the upper-left 3x3, as 3 rows. Normals must
+        # be transformed by this instead of the matrix itself so they stay
+        # perpendicular to surfaces under non-uniform scaling. A singular
+        # matrix gives its cofactors, which still point normals the right
+        # way.
+        # https://www.scratchapixel.com/lessons/mathematics-physics-for-computer-graphics/geometry/transforming-normals.html
+        a, b, c, _, d, e, f, _, g, h, i = self.m[:11]
+
+        # Cofactor matrix, which is det * inverse-transpose
+        cofactors = [
+            [e*i - f*h, f*g - d*i, d*h - e*g],
+            [c*h - b*i, a*i - c*g, b*g - a*h],
+            [b*f - c*e, c*d - a*f, a*e - b*d]
+        ]
+        det = a*cofactors[0][0] + b*cofactors[0][1] + c*cofactors[0][2]
+        if det == 0:
+            return cofactors
+
+        return [[x / det for x in row] for row in cofactors]
+
+    def inverse(self):
+        # Raises ValueError for singular matrices. Affine matrices (bottom
+        # row 0, 0, 0, 1, which every model and view matrix is) are
+        # inverted as a 3x3 and a translation.
+        m = self.m
+        if m[12:] == (0, 0, 0, 1):
+            return self._affine_inverse()
+
+        # Laplace expansion over 2x2 sub-determinants
+        a00, a01, a02, a03, a10, a11, a12, a13, \
+            a20, a21, a22, a23, a30, a31, a32, a33 = m
+        s0 = a00 * a11 - a10 * a01
+        s1 = a00 * a12 - a10 * a02
+        s2 = a00 * a13 - a10 * a03
+        s3 = a01 * a12 - a11 * a02
+        s4 = a01 * a13 - a11 * a03
+        s5 = a02 * a13 - a12 * a03
+        c5 = a22 * a33 - a32 * a23
+        c4 = a21 * a33 - a31 * a23
+        c3 = a21 * a32 - a31 * a22
+        c2 = a20 * a33 - a30 * a23
+        c1 = a20 * a32 - a30 * a22
+        c0 = a20 * a31 - a30 * a21
+        det = s0 * c5 - s1 * c4 + s2 * c3 + s3 * c2 - s4 * c1 + s5 * c0
+        if det == 0:
+            raise ValueError('Matrix is singular')
+        inv = 1 / det
+        return Matrix4((
+            (a11 * c5 - a12 * c4 + a13 * c3) * inv,
+            (-a01 * c5 + a02 * c4 - a03 * c3) * inv,
+            (a31 * s5 - a32 * s4 + a33 * s3) * inv,
+            (-a21 * s5 + a22 * s4 - a23 * s3) * inv,
+            (-a10 * c5 + a12 * c2 - a13 * c1) * inv,
+            (a00 * c5 - a02 * c2 + a03 * c1) * inv,
+            (-a30 * s5 + a32 * s2 - a33 * s1) * inv,
+            (a20 * s5 - a22 * s2 + a23 * s1) * inv,
+            (a10 * c4 - a11 * c2 + a13 * c0) * inv,
+            (-a00 * c4 + a01 * c2 - a03 * c0) * inv,
+            (a30 * s4 - a31 * s2 + a33 * s0) * inv,
+            (-a20 * s4 + a21 * s2 - a23 * s0) * inv,
+            (-a10 * c3 + a11 * c1 - a12 * c0) * inv,
+            (a00 * c3 - a01 * c1 + a02 * c0) * inv,
+            (-a30 * s3 + a31 * s1 - a32 * s0) * inv,
+            (a20 * s3 - a21 * s1 + a22 * s0) * inv))
+
+    def _affine_inverse(self):
+        if self.determinant3() == 0:
+            raise ValueError('Matrix is singular')
+        # The inverse 3x3 is the transpose of the inverse-transpose
+        (r00, r01, r02), (r10, r11, r12), (r20, r21, r22) = \
+            self.inverse_transpose3()
+        m = self.m
+        tx, ty, tz = m[3], m[7], m[11]
+        return Matrix4((
+            r00, r10, r20, -(r00 * tx + r10 * ty + r20 * tz),
+            r01, r11, r21, -(r01 * tx + r11 * ty + r21 * tz),
+            r02, r12, r22, -(r02 * tx + r12 * ty + r22 * tz),
+            0, 0, 0, 1))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self.m, dtype=dtype).reshape(4, 4)
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix4) and self.m == other.m
+
+    def __repr__(self):
+        return f'Matrix4({self.rows()})'
+
+
+# The functions below work on nested-list matrices and plain lists, as the
+# rest of the code stores them, and are kept as thin wrappers around the
+# types above
+
 
 def matrix_multiply(a, b):
-    result = []
-    for i in range(4):
-        row = []
-        for j in range(4):
-            sum = 0
-            for k in range(4):
-                sum += a[i][k] * b[k][j]
-            row.append(sum)
-        result.append(row)
-    return result
+    return (Matrix4.from_rows(a) @ Matrix4.from_rows(b)).rows()
 
 
 def matrix_vector_multiply(matrix, vector):
-    result = []
-    for i in range(4):
-        sum = 0
-        for j in range(4):
-            sum += matrix[i][j] * vector[j]
-        result.append(sum)
-    return result
+    x, y, z, w = vector[0], vector[1], vector[2], vector[3]
+    return [row[0] * x + row[1] * y + row[2] * z + row[3] * w
+            for row in matrix]
 
 
 def cross(a, b):
@@ -49,7 +359,9 @@ def normalize(v):
 
 
 def dot(a, b):
-    return sum([a[i] * b[i] for i in range(len(a))])
+    if len(a) == 3:
+        return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+    return sum(x * y for x, y in zip(a, b))
 
 
 def identity_matrix():
@@ -73,50 +385,9 @@ def translation_matrix(tx, ty, tz):
 
 def rotation_matrix(angle, axis):
     # https://math.libretexts.org/Bookshelves/Applied_Mathematics/Mathematics_for_Game_Developers_(Burzynski)/04%3A_Matrices/4.06%3A_Rotation_Matrices_in_3-Dimensions
-
-    # Nested functions for cleaner code
-    def rotation_x(angle):
-        c = math.cos(angle)
-        s = math.sin(angle)
-        return [
-            [1, 0,  0, 0],
-            [0, c, -s, 0],
-            [0, s,  c, 0],
-            [0, 0,  0, 1]
-        ]
-
-    def rotation_y(angle):
-        c = math.cos(angle)
-        s = math.sin(angle)
-        return [
-            [c, 0, s, 0],
-            [0, 1, 0, 0],
-            [-s, 0, c, 0],
-            [0, 0, 0, 1]
-        ]
-
-    def rotation_z(angle):
-        c = math.cos(angle)
-        s = math.sin(angle)
-        return [
-            [c, -s, 0, 0],
-            [s,  c, 0, 0],
-            [0,  0, 1, 0],
-            [0,  0, 0, 1]
-        ]
-
-    # Normalize axis to get components
-    axis = normalize(axis)
-    x, y, z = axis
-
-    # Get rotation matrix for each axis and scale by component
-    rx = rotation_x(angle * x)
-    ry = rotation_y(angle * y)
-    rz = rotation_z(angle * z)
-
-    # Combine rotations (order matters: Z * Y * X)
-    # Used ChatGPT to understand that order matters
-    return matrix_multiply(rz, matrix_multiply(ry, rx))
+    # Rotations about x, y and z by angle scaled by the axis components,
+    # combined as Z * Y * X, see Matrix4.rotation()
+    return Matrix4.rotation(angle, axis).rows()
 
 
 def scaling_matrix(sx, sy, sz):
@@ -130,6 +401,12 @@ def scaling_matrix(sx, sy, sz):
     ]
 
 
+def normal_matrix(m):
+    # Inverse-transpose of the upper-left 3x3 of a 4x4 transform, see
+    # Matrix4.inverse_transpose3()
+    return Matrix4.from_rows(m).inverse_transpose3()
+
+
 def vector_add(a, b):
     return [a[i] + b[i] for i in range(len(a))]
 
@@ -138,17 +415,175 @@ def tri_area(x1, y1, x2, y2, x3, y3):
     return abs((x1*(y2 - y3) + x2*(y3 - y1) + x3*(y1 - y2))/2.0)
 
 
-def point_in_triangle(px, py, v1, v2, v3):
-    # https://www.geeksforgeeks.org/check-whether-a-given-point-lies-inside-a-triangle-or-not/
+def edge_function(ax, ay, bx, by, px, py):
+    # Twice the signed area of the triangle a, b, p: positive on one side of
+    # the line through a and b, negative on the other and zero on it. Works
+    # elementwise on NumPy arrays too.
+    # https://www.scratchapixel.com/lessons/3d-basic-rendering/rasterization-practical-implementation/rasterization-stage.html
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+
 
-    # Calculate area of the entire triangle
-    total_area = tri_area(v1[0], v1[1], v2[0], v2[1], v3[0], v3[1])
+def point_in_triangle(px, py, v1, v2, v3):
+    # Inside, or on an edge, if the point is on the same side of all three
+    # edges, whichever way the triangle is wound. Only signs are compared,
+    # so large triangles don't need a tolerance. Degenerate triangles
+    # contain nothing.
+    if screen_winding(v1, v2, v3) == 0:
+        return False
+    w1 = edge_function(v2[0], v2[1], v3[0], v3[1], px, py)
+    w2 = edge_function(v3[0], v3[1], v1[0], v1[1], px, py)
+    w3 = edge_function(v1[0], v1[1], v2[0], v2[1], px, py)
+    return (w1 >= 0 and w2 >= 0 and w3 >= 0) or \
+        (w1 <= 0 and w2 <= 0 and w3 <= 0)
+
+
+def point_segment_distance(px, py, x1, y1, x2, y2):
+    # Distance from a screen point to the segment between two others
+    dx = x2 - x1
+    dy = y2 - y1
+    length_sq = dx * dx + dy * dy
+    t = 0 if length_sq == 0 else \
+        max(0, min(1, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+    return math.hypot(px - x1 - t * dx, py - y1 - t * dy)
+
+
+def screen_winding(v0, v1, v2):
+    # Twice the signed area of a screen-space triangle. Screen y points down,
+    # so triangles wound counter-clockwise in NDC come out negative.
+    return (v1[0] - v0[0]) * (v2[1] - v0[1]) - \
+        (v2[0] - v0[0]) * (v1[1] - v0[1])
+
+
+def clip_polygon_near(polygon):
+    # Sutherland-Hodgman clipping of clip-space [x, y, z, w] vertices against
+    # the near plane z = -w, keeping the part where z + w >= 0
+    # https://en.wikipedia.org/wiki/Sutherland%E2%80%93Hodgman_algorithm
+    result = []
+    for i in range(len(polygon)):
+        current = polygon[i]
+        previous = polygon[i - 1]
+        d_current = current[2] + current[3]
+        d_previous = previous[2] + previous[3]
+
+        if (d_current >= 0) != (d_previous >= 0):
+            # Edge crosses the plane, add the intersection point
+            t = d_previous / (d_previous - d_current)
+            result.append([previous[k] + (current[k] - previous[k]) * t
+                           for k in range(4)])
+        if d_current >= 0:
+            result.append(current)
+    return result
 
-    # Calculate areas of three
-    # triangles made between the point and triangle vertices
-    area1 = tri_area(px, py, v2[0], v2[1], v3[0], v3[1])
-    area2 = tri_area(v1[0], v1[1], px, py, v3[0], v3[1])
-    area3 = tri_area(v1[0], v1[1], v2[0], v2[1], px, py)
 
-    # Point is inside if sum of three areas equals total area
-    return abs(total_area - (area1 + area2 + area3)) < 0.0001
+# Batched versions of the predicates above. Triangles are arrays of shape
+# (..., 3, 2) or (..., 3, 3) and points (..., 2) or (..., 3); the leading
+# dimensions broadcast against each other, so one point can be tested
+# against every triangle, every point against one triangle, or every point
+# against every triangle with points[:, None] and tris[None].
+def screen_windings(tris):
+    # screen_winding() of every triangle
+    tris = np.asarray(tris, dtype=float)
+    e1 = tris[..., 1, :2] - tris[..., 0, :2]
+    e2 = tris[..., 2, :2] - tris[..., 0, :2]
+    return e1[..., 0] * e2[..., 1] - e2[..., 0] * e1[..., 1]
+
+
+def triangle_areas(tris):
+    # Unsigned area of every triangle, in the plane for 2D points and in
+    # space for 3D ones
+    tris = np.asarray(tris, dtype=float)
+    if tris.shape[-1] == 2:
+        return np.abs(screen_windings(tris)) / 2
+    return np.linalg.norm(np.cross(tris[..., 1, :] - tris[..., 0, :],
+                                   tris[..., 2, :] - tris[..., 0, :]),
+                          axis=-1) / 2
+
+
+def triangle_normals(vertices, faces, normalized=False):
+    # Normal of every face of an indexed mesh, (v1 - v0) x (v2 - v0).
+    # Unless normalized its length is twice the face's area; normalized
+    # normals of degenerate faces stay zero.
+    vertices = np.asarray(vertices, dtype=float)[:, :3]
+    tri = vertices[np.asarray(faces).reshape(-1, 3)]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    if normalized:
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = normals / np.where(lengths == 0, 1, lengths)
+    return normals
+
+
+def _edge_functions(points, tris):
+    points = np.asarray(points, dtype=float)
+    tris = np.asarray(tris, dtype=float)
+    px, py = points[..., 0], points[..., 1]
+    x = tris[..., 0]
+    y = tris[..., 1]
+    return (edge_function(x[..., 1], y[..., 1], x[..., 2], y[..., 2], px, py),
+            edge_function(x[..., 2], y[..., 2], x[..., 0], y[..., 0], px, py),
+            edge_function(x[..., 0], y[..., 0], x[..., 1], y[..., 1], px, py))
+
+
+def points_in_triangles(points, tris):
+    # point_in_triangle() on arrays, using the x and y of the triangles
+    w1, w2, w3 = _edge_functions(points, tris)
+    inside = ((w1 >= 0) & (w2 >= 0) & (w3 >= 0)) | \
+        ((w1 <= 0) & (w2 <= 0) & (w3 <= 0))
+    return inside & (screen_windings(tris) != 0)
+
+
+def barycentrics(points, tris):
+    # Barycentric weights (..., 3) of points in triangles' x and y. The
+    # weights are all in [0, 1] for points inside; they are NaN for
+    # degenerate triangles.
+    w1, w2, w3 = _edge_functions(points, tris)
+    area = screen_windings(tris)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        area = np.where(area == 0, np.nan, area)
+        return np.stack([w1 / area, w2 / area, w3 / area], axis=-1)
+
+
+def clip_segments(starts, ends, x0, y0, x1, y1):
+    # Liang-Barsky clipping of N 2D segments to the rectangle x0..x1,
+    # y0..y1. Returns the clipped starts and ends, and a mask of the
+    # segments with some part inside; the others are left unchanged.
+    # https://en.wikipedia.org/wiki/Liang%E2%80%93Barsky_algorithm
+    starts = np.asarray(starts, dtype=float)[:, :2]
+    ends = np.asarray(ends, dtype=float)[:, :2]
+    # Infinite or NaN endpoints (points projected from w = 0) make NaNs
+    # below; such segments are never visible
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = ends - starts
+        t0 = np.zeros(len(starts))
+        t1 = np.ones(len(starts))
+        visible = np.isfinite(d).all(axis=1)
+        for p, q in ((-d[:, 0], starts[:, 0] - x0),
+                     (d[:, 0], x1 - starts[:, 0]),
+                     (-d[:, 1], starts[:, 1] - y0),
+                     (d[:, 1], y1 - starts[:, 1])):
+            t = q / p
+            # Parallel to this side and outside it
+            visible &= (p != 0) | (q >= 0)
+            t0 = np.where(p < 0, np.maximum(t0, t), t0)
+            t1 = np.where(p > 0, np.minimum(t1, t), t1)
+        visible &= t0 <= t1
+        t0 = np.where(visible, t0, 0)[:, None]
+        t1 = np.where(visible, t1, 1)[:, None]
+        return starts + t0 * d, starts + t1 * d, visible
+
+
+def clip_segments_near(starts, ends):
+    # clip_polygon_near() for N clip-space segments: ends behind the near
+    # plane are moved onto it. Returns the clipped starts and ends and a
+    # mask of the segments with some part in front.
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    d_start = starts[:, 2] + starts[:, 3]
+    d_end = ends[:, 2] + ends[:, 3]
+    # Segments parallel to the plane give t = inf or NaN, but then both
+    # ends are on the same side and the crossing isn't used
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (d_start / (d_start - d_end))[:, None]
+        crossing = starts + (ends - starts) * t
+    new_starts = np.where((d_start < 0)[:, None], crossing, starts)
+    new_ends = np.where((d_end < 0)[:, None], crossing, ends)
+    return new_starts, new_ends, (d_start >= 0) | (d_end >= 0)
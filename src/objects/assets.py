@@ -0,0 +1,123 @@
+import os
+import threading
+
+import numpy as np
+
+from objects import obj_loader
+from objects.bvh import TriangleBVH
+from objects.lod import build_levels
+
+
+class GeometryAsset:
+    # Immutable geometry loaded from a file. Every mesh created from the
+    # same file shares these arrays and the data derived from them (face
+    # normals, picking BVH) until it is edited.
+    def __init__(self, file_path, vertices, indices):
+        self.path = file_path
+        self.name = os.path.splitext(os.path.basename(file_path))[0]
+
+        # The loader's memory-mapped arrays are kept as they are: vertices
+        # are float64 and indices stay uint32, which index arrays just as
+        # well without a copy
+        self.vertices = np.asarray(vertices, dtype=float)
+        self.indices = np.asarray(indices)
+        self.vertices.flags.writeable = False
+        self.indices.flags.writeable = False
+        self.faces = self.indices.reshape(-1, 3)
+
+        self._face_normals = None
+        self._bvh = None
+        self._lods = None
+        self._lods_thread = None
+        self._bounds = None
+
+    @property
+    def face_normals(self):
+        # Object-space face normals
+        if self._face_normals is None:
+            tri = self.vertices[:, :3][self.faces]
+            self._face_normals = np.cross(tri[:, 1] - tri[:, 0],
+                                          tri[:, 2] - tri[:, 0])
+            self._face_normals.flags.writeable = False
+        return self._face_normals
+
+    @property
+    def bvh(self):
+        if self._bvh is None:
+            self._bvh = TriangleBVH(self.vertices, self.faces)
+        return self._bvh
+
+    @property
+    def lods(self):
+        # Quadric-decimated levels of detail, level 0 being the full mesh
+        if self._lods is None:
+            if self._lods_thread is not None:
+                self._lods_thread.join()
+            else:
+                self._build_lods()
+        return self._lods
+
+    def lods_in_background(self):
+        # lods if they are built, otherwise None. The first call starts
+        # building them in a background thread, so the frame that first
+        # draws a model doesn't wait for the decimation.
+        if self._lods is None and self._lods_thread is None:
+            self._lods_thread = threading.Thread(target=self._build_lods,
+                                                 daemon=True)
+            self._lods_thread.start()
+        return self._lods
+
+    @property
+    def lods_ready(self):
+        # Whether lods can be used without waiting for them to build
+        return self._lods is not None
+
+    def _build_lods(self):
+        self._lods = build_levels(self.vertices, self.faces)
+
+    @property
+    def bounds(self):
+        # Object-space bounding sphere as (center, radius)
+        if self._bounds is None:
+            points = self.vertices[:, :3]
+            if len(points):
+                center = (points.min(axis=0) + points.max(axis=0)) / 2
+                radius = float(np.linalg.norm(points - center, axis=1).max())
+            else:
+                center, radius = np.zeros(3), 0.0
+            self._bounds = (center, radius)
+        return self._bounds
+
+    def nbytes(self):
+        total = self.vertices.nbytes + self.indices.nbytes
+        if self._lods is not None:
+            total += sum(level.faces.nbytes for level in self._lods[1:])
+        return total
+
+
+class AssetRegistry:
+    # Loads each file once and hands out the same GeometryAsset afterwards
+    def __init__(self):
+        self.assets = {}
+
+    def load(self, file_path):
+        key = os.path.abspath(file_path)
+        if key not in self.assets:
+            vertices, indices = obj_loader.load_obj(file_path)
+            self.assets[key] = GeometryAsset(file_path, vertices, indices)
+        return self.assets[key]
+
+    def retain(self, file_paths):
+        # Drop every asset not loaded from one of these files, so a long
+        # batch job doesn't keep all geometry it has ever seen
+        keep = {os.path.abspath(path) for path in file_paths}
+        for key in list(self.assets):
+            if key not in keep:
+                del self.assets[key]
+
+    def nbytes(self):
+        return sum(asset.nbytes() for asset in self.assets.values())
+
+
+# Registry used by ImportedMesh
+registry = AssetRegistry()
@@ -0,0 +1,190 @@
+import numpy as np
+
+
+class BVH:
+    # Bounding volume hierarchy over axis-aligned boxes, one per primitive
+    # (triangles of a mesh, or whole objects in a scene)
+    # https://pbr-book.org/3ed-2018/Primitives_and_Intersection_Acceleration/Bounding_Volume_Hierarchies
+
+    def __init__(self, bounds_min, bounds_max, leaf_size=4):
+        bounds_min = np.asarray(bounds_min, dtype=float).reshape(-1, 3)
+        bounds_max = np.asarray(bounds_max, dtype=float).reshape(-1, 3)
+        self.leaf_size = leaf_size
+        self.count = len(bounds_min)
+
+        # Flattened nodes in depth-first order, so children always come
+        # after their parent. Leaves have left == -1 and cover
+        # order[start:start + size].
+        self.node_min = []
+        self.node_max = []
+        self.left = []
+        self.right = []
+        self.start = []
+        self.size = []
+
+        self.order = np.arange(self.count)
+        if self.count:
+            centroids = (bounds_min + bounds_max) / 2
+            self._build(bounds_min, bounds_max, centroids, 0, self.count)
+        self.leaf_order = self.order.tolist()
+
+    def _build(self, bounds_min, bounds_max, centroids, start, end):
+        node = len(self.left)
+        prims = self.order[start:end]
+        self.node_min.append(bounds_min[prims].min(axis=0).tolist())
+        self.node_max.append(bounds_max[prims].max(axis=0).tolist())
+        self.left.append(-1)
+        self.right.append(-1)
+        self.start.append(start)
+        self.size.append(end - start)
+
+        if end - start <= self.leaf_size:
+            return node
+
+        # Median split along the longest axis of the centroid bounds
+        c = centroids[prims]
+        axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+        mid = (end - start) // 2
+        split = np.argpartition(c[:, axis], mid)
+        self.order[start:end] = prims[split]
+
+        self.left[node] = self._build(bounds_min, bounds_max, centroids,
+                                      start, start + mid)
+        self.right[node] = self._build(bounds_min, bounds_max, centroids,
+                                       start + mid, end)
+        return node
+
+    def refit(self, bounds_min, bounds_max):
+        # Update node boxes after primitives moved without changing the
+        # tree shape. Cheaper than a rebuild for vertex drags.
+        bounds_min = np.asarray(bounds_min, dtype=float).reshape(-1, 3)
+        bounds_max = np.asarray(bounds_max, dtype=float).reshape(-1, 3)
+        for node in reversed(range(len(self.left))):
+            left = self.left[node]
+            if left == -1:
+                prims = self.order[self.start[node]:
+                                   self.start[node] + self.size[node]]
+                self.node_min[node] = bounds_min[prims].min(axis=0).tolist()
+                self.node_max[node] = bounds_max[prims].max(axis=0).tolist()
+            else:
+                right = self.right[node]
+                self.node_min[node] = [min(a, b) for a, b in zip(
+                    self.node_min[left], self.node_min[right])]
+                self.node_max[node] = [max(a, b) for a, b in zip(
+                    self.node_max[left], self.node_max[right])]
+
+    def ray_box(self, node, origin, inv_dir):
+        # Slab test, returns the entry distance or None if the ray misses
+        t_near = 0.0
+        t_far = float('inf')
+        box_min = self.node_min[node]
+        box_max = self.node_max[node]
+        for axis in range(3):
+            if inv_dir[axis] is None:
+                # Ray parallel to the slab
+                if not box_min[axis] <= origin[axis] <= box_max[axis]:
+                    return None
+                continue
+            t0 = (box_min[axis] - origin[axis]) * inv_dir[axis]
+            t1 = (box_max[axis] - origin[axis]) * inv_dir[axis]
+            if t0 > t1:
+                t0, t1 = t1, t0
+            t_near = max(t_near, t0)
+            t_far = min(t_far, t1)
+            if t_near > t_far:
+                return None
+        return t_near
+
+    def intersect_ray(self, origin, direction, hit_prims):
+        # Find the nearest primitive hit along a ray. hit_prims(prims) is
+        # called with the primitive ids of each leaf reached and returns
+        # (t, prim) for its nearest hit or None. Nodes are visited near
+        # first and skipped once they are farther than the best hit, so
+        # a typical query only touches O(log n) nodes.
+        if not self.count:
+            return None
+
+        inv_dir = [1 / d if d != 0 else None for d in direction]
+        best = None
+        best_t = float('inf')
+
+        t = self.ray_box(0, origin, inv_dir)
+        stack = [(t, 0)] if t is not None else []
+        while stack:
+            t, node = stack.pop()
+            if t > best_t:
+                continue
+
+            left = self.left[node]
+            if left == -1:
+                start = self.start[node]
+                hit = hit_prims(
+                    self.leaf_order[start:start + self.size[node]])
+                if hit is not None and hit[0] < best_t:
+                    best_t, best = hit[0], hit
+                continue
+
+            right = self.right[node]
+            t_left = self.ray_box(left, origin, inv_dir)
+            t_right = self.ray_box(right, origin, inv_dir)
+
+            # Push the farther child first so the nearer one pops next
+            children = [(t_c, c) for t_c, c in ((t_left, left),
+                                               (t_right, right))
+                        if t_c is not None and t_c <= best_t]
+            children.sort(reverse=True)
+            stack.extend(children)
+        return best
+
+
+class TriangleBVH(BVH):
+    # BVH over the triangles of a mesh that answers ray queries
+
+    def __init__(self, vertices, faces):
+        super().__init__(*self._set_triangles(vertices, faces))
+
+    def _set_triangles(self, vertices, faces):
+        tri = np.asarray(vertices, dtype=float)[:, :3][faces]
+        self.v0 = tri[:, 0]
+        self.edge1 = tri[:, 1] - tri[:, 0]
+        self.edge2 = tri[:, 2] - tri[:, 0]
+        return tri.min(axis=1), tri.max(axis=1)
+
+    def refit_triangles(self, vertices, faces):
+        # Same faces, moved vertices
+        self.refit(*self._set_triangles(vertices, faces))
+
+    def intersect(self, origin, direction):
+        # Nearest triangle hit along a ray as (t, face number), or None
+        def hit_prims(prims):
+            t = intersect_triangles(origin, direction, self.v0[prims],
+                                    self.edge1[prims], self.edge2[prims])
+            nearest = int(np.argmin(t))
+            if t[nearest] == np.inf:
+                return None
+            return float(t[nearest]), prims[nearest]
+
+        return self.intersect_ray(np.asarray(origin, dtype=float).tolist(),
+                                  np.asarray(direction, dtype=float).tolist(),
+                                  hit_prims)
+
+
+def intersect_triangles(origin, direction, v0, edge1, edge2):
+    # Moller-Trumbore ray/triangle test against arrays of triangles given
+    # as a corner and two edges. Returns the hit distance per triangle, inf
+    # where the ray misses. Both sides of a triangle count as a hit.
+    # https://en.wikipedia.org/wiki/M%C3%B6ller%E2%80%93Trumbore_intersection_algorithm
+    direction = np.asarray(direction, dtype=float)
+    p = np.cross(direction, edge2)
+    det = np.einsum('ij,ij->i', edge1, p)
+    valid = np.abs(det) > 1e-12
+    inv_det = np.divide(1.0, det, out=np.zeros_like(det), where=valid)
+
+    s = np.asarray(origin, dtype=float) - v0
+    u = np.einsum('ij,ij->i', s, p) * inv_det
+    q = np.cross(s, edge1)
+    v = (q @ direction) * inv_det
+    t = np.einsum('ij,ij->i', edge2, q) * inv_det
+
+    hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+    return np.where(hit, t, np.inf)
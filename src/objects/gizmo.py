@@ -1,8 +1,10 @@
-from cmu_graphics import *
 from matrix_util import *
+from profiler import profiler
 
 
 class Gizmo:
+    layer = 'overlay'
+
     def __init__(self, size=1.0):
         self.is_editable = False
         self.is_selectable = False
@@ -16,42 +18,38 @@ class Gizmo:
             ([0, 0, 0, 1], [0, 0, size, 1], 'blue'),
         ]
 
-    def render(self, app):
+    def render(self, app, buffer):
+        with profiler.scope('gizmo'):
+            self.draw(app)
+
+    def draw_overlay(self, app):
+        pass
+
+    def draw(self, app):
+        backend = app.backend
         gizmo_size_in_pixels = 40
         offset_x = app.width - 50 - gizmo_size_in_pixels
         offset_y = 50
 
         # Draw background circle
-        drawCircle(offset_x + gizmo_size_in_pixels / 2,
-                   offset_y + gizmo_size_in_pixels / 2, gizmo_size_in_pixels,
-                   fill='white', opacity=20)
+        backend.circle(offset_x + gizmo_size_in_pixels / 2,
+                       offset_y + gizmo_size_in_pixels / 2,
+                       gizmo_size_in_pixels, 'white', opacity=20)
 
         # ignore the view matrix translation
         # so that gizmo is always at the center of the screen
-        view_matrix = [
-            [1, 0, 0, 0],
-            [0, 1, 0, 0],
-            [0, 0, 1, 0],
-            [0, 0, 0, 1]
-        ]
-
-        # only use rotation
-        rotation = [
-            app.camera.view_matrix[0][:3] + [0],
-            app.camera.view_matrix[1][:3] + [0],
-            app.camera.view_matrix[2][:3] + [0],
-            [0, 0, 0, 1]
-        ]
-
-        view_matrix = matrix_multiply(rotation, view_matrix)
-        projection_view = matrix_multiply(
-            app.camera.gizmo_perspective_matrix, view_matrix)
+        # (only use rotation)
+        view = app.camera.view_matrix
+        rotation = Matrix4(view[0][:3] + [0] + view[1][:3] + [0] +
+                           view[2][:3] + [0, 0, 0, 0, 1])
+        projection_view = Matrix4.from_rows(
+            app.camera.gizmo_perspective_matrix) @ rotation
 
         # Render axes
         for start, end, color in self.axes:
             # Apply modified view transformation
-            transformed_start = matrix_vector_multiply(projection_view, start)
-            transformed_end = matrix_vector_multiply(projection_view, end)
+            transformed_start = projection_view.transform(start)
+            transformed_end = projection_view.transform(end)
 
             # Just use transformed start and end points as NDC
             # for orthographic projection
@@ -68,17 +66,16 @@ class Gizmo:
             ]
 
             # Draw line
-            drawLine(screen_start[0], screen_start[1], screen_end[0],
-                     screen_end[1],
-                     fill=color, lineWidth=2)
+            backend.line(screen_start[0], screen_start[1], screen_end[0],
+                         screen_end[1], color, width=2)
 
             # Draw Axis Labels
             if color == 'red':
-                drawLabel('X', screen_end[0],
-                          screen_end[1], fill='red', bold=True)
+                backend.label('X', screen_end[0],
+                              screen_end[1], 'red', bold=True)
             elif color == 'green':
-                drawLabel('Y', screen_end[0],
-                          screen_end[1], fill='green', bold=True)
+                backend.label('Y', screen_end[0],
+                              screen_end[1], 'green', bold=True)
             elif color == 'blue':
-                drawLabel('Z', screen_end[0],
-                          screen_end[1], fill='blue', bold=True)
+                backend.label('Z', screen_end[0],
+                              screen_end[1], 'blue', bold=True)
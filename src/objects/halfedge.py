@@ -0,0 +1,242 @@
+class HalfEdgeMesh:
+    # Half-edge connectivity of a triangle mesh. Half-edge h is corner h of
+    # the index list: it starts at vertex origin[h] and runs to the next
+    # corner of its face, so its face, next and previous half-edges are
+    # arithmetic. Only the opposite half-edge (twin, -1 on boundary edges)
+    # and one outgoing half-edge per vertex are stored. Neighbor queries
+    # cost O(1) per face and O(valence) per vertex, and region queries cost
+    # time in the size of the region rather than the mesh.
+    def __init__(self, indices, vertex_count):
+        self.origin = [int(v) for v in indices]
+        self.twin = [-1] * len(self.origin)
+        self.outgoing = [-1] * vertex_count
+
+        # Pair each half-edge with one running the other way. Edges with
+        # more than two faces leave the extra half-edges unpaired.
+        unpaired = {}
+        for h, a in enumerate(self.origin):
+            b = self.dest(h)
+            twin = unpaired.pop((b, a), None)
+            if twin is None:
+                unpaired[(a, b)] = h
+            else:
+                self.twin[h] = twin
+                self.twin[twin] = h
+        self.update_outgoing(range(len(self.origin)))
+
+    def update_outgoing(self, halfedges):
+        # Point vertices at one of these half-edges leaving them, preferring
+        # boundary ones so that rotating around a vertex reaches all of its
+        # faces
+        origin, twin, outgoing = self.origin, self.twin, self.outgoing
+        for h in halfedges:
+            v = origin[h]
+            current = outgoing[v]
+            if current == -1 or origin[current] != v or \
+                    (twin[h] == -1 and twin[current] != -1):
+                outgoing[v] = h
+
+    @staticmethod
+    def face(h):
+        return h // 3
+
+    @staticmethod
+    def next(h):
+        return h + 1 if h % 3 < 2 else h - 2
+
+    @staticmethod
+    def prev(h):
+        return h - 1 if h % 3 else h + 2
+
+    def dest(self, h):
+        return self.origin[self.next(h)]
+
+    @property
+    def face_count(self):
+        return len(self.origin) // 3
+
+    def is_boundary_edge(self, h):
+        return self.twin[h] == -1
+
+    def is_boundary_vertex(self, v):
+        h = self.outgoing[v]
+        return h != -1 and self.twin[h] == -1
+
+    def face_neighbors(self, f):
+        # Faces sharing an edge with face f
+        return [t // 3 for t in self.twin[3 * f:3 * f + 3] if t != -1]
+
+    def vertex_outgoing(self, v):
+        # Half-edges leaving v, in order around it. Only the fan of faces
+        # connected to outgoing[v] is visited at non-manifold vertices.
+        start = self.outgoing[v]
+        h = start
+        while h != -1:
+            yield h
+            h = self.twin[self.prev(h)]
+            if h == start:
+                break
+
+    def vertex_faces(self, v):
+        return [h // 3 for h in self.vertex_outgoing(v)]
+
+    def vertex_neighbors(self, v):
+        neighbors = []
+        last = -1
+        for h in self.vertex_outgoing(v):
+            neighbors.append(self.dest(h))
+            last = h
+        # On the boundary the last face has one more neighbor
+        if last != -1 and self.twin[self.prev(last)] == -1:
+            neighbors.append(self.origin[self.prev(last)])
+        return neighbors
+
+    def valence(self, v):
+        return len(self.vertex_neighbors(v))
+
+    def next_boundary(self, h):
+        # Boundary half-edge following boundary half-edge h, found by
+        # rotating around the vertex h ends at
+        g = self.next(h)
+        while self.twin[g] != -1:
+            g = self.next(self.twin[g])
+        return g
+
+    def boundary_loop(self, h):
+        # Boundary half-edges of the hole boundary half-edge h borders
+        loop = [h]
+        g = self.next_boundary(h)
+        while g != h and len(loop) <= len(self.origin):
+            loop.append(g)
+            g = self.next_boundary(g)
+        return loop
+
+    def boundary_loops(self):
+        # Every hole in the mesh. Unlike the queries above this visits the
+        # whole mesh.
+        seen = set()
+        loops = []
+        for h, twin in enumerate(self.twin):
+            if twin == -1 and h not in seen:
+                loop = self.boundary_loop(h)
+                seen.update(loop)
+                loops.append(loop)
+        return loops
+
+    def region_boundary(self, faces):
+        # Half-edges of a set of faces whose other side isn't in the set
+        faces = faces if isinstance(faces, set) else set(faces)
+        return [h for f in faces for h in range(3 * f, 3 * f + 3)
+                if self.twin[h] == -1 or self.twin[h] // 3 not in faces]
+
+    def grow(self, faces):
+        # faces plus the faces sharing an edge with them
+        grown = set(faces)
+        for h in self.region_boundary(faces):
+            if self.twin[h] != -1:
+                grown.add(self.twin[h] // 3)
+        return grown
+
+    def shrink(self, faces):
+        # faces without the ones on the edge of the region
+        return set(faces) - {h // 3 for h in self.region_boundary(faces)}
+
+    def edge_loop(self, h):
+        # Half-edges of the edge loop through h: from each end it carries
+        # on through the edge straight across regular (valence 6) vertices
+        # and stops at irregular or boundary vertices
+        loop = [h]
+        edges = {h, self.twin[h]}
+        for g in (h, self.twin[h]):
+            while g != -1:
+                v = self.dest(g)
+                if self.is_boundary_vertex(v) or self.valence(v) != 6:
+                    break
+                # Three edges around from the way we came in
+                g = self.twin[g]
+                for _ in range(3):
+                    g = self.twin[self.prev(g)]
+                if g in edges:
+                    break
+                edges.update((g, self.twin[g]))
+                loop.append(g)
+        return loop
+
+    def edge_ring(self, h, vertices):
+        # Half-edges crossed walking the strip of triangles across h, both
+        # ways. Triangulated quads are crossed by leaving the first
+        # triangle through its longer remaining edge (the quad's diagonal),
+        # then turning the other way in every triangle after it.
+        ring = [h]
+        faces = set()
+        for entry in (h, self.twin[h]):
+            turn = None
+            while entry != -1 and entry // 3 not in faces:
+                faces.add(entry // 3)
+                if turn is None:
+                    turn = self.longer_exit(entry, vertices)
+                else:
+                    turn = not turn
+                exit = self.next(entry) if turn else self.prev(entry)
+                entry = self.twin[exit]
+                if entry != -1 and entry // 3 not in faces:
+                    ring.append(exit)
+        return ring
+
+    def longer_exit(self, h, vertices):
+        # True if next(h) is longer than prev(h)
+        def length(g):
+            a = vertices[self.origin[g]]
+            b = vertices[self.dest(g)]
+            return sum((a[i] - b[i]) ** 2 for i in range(3))
+        return length(self.next(h)) >= length(self.prev(h))
+
+    def extrude_region(self, faces):
+        # Detach a set of faces along its boundary and join it back with a
+        # wall of two triangles per boundary edge. Boundary vertices get
+        # copies numbered after the existing vertices; the region's
+        # corners move to the copies and the wall's triangles are appended
+        # after the existing faces. Only the region and its boundary are
+        # visited. Returns {vertex: copy}.
+        faces = set(faces)
+        boundary = self.region_boundary(faces)
+        edges = [(self.origin[h], self.dest(h)) for h in boundary]
+        old_twins = [self.twin[h] for h in boundary]
+
+        copies = {}
+        for a, b in edges:
+            for v in (a, b):
+                if v not in copies:
+                    copies[v] = len(self.outgoing) + len(copies)
+        self.outgoing.extend([-1] * len(copies))
+
+        region = [h for f in faces for h in range(3 * f, 3 * f + 3)]
+        for h in region:
+            self.origin[h] = copies.get(self.origin[h], self.origin[h])
+
+        # Wall quad a, b, b', a' under each boundary edge a -> b. Its
+        # half-edges pair up with each other, with the region's moved edge
+        # and with the face that was across the edge.
+        affected = list(boundary)
+        start = len(self.origin)
+        for (a, b), twin in zip(edges, old_twins):
+            self.origin += [a, b, copies[b], a, copies[b], copies[a]]
+            if twin != -1:
+                affected.append(twin)
+        self.twin += [-1] * (len(self.origin) - start)
+        affected += range(start, len(self.origin))
+
+        unpaired = {}
+        for h in affected:
+            self.twin[h] = -1
+        for h in affected:
+            a, b = self.origin[h], self.dest(h)
+            twin = unpaired.pop((b, a), None)
+            if twin is None:
+                unpaired[(a, b)] = h
+            else:
+                self.twin[h] = twin
+                self.twin[twin] = h
+
+        self.update_outgoing(region + list(range(start, len(self.origin))))
+        return copies
@@ -0,0 +1,275 @@
+import numpy as np
+
+from matrix_util import *
+from rendering.backends import to_rgb
+from rendering.triangle_buffer import color_id
+from objects.mesh import Mesh
+
+
+def grid_transforms(counts=(10, 10, 10), spacing=1.5):
+    # Translations laying instances out on a grid centered on the origin
+    axes = [(np.arange(n) - (n - 1) / 2) * spacing for n in counts]
+    offsets = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1)
+    transforms = np.tile(np.eye(4), (offsets[..., 0].size, 1, 1))
+    transforms[:, :3, 3] = offsets.reshape(-1, 3)
+    return transforms
+
+
+class InstancedMesh(Mesh):
+    # Many copies of one mesh drawn as a single object. The copies share the
+    # source mesh's vertex and index buffers (and its picking BVH); each
+    # instance only adds a 4x4 transform, applied before transform_matrix,
+    # and a color the shading is tinted with. Every instance is projected
+    # in one batched matrix product, and faces are numbered instance by
+    # instance, so face f of instance k is face k * face_count + f.
+    def __init__(self, mesh, transforms=(), colors=None):
+        super().__init__(mesh.vertices, mesh.indices, mesh.shading_model,
+                         is_editable=False)
+        self.base = mesh
+        self.name = f"{getattr(mesh, 'name', type(mesh).__name__)} Instances"
+        self.backface_culling = mesh.backface_culling
+
+        self.instance_transforms = np.zeros((0, 4, 4))
+        self.instance_colors = np.zeros((0, 3))
+        self.selected_instance = None
+        self._instance_faces = None
+        self._instance_faces_key = None
+        self._instance_inverse = None
+        self._instance_inverse_key = None
+
+        self.add_instances(transforms, colors)
+
+    @property
+    def face_count(self):
+        # Faces per instance
+        return len(self.base.face_array)
+
+    def add_instance(self, matrix=None, color='white'):
+        # Returns the new instance's id
+        matrix = np.eye(4) if matrix is None else matrix
+        return self.add_instances([matrix], [color])[0]
+
+    def add_instances(self, transforms, colors=None):
+        # Adds one instance per 4x4 transform in a single copy of the
+        # instance arrays, and returns the new instances' ids. colors is
+        # a color per instance, or a K x 3 array of RGB; white by default.
+        transforms = np.asarray(transforms, dtype=float).reshape(-1, 4, 4)
+        if colors is None:
+            colors = np.full((len(transforms), 3), 255.0)
+        elif not isinstance(colors, np.ndarray):
+            colors = [to_rgb(color) for color in colors]
+        colors = np.asarray(colors, dtype=float).reshape(-1, 3)
+        if len(colors) != len(transforms):
+            raise ValueError('Expected a color per instance')
+
+        first = len(self.instance_transforms)
+        self.instance_transforms = np.concatenate(
+            [self.instance_transforms, transforms])
+        self.instance_colors = np.concatenate(
+            [self.instance_colors, colors])
+        self.mark_instances_dirty()
+        return range(first, len(self.instance_transforms))
+
+    def set_instance_transform(self, instance, matrix):
+        self.instance_transforms[instance] = matrix
+        self.mark_instances_dirty()
+
+    def set_instance_color(self, instance, color):
+        self.instance_colors[instance] = to_rgb(color)
+        self.mark_instances_dirty()
+
+    def mark_instances_dirty(self):
+        # Instance transforms and colors count as part of the object's
+        # transform, so everything keyed on transform_version follows them
+        self.mark_transform_dirty()
+
+    def instance_of_face(self, face):
+        return face // self.face_count
+
+    @property
+    def face_array(self):
+        # Faces of every instance, indexing the vertices of all instances
+        # stacked in instance order
+        key = (self.geometry_version, len(self.instance_transforms))
+        if key != self._instance_faces_key:
+            offsets = np.arange(len(self.instance_transforms)) * \
+                len(self.base.vertex_array)
+            self._instance_faces = (self.base.face_array[None] +
+                                    offsets[:, None, None]).reshape(-1, 3)
+            self._instance_faces_key = key
+        return self._instance_faces
+
+    @property
+    def bvh(self):
+        # Picking runs against the shared geometry in each instance's space
+        return self.base.bvh
+
+    def box_corners(self):
+        # Corners of the shared geometry's box in every instance
+        corners = self.base.box_corners()
+        return (corners @ self.instance_transforms[:, :3, :3].transpose(
+            0, 2, 1) + self.instance_transforms[:, None, :3, 3]).reshape(-1, 3)
+
+    def on_pick(self, face):
+        self.selected_instance = self.instance_of_face(face)
+
+    def model_matrices(self):
+        # transform_matrix @ instance transform, one per instance
+        return np.asarray(self.transform_matrix, dtype=float) @ \
+            self.instance_transforms
+
+    def project_vertices(self, app):
+        if not len(self.vertices) or not len(self.instance_transforms):
+            self.clip_coords = np.zeros((0, 4))
+            self.clip_matrix = np.array(app.camera.projection_view_matrix,
+                                        dtype=float) @ \
+                np.array(self.transform_matrix, dtype=float)
+            return np.zeros((0, 3))
+        return self.project_vertices_numpy(app)
+
+    def project_vertices_numpy(self, app):
+        # All instances at once: K projection-view-model matrices applied to
+        # the shared vertices in one batched product, giving the K x N
+        # vertices of every instance stacked in instance order
+        projection_view = np.array(app.camera.projection_view_matrix,
+                                   dtype=float)
+        matrices = projection_view @ self.model_matrices()
+        clip = (self.base.vertex_array @ matrices.transpose(0, 2, 1))
+        clip = clip.reshape(-1, 4)
+        self.clip_coords = clip
+
+        # Picking rays start out in the space instance transforms apply in
+        self.clip_matrix = projection_view @ \
+            np.array(self.transform_matrix, dtype=float)
+        return self.clip_to_screen_numpy(app, clip)
+
+    def clip_face(self, app, face, cull, raster=False, faces=None):
+        return super().clip_face(app, face, cull, raster,
+                                 self.face_array if faces is None else faces)
+
+    def face_normals(self, lod=None):
+        # Object-space normals of one instance
+        return self.base.face_normals()
+
+    def world_face_normals(self, lod=None):
+        # Normals of every instance, transformed by each model matrix's
+        # inverse-transpose (see normal_matrix())
+        key = (self.geometry_version, self.transform_version)
+        if key == self._world_normals_key:
+            return self._world_normals
+
+        m = self.model_matrices()[:, :3, :3]
+        cofactors = np.stack([np.cross(m[:, 1], m[:, 2]),
+                              np.cross(m[:, 2], m[:, 0]),
+                              np.cross(m[:, 0], m[:, 1])], axis=1)
+        det = np.einsum('ki,ki->k', m[:, 0], cofactors[:, 0])
+        det[det == 0] = 1
+        matrices = cofactors / det[:, None, None]
+
+        normals = np.asarray(self.face_normals(), dtype=float)
+        normals = np.einsum('fj,kij->kfi', normals, matrices).reshape(-1, 3)
+        self._world_normals = normals
+        self._world_normals_key = key
+        return normals
+
+    def face_colors(self, app, lod=None):
+        # Shaded colors of every instance's faces, tinted by its color
+        light_dir = app.world.get_light_direction()
+        key = (self.geometry_version, self.transform_version,
+               tuple(light_dir) if light_dir else None)
+        if key == self._face_colors_key:
+            return self._face_colors
+
+        count = len(self.instance_transforms) * self.face_count
+        if self.shading_model:
+            shades = self.shading_model.shade_faces(
+                self.world_face_normals(), light_dir)
+        else:
+            shades = ['white'] * count
+        rgb = {color: to_rgb(color) for color in set(shades)}
+        shaded = np.array([rgb[color] for color in shades],
+                          dtype=float).reshape(-1, self.face_count, 3)
+        tinted = (shaded * self.instance_colors[:, None] / 255).astype(int)
+
+        # One palette entry per distinct color
+        colors, inverse = np.unique(tinted.reshape(-1, 3), axis=0,
+                                    return_inverse=True)
+        ids = np.array([color_id(tuple(color))
+                        for color in colors.tolist()], dtype=np.intp)
+        self._face_colors = ids[inverse.reshape(-1)].tolist()
+        self._face_colors_key = key
+        return self._face_colors
+
+    def draw_overlay(self, app):
+        pass  # instances can't be edited
+
+    def instance_transforms_inverse(self):
+        if self._instance_inverse_key != self.transform_version:
+            self._instance_inverse = np.linalg.pinv(self.instance_transforms)
+            self._instance_inverse_key = self.transform_version
+        return self._instance_inverse
+
+    def intersect_local(self, origin, direction):
+        # Nearest face hit by a ray as (t, face number) over all instances,
+        # or None. The ray is moved into each instance's space and tested
+        # against the shared geometry's bounding box for every instance at
+        # once; only instances it enters are traced through the BVH,
+        # nearest box first.
+        if not len(self.indices) or not len(self.instance_transforms):
+            return None
+
+        inverse = self.instance_transforms_inverse()
+        origins = inverse[:, :3, :3] @ origin + inverse[:, :3, 3]
+        directions = inverse[:, :3, :3] @ direction
+
+        # Slab test against the shared box, in every instance at once.
+        # Axes the ray runs parallel to give NaN and are skipped by
+        # fmax/fmin.
+        points = self.base.vertex_array[:, :3]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t0 = (points.min(axis=0) - origins) / directions
+            t1 = (points.max(axis=0) - origins) / directions
+        t_near = np.fmax.reduce(np.fmin(t0, t1), axis=1)
+        t_far = np.fmin.reduce(np.fmax(t0, t1), axis=1)
+        t_near = np.fmax(t_near, 0)
+        entered = np.nonzero(t_near <= t_far)[0]
+
+        best = None
+        for instance in entered[np.argsort(t_near[entered])].tolist():
+            if best is not None and t_near[instance] > best[0]:
+                break
+            hit = self.bvh.intersect(origins[instance], directions[instance])
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = (hit[0], instance * self.face_count + int(hit[1]))
+        return best
+
+    def instance_at(self, x, y):
+        # Id of the frontmost instance under a screen point, or None
+        hit = self.raycast(x, y)
+        return None if hit is None else self.instance_of_face(hit[1])
+
+    def transform_instance(self, instance, matrix):
+        # Apply a world-space transform to one instance
+        model = np.asarray(self.transform_matrix, dtype=float)
+        self.instance_transforms[instance] = np.linalg.pinv(model) @ \
+            np.asarray(matrix, dtype=float) @ model @ \
+            self.instance_transforms[instance]
+        self.mark_instances_dirty()
+
+    def apply_translation(self, move_vector):
+        if self.selected_instance is None:
+            return super().apply_translation(move_vector)
+        self.transform_instance(self.selected_instance,
+                                translation_matrix(*move_vector))
+
+    def apply_rotation(self, angle, axis):
+        if self.selected_instance is None:
+            return super().apply_rotation(angle, axis)
+        self.transform_instance(self.selected_instance,
+                                rotation_matrix(angle, axis))
+
+    def apply_scaling(self, scale_vector):
+        if self.selected_instance is None:
+            return super().apply_scaling(scale_vector)
+        self.transform_instance(self.selected_instance,
+                                scaling_matrix(*scale_vector))
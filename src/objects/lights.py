@@ -1,6 +1,6 @@
 from matrix_util import *
-from cmu_graphics import *
 from objects.primatives import Mesh
+from rendering.triangle_buffer import *
 
 
 class Light(Mesh):
@@ -29,9 +29,15 @@ class Light(Mesh):
 
         return [x, y, z]
 
+    def position(self):
+        return [self.x, self.y, self.z]
+
+    def draw_overlay(self, app):
+        pass
+
 
 class PointLight(Light):
-    def render(self, app):
+    def render(self, app, buffer):
         # Transform point to screen space
         world_point = [self.x, self.y, self.z, 1]
         transformed_point = matrix_vector_multiply(
@@ -60,19 +66,10 @@ class PointLight(Light):
             py = y + size * math.sin(angle)
             points.extend([px, py])
 
-        border = 'orange' if app.selected_object == self else None
-
-        # Return a single polygon
-        triangles = [{
-            'depth': z,
-            'points': points,
-            'color': 'yellow',
-            'opacity': 90,
-            'border': border,
-            'borderWidth': 2 if border else 0
-        }]
+        flags = FLAG_OUTLINE_THICK if app.selected_object == self else 0
 
-        return triangles
+        # Add a single polygon
+        buffer.append(points, z, 'yellow', flags, opacity=90)
 
     def check_selection(self, mouseX, mouseY):
         # Assume circular selection area
@@ -88,3 +85,4 @@ class PointLight(Light):
         self.x += move_vector[0]
         self.y += move_vector[1]
         self.z += move_vector[2]
+        self.mark_transform_dirty()
@@ -0,0 +1,202 @@
+import heapq
+
+import numpy as np
+
+# Boundary edges get a plane perpendicular to their face with this weight so
+# open borders don't shrink away
+BOUNDARY_WEIGHT = 100.0
+
+
+class DetailLevel:
+    # One level of detail of a GeometryAsset. The faces index the asset's
+    # own vertices, so a mesh can reuse its projected vertices for any
+    # level. error is the object-space distance the level may stray from
+    # the full mesh.
+    def __init__(self, index, vertices, faces, error):
+        self.index = index
+        self.faces = faces
+        self.error = error
+
+        tri = vertices[:, :3][faces]
+        self.face_normals = np.cross(tri[:, 1] - tri[:, 0],
+                                     tri[:, 2] - tri[:, 0])
+        self.faces.flags.writeable = False
+        self.face_normals.flags.writeable = False
+
+    def __len__(self):
+        return len(self.faces)
+
+
+def build_levels(vertices, faces, ratio=0.5, min_faces=64):
+    # Level 0 is the full mesh, every following level has about ratio times
+    # the faces of the one before, down to min_faces
+    levels = [DetailLevel(0, vertices, faces, 0.0)]
+    targets = []
+    target = int(len(faces) * ratio)
+    while target >= min_faces:
+        targets.append(target)
+        target = int(target * ratio)
+
+    for faces, error in decimate(vertices, faces, targets):
+        if len(faces) >= len(levels[-1].faces):
+            break  # decimation got stuck
+        levels.append(DetailLevel(len(levels), vertices, faces, error))
+    return levels
+
+
+def decimate(vertices, faces, targets):
+    # Quadric error metric edge collapse (Garland and Heckbert), yielding
+    # (faces, error) each time the face count drops to the next of the
+    # descending targets. Edges collapse onto one of their endpoints
+    # instead of an optimal new position, so every level uses a subset of
+    # the original vertices.
+    # https://www.cs.cmu.edu/~./garland/Papers/quadrics.pdf
+    points = np.asarray(vertices, dtype=float)[:, :3]
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    quadrics = _vertex_quadrics(points, faces)
+
+    face_list = faces.tolist()
+    alive = [True] * len(face_list)
+    vertex_faces = [set() for _ in range(len(points))]
+    for f, face in enumerate(face_list):
+        for v in face:
+            vertex_faces[v].add(f)
+
+    # Heap of (cost, src, dst, stamps) for collapsing src onto dst.
+    # Entries go stale when either endpoint changes; stamps tell them apart.
+    homogeneous = np.concatenate([points, np.ones((len(points), 1))], axis=1)
+    stamp = [0] * len(points)
+
+    def collapse_costs(src, dst):
+        # Error of dst's position under the combined quadric of both ends
+        q = quadrics[src] + quadrics[dst]
+        p = homogeneous[dst]
+        return np.einsum('ki,kij,kj->k', p, q, p).tolist()
+
+    def push_edges(v):
+        others = np.fromiter(_neighbors(face_list, vertex_faces, v),
+                             dtype=np.int64)
+        ends = np.full(len(others), v)
+        for src, dst, costs in ((others, ends, collapse_costs(others, ends)),
+                                (ends, others, collapse_costs(ends, others))):
+            for cost, s, d in zip(costs, src.tolist(), dst.tolist()):
+                heapq.heappush(heap, (cost, s, d, stamp[s], stamp[d]))
+
+    edges = np.unique(np.sort(np.concatenate(
+        [faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]), axis=1),
+        axis=0)
+    heap = []
+    for src, dst in ((edges[:, 0], edges[:, 1]), (edges[:, 1], edges[:, 0])):
+        heap.extend((cost, s, d, 0, 0) for cost, s, d in zip(
+            collapse_costs(src, dst), src.tolist(), dst.tolist()))
+    heapq.heapify(heap)
+
+    face_count = len(face_list)
+    error = 0.0
+    targets = list(targets)
+    while targets and heap:
+        cost, src, dst, src_stamp, dst_stamp = heapq.heappop(heap)
+        if stamp[src] != src_stamp or stamp[dst] != dst_stamp or \
+                not vertex_faces[src] or not vertex_faces[dst]:
+            continue
+        shared = vertex_faces[src] & vertex_faces[dst]
+        if not shared or not _can_collapse(points, face_list, vertex_faces,
+                                           src, dst, shared):
+            continue
+
+        # Move src onto dst: faces with both disappear, the rest are
+        # rewired to dst
+        for f in vertex_faces[src]:
+            face = face_list[f]
+            if f in shared:
+                alive[f] = False
+                face_count -= 1
+                for v in face:
+                    if v != src:
+                        vertex_faces[v].discard(f)
+            else:
+                face[face.index(src)] = dst
+                vertex_faces[dst].add(f)
+        vertex_faces[src] = set()
+        quadrics[dst] = quadrics[dst] + quadrics[src]
+        stamp[src] += 1
+        stamp[dst] += 1
+        error = max(error, cost)
+        push_edges(dst)
+
+        while targets and face_count <= targets[0]:
+            targets.pop(0)
+            level = np.array([face for f, face in enumerate(face_list)
+                              if alive[f]], dtype=np.intp).reshape(-1, 3)
+            yield level, float(np.sqrt(max(error, 0.0)))
+
+
+def _vertex_quadrics(points, faces):
+    # Sum of the squared-distance quadrics of the planes around each vertex
+    tri = points[faces]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.where(lengths == 0, 1, lengths)
+    planes = np.concatenate(
+        [normals, -(normals * tri[:, 0]).sum(axis=1, keepdims=True)], axis=1)
+    face_quadrics = planes[:, :, None] * planes[:, None, :]
+
+    quadrics = np.zeros((len(points), 4, 4))
+    for k in range(3):
+        np.add.at(quadrics, faces[:, k], face_quadrics)
+
+    # Edges used by only one face are on a border
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]],
+                            faces[:, [2, 0]]])
+    owner = np.tile(np.arange(len(faces)), 3)
+    keys = np.sort(edges, axis=1)
+    _, inverse, counts = np.unique(keys, axis=0, return_inverse=True,
+                                   return_counts=True)
+    border = counts[inverse.reshape(-1)] == 1
+    if border.any():
+        a = points[edges[border, 0]]
+        b = points[edges[border, 1]]
+        side = np.cross(b - a, normals[owner[border]])
+        lengths = np.linalg.norm(side, axis=1, keepdims=True)
+        side = side / np.where(lengths == 0, 1, lengths)
+        planes = np.concatenate(
+            [side, -(side * a).sum(axis=1, keepdims=True)], axis=1)
+        border_quadrics = BOUNDARY_WEIGHT * \
+            planes[:, :, None] * planes[:, None, :]
+        np.add.at(quadrics, edges[border, 0], border_quadrics)
+        np.add.at(quadrics, edges[border, 1], border_quadrics)
+    return quadrics
+
+
+def _neighbors(face_list, vertex_faces, v):
+    neighbors = set()
+    for f in vertex_faces[v]:
+        neighbors.update(face_list[f])
+    neighbors.discard(v)
+    return neighbors
+
+
+def _can_collapse(points, face_list, vertex_faces, src, dst, shared):
+    # Reject collapses that would pinch the surface into a non-manifold
+    # shape or flip one of the faces that move
+    common = _neighbors(face_list, vertex_faces, src) & \
+        _neighbors(face_list, vertex_faces, dst)
+    if len(common) > len(shared):
+        return False
+
+    moving = list(vertex_faces[src] - shared)
+    if not moving:
+        return True
+    corners = np.array([face_list[f] for f in moving])
+    before = _normals(points[corners])
+    after = points[corners]
+    after[corners == src] = points[dst]
+    return bool(((before * _normals(after)).sum(axis=1) > 0).all())
+
+
+def _normals(tri):
+    # Unnormalized normals of N x 3 x 3 triangles, np.cross is slow for
+    # small arrays
+    a = tri[:, 1] - tri[:, 0]
+    b = tri[:, 2] - tri[:, 0]
+    return a[:, [1, 2, 0]] * b[:, [2, 0, 1]] - a[:, [2, 0, 1]] * b[:, [1, 2, 0]]
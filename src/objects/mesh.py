@@ -1,9 +1,54 @@
+import numpy as np
+
 from matrix_util import *
-from cmu_graphics import *
 from rendering.shading import *
+from rendering.triangle_buffer import *
+from profiler import profiler
+from objects.halfedge import HalfEdgeMesh
+from objects.bvh import TriangleBVH
+from objects.vertex_grid import VertexGrid
+
+# Vertices within this many pixels of the nearest one under the mouse count
+# as equally near and the one in front is picked
+VERTEX_TIE_DISTANCE = 0.5
+
+
+def screen_ray(matrix, x, y, width, height, is_ortho):
+    # Ray through a screen point as (origin, direction) in the space the
+    # clip matrix projects from. Points along it at t >= 0 are in front of
+    # the near plane.
+    matrix = np.asarray(matrix, dtype=float)
+    ndc_x = x / (width / 2) - 1
+    ndc_y = 1 - y / (height / 2)
+
+    if is_ortho:
+        # Orthographic mode uses clip x and y without the divide, so
+        # solve for two points with the same clip x and y
+        rows = np.array([matrix[0], matrix[1], matrix[2], [0, 0, 0, 1]])
+        near = np.linalg.solve(rows, [ndc_x, ndc_y, -1e3, 1])
+        far = np.linalg.solve(rows, [ndc_x, ndc_y, 1e3, 1])
+    else:
+        inverse = np.linalg.inv(matrix)
+        near = inverse @ [ndc_x, ndc_y, -1, 1]
+        far = inverse @ [ndc_x, ndc_y, 1, 1]
+        near = near / near[3]
+        far = far / far[3]
+    return near[:3], far[:3] - near[:3]
 
 
 class Mesh:
+    # Project vertices with whole-array NumPy operations. Set to False for
+    # the original pure-Python pipeline, which the benchmarks and tests
+    # compare against.
+    use_numpy = True
+
+    # Part of the frame the mesh is drawn in, see rendering/layers.py
+    layer = 'scene'
+
+    # Bumped whenever any mesh is moved or edited, so scene-wide caches can
+    # tell that nothing changed without checking every mesh
+    edits = 0
+
     def __init__(self, vertices, indices, shading_model=Lambertian(),
                  is_editable=False, is_selectable=True):
         self.vertices = vertices  # List of [x,y,z,w] vertices
@@ -20,139 +65,705 @@ class Mesh:
         self.transform_matrix = identity_matrix()
         self.selection_mode = 'vertex'  # 'vertex' or 'face'
         self.selected_face = None
+        # Face numbers selected in face mode, grown and shrunk around
+        # selected_face (an index into self.indices)
+        self.selected_region = set()
+
+        # Array copies of vertices/indices for the NumPy render path,
+        # rebuilt lazily after the geometry is edited
+        self._vertex_array = None
+        self._face_array = None
+
+        # Bumped whenever transform_matrix or the geometry changes so
+        # cached screen coordinates and triangles can be reused otherwise
+        self.transform_version = 0
+        self.geometry_version = 0
+        self.topology_version = 0
+        self.screen_array = None
+        self._projection_key = None
+        self._triangles = None
+        self._triangles_key = None
+        self.clip_coords = None
+
+        # Projection used for the last render, needed to turn screen
+        # points back into rays for picking
+        self.clip_matrix = None
+        self.viewport = None
+
+        # Object-space triangle BVH for picking, built on first use
+        self._bvh = None
+        self._bvh_version = None
+        self._bvh_topology = None
+
+        # Half-edge connectivity for neighbor queries, built on first use and
+        # updated by edits that change faces, see halfedges
+        self._halfedges = None
+        self._halfedges_topology = None
+
+        # Screen-space grid over the projected vertices for vertex picking,
+        # built once per projection
+        self._vertex_grid = None
+        self._vertex_grid_key = None
+
+        # World-space bounds and inverse transform for scene picking, see
+        # rendering/picking.py
+        self._corners = None
+        self._corners_version = None
+        self._bounds = None
+        self._bounds_key = None
+        self._inverse_transform = None
+        self._inverse_key = None
+
+        # Shared GeometryAsset this mesh's vertices and indices belong to.
+        # The geometry is copied on the first edit, see
+        # make_geometry_private().
+        self.asset = None
+
+        # Skip triangles facing away from the camera. Edit mode keeps them
+        # unless cull_in_edit_mode is set.
+        self.backface_culling = True
+        self.cull_in_edit_mode = False
+
+        # Face normals are cached per geometry version and shaded colors
+        # per geometry, transform and light direction
+        self._face_normals = None
+        self._face_normals_version = None
+        self._world_normals = None
+        self._world_normals_key = None
+        self._face_colors = None
+        self._face_colors_key = None
+
+        # Level of detail drawn last frame (a DetailLevel of the asset), see
+        # select_lod()
+        self.lod = None
+        self._lod_key = None
+
+    @property
+    def vertex_array(self):
+        # Nx4 array of homogeneous vertices
+        if self._vertex_array is None:
+            self._vertex_array = np.asarray(self.vertices, dtype=float)
+        return self._vertex_array
+
+    @property
+    def face_array(self):
+        # Fx3 array of vertex indices, one row per triangle. Meshes sharing
+        # an asset share its faces too.
+        if self.asset is not None:
+            return self.asset.faces
+        if self._face_array is None:
+            self._face_array = np.asarray(
+                self.indices, dtype=np.intp).reshape(-1, 3)
+        return self._face_array
+
+    def mark_geometry_dirty(self, topology_changed=False):
+        # Call after editing self.vertices or self.indices in place.
+        # topology_changed should be set when faces were added or removed.
+        self._vertex_array = None
+        self._face_array = None
+        self.geometry_version += 1
+        Mesh.edits += 1
+        if topology_changed:
+            self.topology_version += 1
+
+    def make_geometry_private(self):
+        # Copy-on-write: meshes created from a GeometryAsset share its
+        # read-only arrays until they are edited, then get their own lists
+        if self.asset is None:
+            return
+        self.vertices = self.vertices.tolist()
+        self.indices = self.indices.tolist()
+        self.asset = None
+        self.mark_geometry_dirty(topology_changed=True)
+
+    def mark_transform_dirty(self):
+        # Call after changing self.transform_matrix
+        self.transform_version += 1
+        Mesh.edits += 1
+
+    def update_screen_coords(self, app):
+        # Re-project only if the camera, transform or geometry changed
+        # since the last call. Returns True if screen_coords were updated.
+        key = (app.camera.version, self.transform_version,
+               self.geometry_version, app.is_ortho, app.width, app.height)
+        if key == self._projection_key:
+            return False
+
+        screen_coords = self.project_vertices(app)
+        self.viewport = (app.width, app.height, app.is_ortho)
+        if isinstance(screen_coords, list):
+            self.screen_array = None
+            self.screen_coords = screen_coords
+        else:
+            self.screen_array = screen_coords
+            self.screen_coords = screen_coords.tolist()
+        self._projection_key = key
+        return True
+
+    def project_vertices(self, app):
+        # Returns the screen coordinates [x, y, depth] of every vertex and
+        # keeps the clip-space coordinates for near-plane clipping
+        if self.use_numpy and len(self.vertices):
+            return self.project_vertices_numpy(app)
 
-    def render(self, app):
         # Perspective projection
         # https://www.scratchapixel.com/lessons/3d-basic-rendering/perspective-and-orthographic-projection-matrix/building-basic-perspective-projection-matrix.html
 
-        # Apply transformations to vertices
-        transformed_vertices = [matrix_vector_multiply(
-            app.camera.projection_view_matrix,
-            matrix_vector_multiply(self.transform_matrix, v)
-        ) for v in self.vertices]
+        # Apply transformations to vertices, with the model and
+        # projection-view matrices combined first
+        matrix = Matrix4.from_rows(app.camera.projection_view_matrix) @ \
+            Matrix4.from_rows(self.transform_matrix)
+        transformed_vertices = [matrix.transform(v) for v in self.vertices]
+        self.clip_coords = transformed_vertices
+        self.clip_matrix = matrix.rows()
+
+        return [self.clip_to_screen(app, point)
+                for point in transformed_vertices]
+
+    def project_vertices_numpy(self, app):
+        # Same as project_vertices but on the whole Nx4 vertex array at once.
+        # The model and projection-view matrices are combined first so each
+        # vertex is only multiplied by one matrix.
+        matrix = np.array(app.camera.projection_view_matrix, dtype=float) @ \
+            np.array(self.transform_matrix, dtype=float)
+        clip = self.vertex_array @ matrix.T
+        self.clip_coords = clip
+        self.clip_matrix = matrix
+        return self.clip_to_screen_numpy(app, clip)
+
+    @staticmethod
+    def clip_to_screen_numpy(app, clip):
+        # clip_to_screen() for an Nx4 array of clip-space points
+        if app.is_ortho:
+            ndc = clip[:, :3]
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ndc = clip[:, :3] / clip[:, 3:4]
+
+        screen = np.empty_like(ndc)
+        screen[:, 0] = (ndc[:, 0] + 1) * (app.width / 2)
+        screen[:, 1] = (1 - ndc[:, 1]) * (app.height / 2)
+        screen[:, 2] = ndc[:, 2]
+        return screen
 
+    @staticmethod
+    def clip_to_screen(app, point):
         # Perspective division and conversion to NDC
-        ndc = []
-        for point in transformed_vertices:
-            if app.is_ortho:
-                ndc.append(point[:3])
-            else:
-                ndc.append([point[0]/point[3], point[1] /
-                           point[3], point[2]/point[3]])
+        if app.is_ortho:
+            x, y, z = point[:3]
+        elif point[3] == 0:
+            return [float('nan')] * 3
+        else:
+            x, y, z = point[0]/point[3], point[1]/point[3], point[2]/point[3]
 
         # Screen space conversion
-        screen_coords = [[(x + 1) * (app.width / 2), (1 - y) *
-                          (app.height / 2), z] for x, y, z in ndc]
+        return [(x + 1) * (app.width / 2), (1 - y) * (app.height / 2), z]
+
+    @staticmethod
+    def inset_triangle(v0, v1, v2):
+        # Inset vertices slightly away from center
+        # to avoid z-fighting (overlapping triangles)
+        inset = 1.01
+        cx = (v0[0] + v1[0] + v2[0]) / 3
+        cy = (v0[1] + v1[1] + v2[1]) / 3
+        return [cx + (v0[0] - cx) * inset, cy + (v0[1] - cy) * inset,
+                cx + (v1[0] - cx) * inset, cy + (v1[1] - cy) * inset,
+                cx + (v2[0] - cx) * inset, cy + (v2[1] - cy) * inset]
+
+    def culls_backfaces(self, app):
+        # Edit mode can keep back faces so hidden geometry stays selectable
+        if app.edit_mode and not self.cull_in_edit_mode:
+            return False
+        return self.backface_culling
+
+    def clip_face(self, app, face, cull, raster=False, faces=None):
+        # Clip a triangle that crosses the near plane and return the
+        # screen-space points, depth and vertex depths of the triangles left
+        # in front of it. faces replaces self.indices for levels of detail.
+        if faces is None:
+            corners = self.indices[face * 3:face * 3 + 3]
+        else:
+            corners = faces[face]
+        polygon = clip_polygon_near([
+            list(self.clip_coords[idx]) for idx in corners])
 
-        # Render with drawPolygon
         triangles = []
+        screen = [self.clip_to_screen(app, point) for point in polygon]
+        for k in range(1, len(screen) - 1):
+            v0, v1, v2 = screen[0], screen[k], screen[k + 1]
+            if cull and screen_winding(v0, v1, v2) >= 0:
+                continue
+            if raster:
+                points = [v0[0], v0[1], v1[0], v1[1], v2[0], v2[1]]
+            else:
+                points = self.inset_triangle(v0, v1, v2)
+            triangles.append((points, (v0[2] + v1[2] + v2[2]) / 3,
+                              [v0[2], v1[2], v2[2]]))
+        return triangles
+
+    def build_triangles(self, app, screen_coords, cull, raster=False):
+        # Returns the screen-space points, average depth and color of every
+        # triangle that survives near-plane clipping and backface culling.
+        # For the rasterizer the depth of each vertex is returned too and
+        # the triangles aren't inset, since the depth buffer resolves
+        # overlaps.
+        colors = self.face_colors(app)
+        tri_points = []
+        depths = []
+        color_ids = []
+        vertex_depths = [] if raster else None
         for i in range(0, len(self.indices), 3):
             idx0 = self.indices[i]
             idx1 = self.indices[i+1]
             idx2 = self.indices[i+2]
 
+            if not app.is_ortho:
+                # Triangles behind the camera are dropped and the ones
+                # crossing the near plane are clipped to it
+                inside = [self.clip_coords[idx][2] + self.clip_coords[idx][3]
+                          >= 0 for idx in (idx0, idx1, idx2)]
+                if not all(inside):
+                    if any(inside):
+                        for points, depth, zs in self.clip_face(
+                                app, i // 3, cull, raster):
+                            tri_points.append(points)
+                            depths.append(depth)
+                            color_ids.append(colors[i // 3])
+                            if raster:
+                                vertex_depths.append(zs)
+                    continue
+
             # Get screen coordinates for each vertex
             v0 = screen_coords[idx0]
             v1 = screen_coords[idx1]
             v2 = screen_coords[idx2]
 
-            # Calculate center point
-            center = [
-                (v0[0] + v1[0] + v2[0]) / 3,
-                (v0[1] + v1[1] + v2[1]) / 3
-            ]
+            # Projected triangles wound clockwise on screen face away
+            if cull and screen_winding(v0, v1, v2) >= 0:
+                continue
 
+            if raster:
+                tri_points.append([v0[0], v0[1], v1[0], v1[1], v2[0], v2[1]])
+                vertex_depths.append([v0[2], v1[2], v2[2]])
+            else:
+                tri_points.append(self.inset_triangle(v0, v1, v2))
+            depths.append((v0[2] + v1[2] + v2[2]) / 3)
+            color_ids.append(colors[i // 3])
+        return tri_points, depths, color_ids, vertex_depths
+
+    def build_triangles_numpy(self, app, screen, cull, raster=False,
+                              lod=None):
+        # Vectorized version of the per-triangle loop in build_triangles().
+        # With a level of detail its faces are drawn instead of the mesh's.
+        faces = self.face_array if lod is None else lod.faces
+        if len(faces) == 0:
+            return [], [], [], [] if raster else None
+
+        tri = screen[faces]  # F x 3 vertices x (x, y, depth)
+        keep = np.ones(len(faces), dtype=bool)
+
+        crossing = []
+        if not app.is_ortho:
+            inside = (self.clip_coords[:, 2] + self.clip_coords[:, 3]) >= 0
+            inside_count = inside[faces].sum(axis=1)
+            keep = inside_count == 3
+            crossing = np.nonzero(
+                (inside_count > 0) & (inside_count < 3))[0].tolist()
+
+        # Projected triangles wound clockwise on screen face away
+        if cull:
+            with np.errstate(invalid='ignore'):
+                winding = (
+                    (tri[:, 1, 0] - tri[:, 0, 0]) *
+                    (tri[:, 2, 1] - tri[:, 0, 1]) -
+                    (tri[:, 2, 0] - tri[:, 0, 0]) *
+                    (tri[:, 1, 1] - tri[:, 0, 1]))
+                keep &= winding < 0
+
+        kept = np.nonzero(keep)[0]
+        tri = tri[kept]
+
+        if raster:
+            points = tri[:, :, :2].reshape(-1, 6)
+            vertex_depths = tri[:, :, 2].tolist()
+        else:
             # Inset vertices slightly away from center
             # to avoid z-fighting (overlapping triangles)
             inset = 1.01
-            v0_inset = [
-                center[0] + (v0[0] - center[0]) * inset,
-                center[1] + (v0[1] - center[1]) * inset,
-                v0[2]
-            ]
-            v1_inset = [
-                center[0] + (v1[0] - center[0]) * inset,
-                center[1] + (v1[1] - center[1]) * inset,
-                v1[2]
-            ]
-            v2_inset = [
-                center[0] + (v2[0] - center[0]) * inset,
-                center[1] + (v2[1] - center[1]) * inset,
-                v2[2]
-            ]
-
-            # Use inset points for drawing
-            points = [v0_inset[0], v0_inset[1], v1_inset[0],
-                      v1_inset[1], v2_inset[0], v2_inset[1]]
-
-            # Get world coordinates for normal calculation
-            world_v0 = self.vertices[idx0][:3]
-            world_v1 = self.vertices[idx1][:3]
-            world_v2 = self.vertices[idx2][:3]
-
-            # Calculate edges and normal
-            edge1 = [world_v1[i] - world_v0[i] for i in range(3)]
-            edge2 = [world_v2[i] - world_v0[i] for i in range(3)]
-            normal = cross(edge1, edge2)
-
-            # Backface culling is disabled because it doesn't work with rotations
-            # if dot(normal, app.camera.get_view_direction()) <= 0
-            # \ and not app.edit_mode:
-            #     continue  # Skip triangles facing away
-
-            # Shading
-            color = self.shading_model.shade(
-                normal, light_dir=app.world.get_light_direction()) \
-                if self.shading_model else 'white'
-
-            # Calculate average depth
-            avg_depth = sum([v[2] for v in [v0, v1, v2]]) / 3
-
-            triangles.append(
-                {'depth': avg_depth, 'points': points, 'color': color})
-
-        self.screen_coords = screen_coords
+            center = tri[:, :, :2].mean(axis=1, keepdims=True)
+            points = (center + (tri[:, :, :2] - center) * inset).reshape(-1, 6)
+            vertex_depths = None
+        depths = tri[:, :, 2].mean(axis=1)
+
+        colors = self.face_colors(app, lod)
+        tri_points = points.tolist()
+        depths = depths.tolist()
+        color_ids = np.asarray(colors, dtype=np.intp)[kept].tolist()
+
+        for face in crossing:
+            for points, depth, zs in self.clip_face(
+                    app, face, cull, raster,
+                    None if lod is None else lod.faces):
+                tri_points.append(points)
+                depths.append(depth)
+                color_ids.append(colors[face])
+                if raster:
+                    vertex_depths.append(zs)
+        return tri_points, depths, color_ids, vertex_depths
+
+    def face_normals(self, lod=None):
+        # Object-space face normals, recomputed only when the geometry changes
+        if lod is not None:
+            return lod.face_normals
+        if self.asset is not None:
+            return self.asset.face_normals
+        if self._face_normals_version == self.geometry_version:
+            return self._face_normals
+
+        if self.use_numpy and len(self.vertices):
+            normals = triangle_normals(self.vertex_array, self.face_array)
+        else:
+            normals = []
+            for i in range(0, len(self.indices), 3):
+                v0 = self.vertices[self.indices[i]]
+                v1 = self.vertices[self.indices[i+1]]
+                v2 = self.vertices[self.indices[i+2]]
+                normals.append(cross(subtract(v1, v0), subtract(v2, v0)))
+
+        self._face_normals = normals
+        self._face_normals_version = self.geometry_version
+        return normals
+
+    def world_face_normals(self, lod=None):
+        # Face normals transformed by the inverse-transpose of
+        # transform_matrix so rotated and scaled objects are lit correctly
+        key = (self.geometry_version, self.transform_version,
+               None if lod is None else lod.index)
+        if key == self._world_normals_key:
+            return self._world_normals
+
+        matrix = normal_matrix(self.transform_matrix)
+        normals = self.face_normals(lod)
+        if isinstance(normals, list):
+            normals = [[dot(row, n) for row in matrix] for n in normals]
+        else:
+            normals = normals @ np.array(matrix, dtype=float).T
+
+        self._world_normals = normals
+        self._world_normals_key = key
+        return normals
+
+    def face_colors(self, app, lod=None):
+        # Palette ids of one shaded color per triangle, evaluated for all
+        # faces at once
+        light_dir = app.world.get_light_direction()
+        key = (self.geometry_version, self.transform_version,
+               tuple(light_dir) if light_dir else None,
+               None if lod is None else lod.index)
+        if key == self._face_colors_key:
+            return self._face_colors
+
+        if self.shading_model:
+            colors = self.shading_model.shade_faces(
+                self.world_face_normals(lod), light_dir)
+        else:
+            colors = ['white'] * (len(self.indices) // 3 if lod is None
+                                  else len(lod))
+
+        self._face_colors = [color_id(color) for color in colors]
+        self._face_colors_key = key
+        return self._face_colors
+
+    def render(self, app, buffer):
+        with profiler.scope('transform'):
+            self.update_screen_coords(app)
+            screen_coords = self.screen_coords
+            lod = self.select_lod(app)
+
+        with profiler.scope('shading'):
+            self.face_colors(app, lod)
+
+        with profiler.scope('transform'):
+            # Triangles only need rebuilding when the projection, shading,
+            # culling or render mode changed since the last frame
+            cull = self.culls_backfaces(app)
+            raster = app.use_rasterizer
+            key = (self._projection_key, self._face_colors_key, cull, raster)
+            if key != self._triangles_key:
+                if self.screen_array is not None:
+                    self._triangles = self.build_triangles_numpy(
+                        app, self.screen_array, cull, raster, lod)
+                else:
+                    self._triangles = self.build_triangles(
+                        app, screen_coords, cull, raster)
+                self._triangles_key = key
+            tri_points, depths, color_ids, vertex_depths = self._triangles
 
         # Add mesh properties to triangles
-        for tri in triangles:
-            tri['is_editable'] = self.is_editable
-            if not app.edit_mode and self == app.selected_object:
-                tri['border'] = 'orange'
-                tri['borderWidth'] = 0.5
-            elif app.edit_mode and app.selected_object == self:
-                tri['opacity'] = 50
-
-        # Draw vertices in edit mode
-        if app.edit_mode and self.selection_mode == 'vertex' \
-                and app.selected_object == self:
-            for point in screen_coords:
-                drawCircle(point[0], point[1], 2, fill='white')
-
-        # Highlight selected vertex
-        if app.edit_mode and self.selected_vertex is not None:
-            point = screen_coords[self.selected_vertex]
-            drawCircle(point[0], point[1], 3, fill='orange')
-
-        # Highlight selected face
-        if app.edit_mode and self.selection_mode == 'face' \
-                and self.selected_face is not None:
-            idx0 = self.indices[self.selected_face]
-            idx1 = self.indices[self.selected_face + 1]
-            idx2 = self.indices[self.selected_face + 2]
+        flags = FLAG_EDITABLE if self.is_editable else 0
+        opacity = 100
+        if not app.edit_mode and self == app.selected_object:
+            flags |= FLAG_OUTLINE
+        elif app.edit_mode and app.selected_object == self:
+            opacity = 50
+        buffer.extend(tri_points, depths, color_ids, flags, opacity,
+                      vertex_depths)
+
+    def draw_overlay(self, app):
+        # Edit mode markers: vertex dots and the selected vertex and face
+        if not app.edit_mode:
+            return
 
-            v0 = screen_coords[idx0]
-            v1 = screen_coords[idx1]
-            v2 = screen_coords[idx2]
+        with profiler.scope('draw'):
+            self.update_screen_coords(app)
+            screen_coords = self.screen_coords
+            backend = app.backend
+
+            # Draw vertices in edit mode
+            if app.edit_mode and self.selection_mode == 'vertex' \
+                    and app.selected_object == self:
+                for point in screen_coords:
+                    backend.circle(point[0], point[1], 2, 'white')
+
+            # Highlight selected vertex
+            if app.edit_mode and self.selected_vertex is not None:
+                point = screen_coords[self.selected_vertex]
+                backend.circle(point[0], point[1], 3, 'orange')
+
+            # Highlight selected faces
+            if app.edit_mode and self.selection_mode == 'face' \
+                    and self.selected_face is not None:
+                for face in self.region_faces():
+                    idx0 = self.indices[3 * face]
+                    idx1 = self.indices[3 * face + 1]
+                    idx2 = self.indices[3 * face + 2]
+
+                    v0 = screen_coords[idx0]
+                    v1 = screen_coords[idx1]
+                    v2 = screen_coords[idx2]
+
+                    points = [v0[0], v0[1], v1[0], v1[1], v2[0], v2[1]]
+                    backend.polygon(points, None, border='orange',
+                                    border_width=2)
+
+    @property
+    def lods_ready(self):
+        # Part of the scene layer's key, so the frame after the levels
+        # finish building in the background is redrawn with them
+        return self.asset is not None and self.asset.lods_ready
+
+    def select_lod(self, app):
+        # Picks the coarsest level of detail whose error projects to at
+        # most app.lod_pixel_error pixels and returns it, or None to draw
+        # the mesh itself. Only unedited meshes loaded from a file have
+        # levels, and the object being edited is always drawn in full.
+        if self.asset is None or self.screen_array is None:
+            self.lod = None
+            return None
+
+        # Levels aren't built until a mesh could use them
+        if app.lod_pixel_error <= 0 or \
+                (app.edit_mode and app.selected_object is self):
+            self.lod = None
+            self._lod_key = None
+            return None
+
+        key = (self._projection_key, app.lod_pixel_error)
+        if key != self._lod_key:
+            # The interactive app draws the full mesh until the levels
+            # are built in the background
+            if getattr(app, 'lod_in_background', False):
+                levels = self.asset.lods_in_background()
+                if levels is None:
+                    self.lod = None
+                    return None
+            else:
+                levels = self.asset.lods
+            self.lod = levels[0]
+            scale = self.pixels_per_unit(app)
+            for level in levels[1:]:
+                if level.error * scale > app.lod_pixel_error:
+                    break
+                self.lod = level
+            self._lod_key = key
+        return self.lod if self.lod.index else None
+
+    def pixels_per_unit(self, app):
+        # Screen pixels covered by one object-space unit at the center of
+        # the mesh's bounding sphere, inf when the camera is inside it
+        center, radius = self.asset.bounds
+        matrix = np.asarray(self.transform_matrix, dtype=float)[:3, :3]
+        scale = np.linalg.norm(matrix, axis=0).max()
+        focal = app.camera.perspective_matrix[1][1] * app.height / 2
+        if app.is_ortho:
+            # Orthographic mode skips the perspective divide
+            return focal * scale
+
+        distance = (self.clip_matrix @ np.append(center, 1))[3]
+        if distance <= radius * scale:
+            return float('inf')
+        return focal * scale / distance
+
+    @property
+    def bvh(self):
+        if self.asset is not None:
+            return self.asset.bvh
+
+        # Rebuilt when faces were added or removed, refit when only
+        # vertices moved
+        if self._bvh is not None and \
+                self._bvh_topology == self.topology_version:
+            if self._bvh_version != self.geometry_version:
+                self._bvh.refit_triangles(self.vertex_array, self.face_array)
+                self._bvh_version = self.geometry_version
+            return self._bvh
+
+        self._bvh = TriangleBVH(self.vertex_array, self.face_array)
+        self._bvh_version = self.geometry_version
+        self._bvh_topology = self.topology_version
+        return self._bvh
+
+    @property
+    def halfedges(self):
+        # Rebuilt when faces were added or removed by anything that didn't
+        # update it in place
+        if self._halfedges_topology != self.topology_version or \
+                len(self._halfedges.outgoing) != len(self.vertices):
+            self._halfedges = HalfEdgeMesh(self.indices, len(self.vertices))
+            self._halfedges_topology = self.topology_version
+        return self._halfedges
+
+    def screen_ray(self, x, y):
+        # Object-space ray through a screen point, using the projection of
+        # the last render. Points along it at t >= 0 are in front of the
+        # near plane.
+        width, height, is_ortho = self.viewport
+        return screen_ray(self.clip_matrix, x, y, width, height, is_ortho)
+
+    def raycast(self, x, y):
+        # Nearest triangle under a screen point as (t, face number), or None
+        if self.clip_matrix is None or not len(self.indices):
+            return None
+        return self.intersect_local(*self.screen_ray(x, y))
+
+    def intersect_local(self, origin, direction):
+        # Nearest triangle hit by an object-space ray as (t, face number)
+        if not len(self.indices):
+            return None
+        return self.bvh.intersect(origin, direction)
+
+    def intersect_world_ray(self, origin, direction):
+        # intersect_local() for a world-space ray. Affine transforms keep
+        # distances along the ray, so t is the same in both spaces.
+        if self._inverse_key != self.transform_version:
+            self._inverse_transform = np.linalg.pinv(
+                np.asarray(self.transform_matrix, dtype=float))
+            self._inverse_key = self.transform_version
+        inverse = self._inverse_transform
+        return self.intersect_local(inverse[:3, :3] @ origin + inverse[:3, 3],
+                                    inverse[:3, :3] @ direction)
+
+    def box_corners(self):
+        # Object-space points whose bounding box contains the mesh
+        if self._corners_version != self.geometry_version:
+            points = self.vertex_array[:, :3]
+            low, high = points.min(axis=0), points.max(axis=0)
+            self._corners = np.array([[x, y, z] for x in (low[0], high[0])
+                                      for y in (low[1], high[1])
+                                      for z in (low[2], high[2])])
+            self._corners_version = self.geometry_version
+        return self._corners
+
+    def world_bounds(self):
+        # World-space bounding box as (min, max), recomputed when the
+        # transform or the geometry changes
+        key = (self.transform_version, self.geometry_version)
+        if key != self._bounds_key:
+            matrix = np.asarray(self.transform_matrix, dtype=float)
+            points = self.box_corners() @ matrix[:3, :3].T + matrix[:3, 3]
+            self._bounds = (points.min(axis=0), points.max(axis=0))
+            self._bounds_key = key
+        return self._bounds
+
+    def on_pick(self, face):
+        # Called with the face number when a click selects this object
+        pass
+
+    def face_at(self, x, y):
+        # Index into self.indices of the nearest face under a screen point
+        if self.use_numpy:
+            hit = self.raycast(x, y)
+            return None if hit is None else hit[1] * 3
 
-            points = [v0[0], v0[1], v1[0], v1[1], v2[0], v2[1]]
-            drawPolygon(*points, fill=None, border='orange', borderWidth=2)
+        # Used ChatGPT to implement candidate_face logic
+        # as it was just an evolution of the existing logic
+        # for selecting one face
 
-        return triangles
+        # Store faces that contain the clicked point along with their depths
+        candidate_faces = []
+
+        for i in range(0, len(self.indices), 3):
+            idx0 = self.indices[i]
+            idx1 = self.indices[i+1]
+            idx2 = self.indices[i+2]
+
+            v0 = self.screen_coords[idx0]
+            v1 = self.screen_coords[idx1]
+            v2 = self.screen_coords[idx2]
+
+            if point_in_triangle(x, y,
+                                 (v0[0], v0[1]),
+                                 (v1[0], v1[1]),
+                                 (v2[0], v2[1])):
+                # Calculate average depth of the face
+                avg_depth = (v0[2] + v1[2] + v2[2]) / 3
+                candidate_faces.append((i, avg_depth))
+
+        if not candidate_faces:
+            return None
+
+        # Sort faces by depth and select the closest one
+        candidate_faces.sort(key=lambda x: x[1])
+        return candidate_faces[0][0]
 
     def point_over_vertex(self, x, y, threshold=5):
-        for point in self.screen_coords:
-            if abs(point[0] - x) < threshold and abs(point[1] - y) < threshold:
-                self.selected_vertex = point
+        # Hover test, same as clicking a vertex
+        if not self.screen_coords:
+            return
+
+        vertex = self.nearest_vertex(x, y, threshold)
+        if vertex is not None:
+            self.selected_vertex = vertex
+
+    def vertex_grid(self):
+        if self._vertex_grid_key != self._projection_key:
+            # Vertices behind the camera project to meaningless points
+            valid = None if self.viewport[2] else self.clip_coords[:, 3] > 0
+            self._vertex_grid = VertexGrid(self.screen_array, valid=valid)
+            self._vertex_grid_key = self._projection_key
+        return self._vertex_grid
+
+    def nearest_vertex(self, x, y, threshold=5):
+        # Index of the vertex nearest to a screen point within threshold
+        # pixels, or None. When several are about as near, the one in front
+        # wins.
+        if self.screen_array is not None:
+            return self.vertex_grid().nearest(x, y, threshold,
+                                              VERTEX_TIE_DISTANCE)
+
+        candidates = []
+        for idx, point in enumerate(self.screen_coords):
+            dx = point[0] - x
+            dy = point[1] - y
+            if dx * dx + dy * dy < threshold * threshold:  # Distance check
+                candidates.append((math.sqrt(dx * dx + dy * dy), point[2],
+                                   idx))
+        if not candidates:
+            return None
+
+        nearest = min(candidates)[0]
+        return min((depth, idx) for distance, depth, idx in candidates
+                   if distance <= nearest + VERTEX_TIE_DISTANCE)[1]
 
     def check_selection(self, mouseX, mouseY):
         if not self.screen_coords:
@@ -172,17 +783,11 @@ class Mesh:
 
     def check_vertex_selection(self, mouseX, mouseY, threshold=5):
         if not self.screen_coords or self.selection_mode != 'vertex':
-            return
+            return False
 
         self.selected_face = None
-
-        for idx, point in enumerate(self.screen_coords):
-            dx = point[0] - mouseX
-            dy = point[1] - mouseY
-            if dx * dx + dy * dy < threshold * threshold:  # Distance check
-                self.selected_vertex = idx
-                return
-        self.selected_vertex = None
+        self.selected_vertex = self.nearest_vertex(mouseX, mouseY, threshold)
+        return self.selected_vertex is not None
 
     def check_face_selection(self, mouseX, mouseY):
         if not self.screen_coords or self.selection_mode != 'face':
@@ -190,44 +795,65 @@ class Mesh:
 
         self.selected_vertex = None
 
-        # Used ChatGPT to implement candidate_face logic
-        # as it was just an evolution of the existing logic
-        # for selecting one face
-
-        # Store faces that contain the clicked point along with their depths
-        candidate_faces = []
-
-        for i in range(0, len(self.indices), 3):
-            idx0 = self.indices[i]
-            idx1 = self.indices[i+1]
-            idx2 = self.indices[i+2]
-
-            v0 = self.screen_coords[idx0]
-            v1 = self.screen_coords[idx1]
-            v2 = self.screen_coords[idx2]
-
-            if point_in_triangle(mouseX, mouseY,
-                                 (v0[0], v0[1]),
-                                 (v1[0], v1[1]),
-                                 (v2[0], v2[1])):
-                # Calculate average depth of the face
-                avg_depth = (v0[2] + v1[2] + v2[2]) / 3
-                candidate_faces.append((i, avg_depth))
-
-        if not candidate_faces:
+        closest_face_idx = self.face_at(mouseX, mouseY)
+        if closest_face_idx is None:
             self.selected_face = None
+            self.selected_region = set()
             return False
 
-        # Sort faces by depth and select the closest one
-        candidate_faces.sort(key=lambda x: x[1])
-        closest_face_idx = candidate_faces[0][0]
-
         if closest_face_idx == self.selected_face:
             self.selected_face = None  # Deselect if clicking same face
+            self.selected_region = set()
         else:
             self.selected_face = closest_face_idx  # Select new face
+            self.selected_region = {closest_face_idx // 3}
         return True
 
+    def region_faces(self):
+        # Selected face numbers, at least the selected face
+        if self.selected_face is None:
+            return set()
+        return self.selected_region | {self.selected_face // 3}
+
+    def selected_rows(self):
+        # Vertices and faces an edit of the selection can change: the
+        # selected vertex, or the selected faces and their vertices
+        if self.selection_mode == 'face' and self.selected_face is not None:
+            faces = sorted(self.region_faces())
+            vertices = {int(self.indices[3 * face + i])
+                        for face in faces for i in range(3)}
+            return sorted(vertices), faces
+        if self.selection_mode == 'vertex' and \
+                self.selected_vertex is not None:
+            return [self.selected_vertex], []
+        return [], []
+
+    def grow_selection(self):
+        if self.selected_face is not None:
+            self.selected_region = self.halfedges.grow(self.region_faces())
+
+    def shrink_selection(self):
+        # The selected face stays selected
+        if self.selected_face is not None:
+            self.selected_region = self.halfedges.shrink(self.region_faces())
+
+    def select_face_loop(self, x, y):
+        # Select the strip of faces across the selected face's edge nearest
+        # to a screen point
+        if self.selected_face is None or not self.screen_coords:
+            return
+
+        def distance(h):
+            a = self.screen_coords[self.indices[h]]
+            b = self.screen_coords[self.indices[HalfEdgeMesh.next(h)]]
+            return point_segment_distance(x, y, a[0], a[1], b[0], b[1])
+
+        halfedges = self.halfedges
+        edge = min(range(self.selected_face, self.selected_face + 3),
+                   key=distance)
+        self.selected_region = {h // 3 for h in
+                                halfedges.edge_ring(edge, self.vertices)}
+
     def transform(self, app, dx, dy):
         if not app.edit_mode or self.selection_mode == 'face':
             self.selected_vertex = None
@@ -259,19 +885,27 @@ class Mesh:
 
             if self.selection_mode == 'vertex' \
                     and self.selected_vertex is not None:
+                self.make_geometry_private()
+
                 # Move single vertex
                 idx = self.selected_vertex
                 self.vertices[idx] = vector_add(
                     self.vertices[idx], move_vector + [0])
-            elif self.selection_mode == 'face' and self.selected_face:
-                # Move vertices of selected face
+                self.mark_geometry_dirty()
+            elif self.selection_mode == 'face' \
+                    and self.selected_face is not None:
+                self.make_geometry_private()
+
+                # Move vertices of the selected faces
                 affected_vertices = set()
-                for i in range(3):
-                    affected_vertices.add(self.indices[self.selected_face + i])
+                for face in self.region_faces():
+                    for i in range(3):
+                        affected_vertices.add(self.indices[3 * face + i])
 
                 for vertex_idx in affected_vertices:
                     self.vertices[vertex_idx] = vector_add(
                         self.vertices[vertex_idx], move_vector + [0])
+                self.mark_geometry_dirty()
             else:
                 # Move entire mesh
                 self.apply_translation(move_vector)
@@ -300,66 +934,61 @@ class Mesh:
             self.apply_scaling(scale_vector)
 
     def apply_translation(self, move_vector):
-        translation = translation_matrix(*move_vector)
-        self.transform_matrix = matrix_multiply(
-            translation, self.transform_matrix)
+        # Same as multiplying by translation_matrix() on the left
+        self.transform_matrix = Matrix4.from_rows(
+            self.transform_matrix).translated(*move_vector).rows()
+        self.mark_transform_dirty()
 
     def apply_rotation(self, angle, axis):
-        rotation = rotation_matrix(angle, axis)
-        self.transform_matrix = matrix_multiply(
-            rotation, self.transform_matrix)
+        self.transform_matrix = Matrix4.from_rows(
+            self.transform_matrix).rotated(angle, axis).rows()
+        self.mark_transform_dirty()
 
     def apply_scaling(self, scale_vector):
-        scaling = scaling_matrix(*scale_vector)
-        self.transform_matrix = matrix_multiply(scaling, self.transform_matrix)
+        self.transform_matrix = Matrix4.from_rows(
+            self.transform_matrix).scaled(*scale_vector).rows()
+        self.mark_transform_dirty()
 
     def start_extrude_selected_face(self):
+        # Extrude the selected faces as one region: the faces are detached
+        # along the region's boundary and joined back by side walls, so
+        # faces inside the region get no walls between them
         if self.selected_face is None:
             return
 
-        # Indices of the selected face
-        idx0 = self.indices[self.selected_face]
-        idx1 = self.indices[self.selected_face + 1]
-        idx2 = self.indices[self.selected_face + 2]
-        self.extrude_face_indices = [idx0, idx1, idx2]
-
-        # Original positions of the face vertices
-        self.extrude_original_vertices = [
-            self.vertices[idx0][:3],
-            self.vertices[idx1][:3],
-            self.vertices[idx2][:3]
-        ]
-
-        # Compute the face normal
-        edge1 = [self.extrude_original_vertices[1][i] -
-                 self.extrude_original_vertices[0][i] for i in range(3)]
-        edge2 = [self.extrude_original_vertices[2][i] -
-                 self.extrude_original_vertices[0][i] for i in range(3)]
-        self.extrude_normal = normalize(cross(edge1, edge2))
-
-        # Duplicate vertices for the new face
-        self.extrude_new_vertices_indices = []
-        for v in self.extrude_original_vertices:
-            new_v = v + [1]
-            self.vertices.append(new_v)
-            self.extrude_new_vertices_indices.append(len(self.vertices) - 1)
-
-        idx_new0, idx_new1, idx_new2 = self.extrude_new_vertices_indices
-
-        # Add side faces and extruded face
-        # Used ChatGPT to generate the indices for the new faces
-        idx_list = [
-            idx0, idx1, idx_new1, idx0, idx_new1, idx_new0,  # Side face 1
-            idx1, idx2, idx_new2, idx1, idx_new2, idx_new1,  # Side face 2
-            idx2, idx0, idx_new0, idx2, idx_new0, idx_new2,  # Side face 3
-            idx_new0, idx_new1, idx_new2  # Extruded face
-        ]
-        self.indices.extend(idx_list)
+        self.make_geometry_private()
+        halfedges = self.halfedges
+        faces = self.region_faces()
+        copies = halfedges.extrude_region(faces)
+
+        # Copies of the boundary vertices, which the region's faces now use,
+        # and the walls' faces
+        for vertex in copies:
+            self.vertices.append(list(self.vertices[vertex]))
+        for face in faces:
+            for h in range(3 * face, 3 * face + 3):
+                self.indices[h] = halfedges.origin[h]
+        self.indices.extend(halfedges.origin[len(self.indices):])
+        self.mark_geometry_dirty(topology_changed=True)
+        self._halfedges_topology = self.topology_version
+
+        # The region moves along its area-weighted normal
+        self.extrude_vertices = sorted({self.indices[3 * face + i]
+                                        for face in faces for i in range(3)})
+        self.extrude_original_vertices = [self.vertices[v][:3]
+                                          for v in self.extrude_vertices]
+        normal = [0, 0, 0]
+        for face in faces:
+            v0, v1, v2 = (self.vertices[self.indices[3 * face + i]]
+                          for i in range(3))
+            normal = vector_add(normal, cross(subtract(v1, v0),
+                                              subtract(v2, v0)))
+        self.extrude_normal = normalize(normal)
 
         # Initialize extrusion offset
         self.extrude_offset = 0.0
 
-    def update_extrusion(self, dy):
+    def update_extrusion(self, app, dy):
         movement_factor = 0.01
 
         # Get camera right and up vectors for screen-space movement
@@ -370,19 +999,19 @@ class Mesh:
         up_movement = [x * -dy * movement_factor for x in camera_up]
         self.extrude_offset += up_movement[1]
 
-        # Update positions of new vertices along the normal
-        for i, idx in enumerate(self.extrude_new_vertices_indices):
-            offset_vector = [self.extrude_normal[j] *
-                             self.extrude_offset for j in range(3)]
-            new_position = [self.extrude_original_vertices[i]
-                            [j] + offset_vector[j] for j in range(3)]
-            self.vertices[idx] = new_position + [1]
+        # Move the region's vertices along the normal
+        offset_vector = [self.extrude_normal[j] * self.extrude_offset
+                         for j in range(3)]
+        for original, idx in zip(self.extrude_original_vertices,
+                                 self.extrude_vertices):
+            self.vertices[idx] = vector_add(original, offset_vector) + [1]
+        self.mark_geometry_dirty()
 
     def finish_extrusion(self):
         # Reset extrusion variables
         self.selected_face = None
-        self.extrude_face_indices = None
-        self.extrude_new_vertices_indices = None
+        self.selected_region = set()
+        self.extrude_vertices = None
         self.extrude_original_vertices = None
         self.extrude_normal = None
         self.extrude_offset = 0.0
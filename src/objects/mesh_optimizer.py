@@ -0,0 +1,123 @@
+import numpy as np
+
+# Default weld tolerance as a fraction of the bounding box diagonal
+RELATIVE_TOLERANCE = 1e-6
+
+# Offsets to half of the 26 neighboring cells; the other half are the same
+# pairs seen from the other side
+_NEIGHBOR_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                     for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)]
+
+
+def optimize_mesh(vertices, indices, tolerance=None):
+    # Import-time cleanup of an Nx4 vertex array and flat triangle indices:
+    # welds vertices closer than tolerance, drops triangles that have no
+    # area left and orders triangles and vertices so neighbors in the mesh
+    # are close in memory. Returns (vertices, indices, report) where report
+    # holds the (before, after) vertex and triangle counts.
+    vertices = np.asarray(vertices, dtype=float)
+    faces = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    report = {'vertices': (len(vertices), 0), 'triangles': (len(faces), 0)}
+    if not len(faces):
+        report['vertices'] = (len(vertices), len(vertices))
+        return vertices, np.asarray(indices, dtype=np.uint32), report
+
+    points = vertices[:, :3]
+    if tolerance is None:
+        diagonal = np.linalg.norm(points.max(axis=0) - points.min(axis=0))
+        tolerance = diagonal * RELATIVE_TOLERANCE or 1e-12
+
+    faces = weld_vertices(points, tolerance)[faces]
+    faces = faces[~degenerate_triangles(points, faces, tolerance)]
+    # A model of nothing but slivers welds down to an empty mesh
+    if len(faces):
+        faces = faces[morton_order(points[faces].mean(axis=1))]
+    vertices, faces = compact_vertices(vertices, faces)
+
+    report['vertices'] = (report['vertices'][0], len(vertices))
+    report['triangles'] = (report['triangles'][0], len(faces))
+    return vertices, faces.reshape(-1).astype(np.uint32), report
+
+
+def weld_vertices(points, tolerance):
+    # For every point, the index of the point it is merged into. Points are
+    # hashed into cells of the tolerance's size; points sharing a cell are
+    # merged, and so are neighboring cells whose first points are within
+    # tolerance of each other.
+    if not len(points):
+        return np.zeros(0, dtype=np.int64)
+
+    cells = np.floor((points - points.min(axis=0)) / tolerance)
+    dims = cells.max(axis=0) + 3
+    if np.prod(dims) >= 2 ** 62:
+        raise ValueError('Weld tolerance is too small for the model size')
+    # One margin cell on each side keeps neighbor keys unique
+    cells = cells.astype(np.int64) + 1
+    dims = dims.astype(np.int64)
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    cell_keys, first, cell_of = np.unique(keys, return_index=True,
+                                          return_inverse=True)
+    cell_of = cell_of.reshape(-1)
+    anchors = points[first]
+
+    # Pairs of neighboring cells close enough to merge
+    pairs_a = []
+    pairs_b = []
+    for dx, dy, dz in _NEIGHBOR_OFFSETS:
+        neighbor = cell_keys + (dx * dims[1] + dy) * dims[2] + dz
+        pos = np.minimum(np.searchsorted(cell_keys, neighbor),
+                         len(cell_keys) - 1)
+        found = np.nonzero(cell_keys[pos] == neighbor)[0]
+        close = np.linalg.norm(anchors[found] - anchors[pos[found]],
+                               axis=1) <= tolerance
+        pairs_a.append(found[close])
+        pairs_b.append(pos[found[close]])
+    a = np.concatenate(pairs_a)
+    b = np.concatenate(pairs_b)
+
+    # Connected cells take the smallest cell number among them
+    label = np.arange(len(cell_keys))
+    while len(a):
+        low = np.minimum(label[a], label[b])
+        if (low == label[a]).all() and (low == label[b]).all():
+            break
+        np.minimum.at(label, a, low)
+        np.minimum.at(label, b, low)
+        label = label[label]
+    return first[label[cell_of]]
+
+
+def degenerate_triangles(points, faces, tolerance):
+    # Triangles with a repeated corner or a height below tolerance
+    tri = points[faces]
+    e1 = tri[:, 1] - tri[:, 0]
+    e2 = tri[:, 2] - tri[:, 0]
+    e3 = tri[:, 2] - tri[:, 1]
+    twice_area = np.linalg.norm(np.cross(e1, e2), axis=1)
+    longest = np.linalg.norm(np.stack([e1, e2, e3], axis=1), axis=2).max(axis=1)
+    repeated = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | \
+        (faces[:, 2] == faces[:, 0])
+    return repeated | (twice_area <= tolerance * longest)
+
+
+def morton_order(centers, bits=10):
+    # Order that sorts points along a Z-order curve through their bounding
+    # box, so points that are close in space end up close in the order
+    # https://en.wikipedia.org/wiki/Z-order_curve
+    low = centers.min(axis=0)
+    size = (centers.max(axis=0) - low).max() or 1.0
+    cells = ((centers - low) / size * ((1 << bits) - 1)).astype(np.int64)
+    codes = np.zeros(len(centers), dtype=np.int64)
+    for bit in range(bits):
+        for axis in range(3):
+            codes |= ((cells[:, axis] >> bit) & 1) << (3 * bit + axis)
+    return np.argsort(codes, kind='stable')
+
+
+def compact_vertices(vertices, faces):
+    # Keep only the vertices the faces use, numbered in order of first use
+    used, first_use = np.unique(faces.reshape(-1), return_index=True)
+    order = used[np.argsort(first_use)]
+    new_index = np.empty(len(vertices), dtype=np.int64)
+    new_index[order] = np.arange(len(order))
+    return vertices[order], new_index[faces]
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+from objects.mesh_optimizer import optimize_mesh
+
+# Parsed geometry is cached here as raw little-endian arrays so that
+# reloading a model is a memory-map instead of a re-parse
+CACHE_DIR = os.environ.get(
+    'PYPRISM_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'pyprism'))
+
+# magic, format version, vertex count, index count, padded to 32 bytes so
+# the float64 vertex data that follows is aligned
+_HEADER = struct.Struct('<4sIQQ8x')
+_MAGIC = b'PPGC'
+_VERSION = 1
+
+
+def load_obj(file_path, use_cache=True, optimize=True):
+    # Returns (vertices, indices): an Nx4 float64 array of homogeneous
+    # vertices and a flat uint32 array of triangle indices. With optimize
+    # the geometry goes through optimize_mesh() before it is cached, which
+    # welds duplicated vertices along seams.
+    if not use_cache:
+        return read_obj(file_path, optimize)
+
+    path = cache_path(file_path, optimize)
+    if os.path.exists(path):
+        try:
+            return read_cache(path)
+        except (OSError, ValueError):
+            pass  # stale or corrupt cache, parse again
+
+    vertices, indices = read_obj(file_path, optimize)
+    try:
+        write_cache(path, vertices, indices)
+    except OSError:
+        pass  # caching is best effort, e.g. read-only home directory
+    return vertices, indices
+
+
+def read_obj(file_path, optimize=True):
+    # Uncached load
+    vertices, indices = parse_obj(file_path)
+    if optimize:
+        vertices, indices, _ = optimize_mesh(vertices, indices)
+    return vertices, indices
+
+
+def parse_obj(file_path):
+    # https://cs418.cs.illinois.edu/website/text/obj.html
+    with open(file_path, 'r') as f:
+        lines = f.read().splitlines()
+
+    vertex_lines = []
+    face_tokens = []
+    face_vertex_counts = []  # vertices read so far, for negative indices
+    for line in lines:
+        if line.startswith('v '):  # vertices
+            vertex_lines.append(line)
+        elif line.startswith('f '):  # face info/indices
+            tokens = line.split()[1:]
+            if len(tokens) >= 3:
+                face_tokens.append(tokens)
+                face_vertex_counts.append(len(vertex_lines))
+
+    return (_parse_vertices(vertex_lines),
+            _parse_faces(face_tokens, face_vertex_counts, len(vertex_lines)))
+
+
+def _parse_vertices(vertex_lines):
+    vertices = np.ones((len(vertex_lines), 4))
+    if not vertex_lines:
+        return vertices
+
+    # Convert every coordinate in one call (an optional w or vertex colors
+    # after x, y, z are ignored)
+    coords = np.array([line.split()[1:4] for line in vertex_lines],
+                      dtype=float)
+    vertices[:, :3] = coords
+    return vertices
+
+
+def _parse_faces(face_tokens, face_vertex_counts, vertex_count):
+    if not face_tokens:
+        return np.zeros(0, dtype=np.uint32)
+
+    # Keep only the position index of v, v/vt, v//vn and v/vt/vn forms
+    counts = np.array([len(tokens) for tokens in face_tokens])
+    flat = [token.partition('/')[0] for tokens in face_tokens
+            for token in tokens]
+    idx = np.array(flat, dtype=np.int64)
+
+    # obj file indices start from 1, negative indices count back from the
+    # last vertex read before the face
+    base = np.repeat(np.array(face_vertex_counts), counts)
+    idx = np.where(idx < 0, base + idx, idx - 1)
+    if len(idx) and (idx.min() < 0 or idx.max() >= vertex_count):
+        raise ValueError('Face index out of range')
+
+    # Fan triangulation of quads and n-gons: (0, k, k + 1) per face
+    starts = np.cumsum(counts) - counts
+    tri_counts = counts - 2
+    face = np.repeat(np.arange(len(counts)), tri_counts)
+    k = np.arange(tri_counts.sum()) - \
+        np.repeat(np.cumsum(tri_counts) - tri_counts, tri_counts) + 1
+    corners = np.stack([starts[face], starts[face] + k,
+                        starts[face] + k + 1], axis=1)
+    return idx[corners].ravel().astype(np.uint32)
+
+
+def cache_path(file_path, optimize=True):
+    # Keyed by absolute path, modification time and size so edited files
+    # are parsed again
+    st = os.stat(file_path)
+    key = f'{os.path.abspath(file_path)}:{st.st_mtime_ns}:{st.st_size}'
+    if optimize:
+        key += ':optimized'
+    name = hashlib.sha1(key.encode()).hexdigest() + '.geom'
+    return os.path.join(CACHE_DIR, name)
+
+
+def write_cache(path, vertices, indices):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file first so readers never see a partial cache
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(vertices), len(indices)))
+        f.write(np.ascontiguousarray(vertices, dtype='<f8').tobytes())
+        f.write(np.ascontiguousarray(indices, dtype='<u4').tobytes())
+    os.replace(tmp_path, path)
+
+
+def write_obj(path, vertices, indices):
+    # Plain OBJ with only vertex positions and triangles
+    lines = [f'v {x:.9g} {y:.9g} {z:.9g}' for x, y, z in
+             np.asarray(vertices, dtype=float)[:, :3].tolist()]
+    lines += [f'f {a} {b} {c}' for a, b, c in
+              (np.asarray(indices, dtype=np.int64).reshape(-1, 3) + 1)
+              .tolist()]
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def read_cache(path):
+    # Memory-maps the arrays, so only the pages actually used are read
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        raise ValueError('Truncated geometry cache')
+
+    magic, version, vertex_count, index_count = _HEADER.unpack(header)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError('Not a geometry cache')
+
+    expected = _HEADER.size + vertex_count * 32 + index_count * 4
+    if os.path.getsize(path) != expected:
+        raise ValueError('Truncated geometry cache')
+
+    vertices = np.memmap(path, dtype='<f8', mode='r', offset=_HEADER.size,
+                         shape=(vertex_count, 4)) if vertex_count else \
+        np.ones((0, 4))
+    indices = np.memmap(path, dtype='<u4', mode='r',
+                        offset=_HEADER.size + vertex_count * 32,
+                        shape=(index_count,)) if index_count else \
+        np.zeros(0, dtype=np.uint32)
+    return vertices, indices
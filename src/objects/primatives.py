@@ -1,7 +1,9 @@
 from matrix_util import *
-from cmu_graphics import *
 from rendering.shading import *
 from objects.mesh import Mesh
+from objects.instanced_mesh import InstancedMesh, grid_transforms
+from objects import assets, obj_loader
+from profiler import profiler
 
 
 class Cube(Mesh):
@@ -56,8 +58,27 @@ class Plane(Mesh):
 
         super().__init__(vertices, indices, is_editable=True)
 
+        # A plane has no back side to hide
+        self.backface_culling = False
+
+
+class CubeArray(InstancedMesh):
+    # A block of cube instances shaded from blue to orange along x
+    def __init__(self, counts=(10, 10, 10), size=0.25, spacing=0.5):
+        super().__init__(Cube(size))
+        self.name = 'Cube Array'
+
+        transforms = grid_transforms(counts, spacing)
+        xs = transforms[:, 0, 3]
+        span = (xs.max() - xs.min()) or 1
+        t = ((xs - xs.min()) / span)[:, None]
+        colors = np.floor([120, 150, 255] + t * [135, 15, -175])
+        self.add_instances(transforms, colors)
+
 
 class Grid(Mesh):
+    layer = 'grid'
+
     def __init__(self, size=10.0, divisions=10):
         vertices = []
         indices = []
@@ -79,75 +100,71 @@ class Grid(Mesh):
 
         super().__init__(vertices, indices, is_selectable=False)
 
-    def render(self, app):
+    def render(self, app, buffer):
         # The rendering logic is the same as any object in the scene
-        # Just the final drawLine call is different
-
-        # Transform vertices
-        transformed_vertices = [matrix_vector_multiply(
-            app.camera.projection_view_matrix, v) for v in self.vertices]
-
-        # Perspective division and conversion to NDC
-        ndc = []
-        for point in transformed_vertices:
-            if app.is_ortho:
-                ndc.append(point[:3])
-            else:
-                ndc.append([point[0]/point[3], point[1] /
-                           point[3], point[2]/point[3]])
-
-        # Screen space conversion
-        screen_coords = [[(x + 1) * (app.width / 2), (1 - y) * (app.height / 2)]
-                         for x, y, z in ndc]
-
-        # Draw grid lines
-        for i in range(0, len(self.indices), 2):
-            idx_start = self.indices[i]
-            idx_end = self.indices[i + 1]
-
-            start_point = screen_coords[idx_start]
-            end_point = screen_coords[idx_end]
-
-            # color the two center x and z axis lines red and blue
-            if idx_start == 20:
-                drawLine(start_point[0], start_point[1],
-                         end_point[0], end_point[1], fill='blue')
-            elif idx_start == 22:
-                drawLine(start_point[0], start_point[1],
-                         end_point[0], end_point[1], fill='red')
-            else:
-                drawLine(start_point[0], start_point[1],
-                         end_point[0], end_point[1],
-                         fill=rgb(50, 50, 50))
+        # Just the final line call is different
+
+        # Projected vertices are cached until the camera moves
+        with profiler.scope('transform'):
+            self.update_screen_coords(app)
+
+        with profiler.scope('draw'):
+            line = app.backend.line
+
+            # Draw grid lines
+            for i, (start_point, end_point) in enumerate(
+                    self.visible_lines(app)):
+                if start_point is None:
+                    continue
+                idx_start = self.indices[2 * i]
+
+                # color the two center x and z axis lines red and blue
+                if idx_start == 20:
+                    line(start_point[0], start_point[1],
+                         end_point[0], end_point[1], 'blue')
+                elif idx_start == 22:
+                    line(start_point[0], start_point[1],
+                         end_point[0], end_point[1], 'red')
+                else:
+                    line(start_point[0], start_point[1],
+                         end_point[0], end_point[1], (50, 50, 50))
+
+    def visible_lines(self, app):
+        # Screen-space (start, end) of every grid line, cut to the part in
+        # front of the camera and inside the window; (None, None) for lines
+        # with nothing to draw
+        if self.screen_array is None:
+            coords = self.screen_coords
+            return [(coords[self.indices[i]], coords[self.indices[i + 1]])
+                    for i in range(0, len(self.indices), 2)]
+
+        lines = np.asarray(self.indices, dtype=np.intp).reshape(-1, 2)
+        starts = self.clip_coords[lines[:, 0]]
+        ends = self.clip_coords[lines[:, 1]]
+        front = np.ones(len(lines), dtype=bool)
+        if not app.is_ortho:
+            starts, ends, front = clip_segments_near(starts, ends)
+        starts = self.clip_to_screen_numpy(app, starts)
+        ends = self.clip_to_screen_numpy(app, ends)
+        starts, ends, visible = clip_segments(starts, ends, 0, 0,
+                                              app.width, app.height)
+        visible &= front
+        return [(start, end) if shown else (None, None) for start, end, shown
+                in zip(starts.tolist(), ends.tolist(), visible.tolist())]
 
 
 class ImportedMesh(Mesh):
     def __init__(self, file_path, shading_model=Lambertian()):
-        vertices, indices = self.load_obj(file_path)
-        self.name = file_path.split('/')[-1].split('.')[0]
-        super().__init__(vertices, indices, shading_model, is_editable=True)
+        # Geometry is shared with every other mesh loaded from the same file
+        # and copied on the first edit
+        asset = assets.registry.load(file_path)
+        self.name = asset.name
+        super().__init__(asset.vertices, asset.indices, shading_model,
+                         is_editable=True)
+        self.asset = asset
 
     @staticmethod
     def load_obj(file_path):
-        # https://cs418.cs.illinois.edu/website/text/obj.html
-        vertices = []
-        indices = []
-
-        with open(file_path, 'r') as f:
-            for line in f:
-                if line.startswith('v '):  # vertices
-                    parts = line.strip().split()
-                    x, y, z = map(float, parts[1:4])
-                    # Add homogeneous coordinate w=1
-                    vertices.append([x, y, z, 1])
-                elif line.startswith('f '):  # face info/indices
-                    parts = line.strip().split()
-                    # obj file indices start from 1 so we subtract 1
-                    face_indices = [int(part.split('/')[0]) -
-                                    1 for part in parts[1:]]
-                    if len(face_indices) == 3:
-                        indices.extend(face_indices)
-                    elif len(face_indices) > 3:
-                        raise ValueError(
-                            'Only triangles are supported for now')
-        return vertices, indices
+        # Quads and n-gons are triangulated and the parsed arrays are cached
+        # on disk, see objects/obj_loader.py
+        return obj_loader.load_obj(file_path)
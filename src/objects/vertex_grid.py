@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+
+# Projected points farther off screen than this can't be clicked and would
+# overflow the cell keys
+MAX_COORD = 1e6
+
+
+class VertexGrid:
+    # Uniform grid over a mesh's projected vertices for nearest-vertex
+    # queries in screen space. Vertices are sorted by the cell they fall in,
+    # so the vertices of a cell are one slice of self.ids, and a query only
+    # looks at the few cells around the point.
+    def __init__(self, screen, cell_size=8, valid=None):
+        # screen is the Nx3 (x, y, depth) array of projected vertices;
+        # vertices where valid is False (behind the camera) are left out
+        self.screen = screen
+        self.cell_size = cell_size
+
+        ok = np.isfinite(screen).all(axis=1) & \
+            (np.abs(screen[:, :2]) < MAX_COORD).all(axis=1)
+        if valid is not None:
+            ok &= valid
+        ids = np.nonzero(ok)[0]
+        cells = np.floor(screen[ids, :2] / cell_size).astype(np.int64)
+        keys = self.cell_key(cells[:, 0], cells[:, 1])
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = ids[order]
+
+    @staticmethod
+    def cell_key(cx, cy):
+        # Cells of one column are consecutive keys
+        return cx * (1 << 32) + cy
+
+    def candidates(self, x, y, radius):
+        # Ids of the vertices in the cells a circle around (x, y) touches
+        span = max(1, math.ceil(radius / self.cell_size))
+        cx = math.floor(x / self.cell_size)
+        cy = math.floor(y / self.cell_size)
+        columns = np.arange(cx - span, cx + span + 1, dtype=np.int64)
+        low = np.searchsorted(self.keys, self.cell_key(columns, cy - span))
+        high = np.searchsorted(self.keys, self.cell_key(columns, cy + span),
+                               side='right')
+        slices = [self.ids[a:b] for a, b in zip(low.tolist(), high.tolist())
+                  if b > a]
+        if not slices:
+            return self.ids[:0]
+        return np.concatenate(slices)
+
+    def nearest(self, x, y, radius, tie_distance=0.0):
+        # Index of the vertex nearest to (x, y) within radius pixels, or
+        # None. Of the vertices at most tie_distance pixels farther than the
+        # nearest, the one with the smallest depth (in front) is returned.
+        ids = self.candidates(x, y, radius)
+        if not len(ids):
+            return None
+
+        points = self.screen[ids]
+        distance = np.hypot(points[:, 0] - x, points[:, 1] - y)
+        inside = distance < radius
+        if not inside.any():
+            return None
+
+        ids = ids[inside]
+        distance = distance[inside]
+        tied = distance <= distance.min() + tie_distance
+        ids = ids[tied]
+        return int(ids[np.argmin(points[inside][tied, 2])])
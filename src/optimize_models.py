@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import time
+
+from objects import obj_loader
+from objects.mesh_optimizer import optimize_mesh
+
+# Run the import-time mesh optimization (vertex welding, degenerate
+# triangle removal and reordering, see objects/mesh_optimizer.py) over OBJ
+# files and report vertex and triangle counts before and after.
+#
+#   python src/optimize_models.py models/
+#   python src/optimize_models.py teapot.obj models/ --out optimized/
+#
+# Directories are searched recursively. With --out the optimized models are
+# written there as plain OBJ files with the same relative paths.
+
+
+def find_models(paths):
+    # (path, path relative to the input it was found in) of every OBJ file
+    models = []
+    for path in paths:
+        if not os.path.isdir(path):
+            models.append((path, os.path.basename(path)))
+            continue
+        for folder, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.lower().endswith('.obj'):
+                    full = os.path.join(folder, name)
+                    models.append((full, os.path.relpath(full, path)))
+    return models
+
+
+def optimize_file(path, tolerance=None, out_path=None):
+    vertices, indices = obj_loader.parse_obj(path)
+    vertices, indices, report = optimize_mesh(vertices, indices, tolerance)
+    if out_path:
+        os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+        obj_loader.write_obj(out_path, vertices, indices)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Weld, clean up and reorder OBJ models.')
+    parser.add_argument('inputs', nargs='+',
+                        help='.obj files or directories of them')
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help='weld distance (default: 1e-6 of the bounding '
+                        'box diagonal)')
+    parser.add_argument('--out', help='directory for the optimized models')
+    args = parser.parse_args(argv)
+
+    models = find_models(args.inputs)
+    if not models:
+        print('No .obj files found')
+        return 1
+
+    width = max(len(name) for _, name in models)
+    print(f'{"model":<{width}}{"vertices":>22}{"triangles":>22}{"time":>10}')
+    totals = [0, 0, 0, 0]
+    failed = 0
+    for path, name in models:
+        start = time.perf_counter()
+        try:
+            report = optimize_file(
+                path, args.tolerance,
+                os.path.join(args.out, name) if args.out else None)
+        except (OSError, ValueError) as e:
+            print(f'{name:<{width}}  failed: {e}')
+            failed += 1
+            continue
+        elapsed = (time.perf_counter() - start) * 1000
+
+        (v0, v1), (t0, t1) = report['vertices'], report['triangles']
+        totals = [totals[0] + v0, totals[1] + v1,
+                  totals[2] + t0, totals[3] + t1]
+        print(f'{name:<{width}}{v0:>10} -> {v1:<8}{t0:>10} -> {t1:<8}'
+              f'{elapsed:>8.1f}ms')
+
+    v0, v1, t0, t1 = totals
+    print(f'{"total":<{width}}{v0:>10} -> {v1:<8}{t0:>10} -> {t1}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
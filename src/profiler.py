@@ -0,0 +1,130 @@
+import csv
+import json
+import time
+from collections import deque
+
+
+class _Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NullScope:
+    # Returned while profiling is off so timed code pays only a method call
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class Profiler:
+    # Per-stage frame timings kept in a ring buffer of recent frames.
+    # Stages are timed with `with profiler.scope('name'):`; time from
+    # scopes with the same name in one frame is summed.
+    def __init__(self, history=300):
+        self.enabled = False
+        self.frames = deque(maxlen=history)  # {stage: nanoseconds}
+        self.frame_count = 0
+        self._current = {}
+        self._frame_start = None
+
+    def scope(self, name):
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def add(self, name, elapsed_ns):
+        self._current[name] = self._current.get(name, 0) + elapsed_ns
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._current = {}
+        self._frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        self._current['frame'] = time.perf_counter_ns() - self._frame_start
+        self.frames.append(self._current)
+        self.frame_count += 1
+        self._current = {}
+        self._frame_start = None
+
+    def reset(self):
+        self.frames.clear()
+        self.frame_count = 0
+        self._current = {}
+        self._frame_start = None
+
+    def stages(self):
+        # Stage names in the order they were first recorded, 'frame' last
+        names = {}
+        for frame in self.frames:
+            for name in frame:
+                names[name] = None
+        names.pop('frame', None)
+        return list(names) + (['frame'] if self.frames else [])
+
+    def percentiles(self, name, percents=(50, 95, 99)):
+        # Nearest-rank percentiles in milliseconds over the recent frames.
+        # Frames where the stage didn't run count as 0.
+        samples = sorted(frame.get(name, 0) for frame in self.frames)
+        if not samples:
+            return [0.0 for _ in percents]
+        result = []
+        for p in percents:
+            rank = max(0, -(-p * len(samples) // 100) - 1)
+            result.append(samples[rank] / 1e6)
+        return result
+
+    def summary(self):
+        return {name: dict(zip(('p50', 'p95', 'p99'),
+                               self.percentiles(name)))
+                for name in self.stages()}
+
+    def export_json(self, path):
+        stages = self.stages()
+        first = self.frame_count - len(self.frames)
+        trace = {
+            'unit': 'ms',
+            'summary': self.summary(),
+            'frames': [{'index': first + i,
+                        **{name: frame.get(name, 0) / 1e6
+                           for name in stages}}
+                       for i, frame in enumerate(self.frames)],
+        }
+        with open(path, 'w') as f:
+            json.dump(trace, f, indent=2)
+
+    def export_csv(self, path):
+        # One row per frame, one column per stage in milliseconds
+        stages = self.stages()
+        first = self.frame_count - len(self.frames)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['index'] + [f'{name}_ms' for name in stages])
+            for i, frame in enumerate(self.frames):
+                writer.writerow([first + i] + [frame.get(name, 0) / 1e6
+                                               for name in stages])
+
+
+# Shared profiler used by the render loop and the UI
+profiler = Profiler()
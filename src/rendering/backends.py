@@ -0,0 +1,377 @@
+from collections import Counter
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # only ImageBackend and images need pillow
+    Image = None
+
+# Colors are cmu_graphics color names or (r, g, b) tuples. These are the
+# names the scene uses, for backends that need the numbers.
+NAMED_COLORS = {
+    'white': (255, 255, 255),
+    'black': (0, 0, 0),
+    'gray': (128, 128, 128),
+    'red': (255, 0, 0),
+    'green': (0, 128, 0),
+    'blue': (0, 0, 255),
+    'yellow': (255, 255, 0),
+    'orange': (255, 165, 0),
+}
+
+
+def to_rgb(color):
+    if isinstance(color, str):
+        return NAMED_COLORS.get(color, (255, 255, 255))
+    return tuple(color)
+
+
+class Backend:
+    # Where World and the scene objects draw. Every render method takes
+    # the app and draws through app.backend, so the same scene can go to a
+    # cmu_graphics window, an offscreen image, a recording or nowhere.
+    # Opacity is 0-100 as in cmu_graphics.
+
+    def begin_frame(self, width, height):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def polygon(self, points, fill, border=None, border_width=1,
+                opacity=100):
+        # points is a flat [x0, y0, x1, y1, ...] list, fill may be None
+        raise NotImplementedError
+
+    def line(self, x1, y1, x2, y2, fill, width=1):
+        raise NotImplementedError
+
+    def circle(self, x, y, radius, fill, opacity=100):
+        raise NotImplementedError
+
+    def rect(self, x, y, width, height, fill, border=None, border_width=1,
+             opacity=100):
+        raise NotImplementedError
+
+    def label(self, text, x, y, fill, bold=False, size=12, align='center',
+              font='arial'):
+        # align is 'left', 'center' or 'right' of x, y is the middle. font
+        # is a cmu_graphics font name.
+        raise NotImplementedError
+
+    def image(self, pixels, x, y, cache_key=None):
+        # pixels is an H x W x 4 uint8 RGBA array. Callers that draw the
+        # same pixels again pass the same cache_key, so backends that have
+        # to convert the array can reuse the result.
+        raise NotImplementedError
+
+
+class CMUBackend(Backend):
+    # Draws into the cmu_graphics window
+    def __init__(self):
+        import cmu_graphics
+        self.cmu = cmu_graphics
+        self._colors = {}
+        self._image = (None, None)  # (cache_key, CMUImage) of the last image
+
+    def color(self, color):
+        # One rgb() per distinct tuple
+        if color is None or isinstance(color, str):
+            return color
+        if color not in self._colors:
+            self._colors[color] = self.cmu.rgb(*color)
+        return self._colors[color]
+
+    def polygon(self, points, fill, border=None, border_width=1,
+                opacity=100):
+        if border is None:
+            self.cmu.drawPolygon(*points, fill=self.color(fill),
+                                 opacity=opacity)
+        else:
+            self.cmu.drawPolygon(*points, fill=self.color(fill),
+                                 border=self.color(border),
+                                 borderWidth=border_width, opacity=opacity)
+
+    def line(self, x1, y1, x2, y2, fill, width=1):
+        self.cmu.drawLine(x1, y1, x2, y2, fill=self.color(fill),
+                          lineWidth=width)
+
+    def circle(self, x, y, radius, fill, opacity=100):
+        self.cmu.drawCircle(x, y, radius, fill=self.color(fill),
+                            opacity=opacity)
+
+    def rect(self, x, y, width, height, fill, border=None, border_width=1,
+             opacity=100):
+        if border is None:
+            self.cmu.drawRect(x, y, width, height, fill=self.color(fill),
+                              opacity=opacity)
+        else:
+            self.cmu.drawRect(x, y, width, height, fill=self.color(fill),
+                              border=self.color(border),
+                              borderWidth=border_width, opacity=opacity)
+
+    def label(self, text, x, y, fill, bold=False, size=12, align='center',
+              font='arial'):
+        self.cmu.drawLabel(text, x, y, fill=self.color(fill), bold=bold,
+                           size=size, align=align, font=font)
+
+    def image(self, pixels, x, y, cache_key=None):
+        if cache_key is None or self._image[0] != cache_key:
+            self._image = (cache_key, self.cmu.CMUImage(
+                Image.fromarray(pixels, 'RGBA')))
+        self.cmu.drawImage(self._image[1], x, y)
+
+
+class ImageBackend(Backend):
+    # Draws into an offscreen image with PIL. Without a background color
+    # the image is transparent RGBA, for layers that are composited later.
+    def __init__(self, width, height, background=(64, 64, 64)):
+        if Image is None:
+            raise ImportError('ImageBackend needs pillow')
+        self.background = background
+        self._fonts = {}
+        self.begin_frame(width, height)
+
+    def begin_frame(self, width, height):
+        if self.background is None:
+            self.canvas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        else:
+            self.canvas = Image.new('RGB', (width, height),
+                                    to_rgb(self.background))
+        # Drawing in 'RGBA' mode on an RGB image blends translucent fills
+        self.draw = ImageDraw.Draw(self.canvas, 'RGBA')
+
+    def blend(self, bounds, draw):
+        # PIL replaces the pixels of an RGBA image instead of blending
+        # translucent shapes into them, so those are drawn on their own
+        # and composited. draw(ImageDraw, dx, dy) draws the shape moved by
+        # (dx, dy) into a scratch image covering bounds.
+        if self.canvas.mode != 'RGBA':
+            draw(self.draw, 0, 0)
+            return
+        x0 = max(int(bounds[0]) - 1, 0)
+        y0 = max(int(bounds[1]) - 1, 0)
+        x1 = min(int(bounds[2]) + 2, self.canvas.width)
+        y1 = min(int(bounds[3]) + 2, self.canvas.height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        scratch = Image.new('RGBA', (x1 - x0, y1 - y0), (0, 0, 0, 0))
+        draw(ImageDraw.Draw(scratch, 'RGBA'), -x0, -y0)
+        self.canvas.alpha_composite(scratch, (x0, y0))
+
+    def font(self, size):
+        # PIL has no bold default font, so bold labels get a stroke instead.
+        # Labels are drawn in PIL's default font whatever font they ask for.
+        if size not in self._fonts:
+            try:
+                self._fonts[size] = ImageFont.load_default(size)
+            except TypeError:  # Pillow < 10.1 has one bitmap size
+                self._fonts[size] = ImageFont.load_default()
+        return self._fonts[size]
+
+    @staticmethod
+    def rgba(color, opacity=100):
+        if color is None:
+            return None
+        return to_rgb(color) + (round(opacity * 2.55),)
+
+    def polygon(self, points, fill, border=None, border_width=1,
+                opacity=100):
+        xy = list(zip(points[0::2], points[1::2]))
+        fill = self.rgba(fill, opacity)
+        outline = self.rgba(border, opacity)
+        width = max(1, round(border_width))
+        if opacity >= 100:
+            self.draw.polygon(xy, fill=fill, outline=outline, width=width)
+            return
+        self.blend((min(points[0::2]), min(points[1::2]), max(points[0::2]),
+                    max(points[1::2])),
+                   lambda draw, dx, dy: draw.polygon(
+                       [(px + dx, py + dy) for px, py in xy], fill=fill,
+                       outline=outline, width=width))
+
+    def line(self, x1, y1, x2, y2, fill, width=1):
+        self.draw.line([(x1, y1), (x2, y2)], fill=self.rgba(fill),
+                       width=max(1, round(width)))
+
+    def circle(self, x, y, radius, fill, opacity=100):
+        fill = self.rgba(fill, opacity)
+        if opacity >= 100:
+            self.draw.ellipse([x - radius, y - radius, x + radius,
+                               y + radius], fill=fill)
+            return
+        self.blend((x - radius, y - radius, x + radius, y + radius),
+                   lambda draw, dx, dy: draw.ellipse(
+                       [x - radius + dx, y - radius + dy, x + radius + dx,
+                        y + radius + dy], fill=fill))
+
+    def rect(self, x, y, width, height, fill, border=None, border_width=1,
+             opacity=100):
+        fill = self.rgba(fill, opacity)
+        outline = self.rgba(border, opacity)
+        line_width = max(1, round(border_width))
+        if opacity >= 100:
+            self.draw.rectangle([x, y, x + width - 1, y + height - 1],
+                                fill=fill, outline=outline, width=line_width)
+            return
+        self.blend((x, y, x + width, y + height),
+                   lambda draw, dx, dy: draw.rectangle(
+                       [x + dx, y + dy, x + width - 1 + dx,
+                        y + height - 1 + dy], fill=fill, outline=outline,
+                       width=line_width))
+
+    def label(self, text, x, y, fill, bold=False, size=12, align='center',
+              font='arial'):
+        anchor = {'left': 'lm', 'right': 'rm'}.get(align, 'mm')
+        fill = self.rgba(fill)
+        self.draw.text((x, y), str(text), fill=fill, anchor=anchor,
+                       font=self.font(size), stroke_width=1 if bold else 0,
+                       stroke_fill=fill)
+
+    def image(self, pixels, x, y, cache_key=None):
+        image = Image.fromarray(pixels, 'RGBA')
+        if self.canvas.mode == 'RGBA':
+            self.canvas.alpha_composite(image, (int(x), int(y)))
+        else:
+            self.canvas.paste(image, (int(x), int(y)), image)
+
+    def to_array(self):
+        return np.asarray(self.canvas)
+
+    def save(self, path):
+        self.canvas.save(path)
+
+
+class RecordingBackend(Backend):
+    # Records draw calls as (kind, arguments) for tests and debugging, and
+    # can write them out as an SVG
+    def __init__(self):
+        self.commands = []
+        self.width = 0
+        self.height = 0
+
+    def begin_frame(self, width, height):
+        self.commands = []
+        self.width = width
+        self.height = height
+
+    def polygon(self, points, fill, border=None, border_width=1,
+                opacity=100):
+        self.commands.append(('polygon', dict(
+            points=list(points), fill=fill, border=border,
+            border_width=border_width, opacity=opacity)))
+
+    def line(self, x1, y1, x2, y2, fill, width=1):
+        self.commands.append(('line', dict(x1=x1, y1=y1, x2=x2, y2=y2,
+                                           fill=fill, width=width)))
+
+    def circle(self, x, y, radius, fill, opacity=100):
+        self.commands.append(('circle', dict(x=x, y=y, radius=radius,
+                                             fill=fill, opacity=opacity)))
+
+    def rect(self, x, y, width, height, fill, border=None, border_width=1,
+             opacity=100):
+        self.commands.append(('rect', dict(
+            x=x, y=y, width=width, height=height, fill=fill, border=border,
+            border_width=border_width, opacity=opacity)))
+
+    def label(self, text, x, y, fill, bold=False, size=12, align='center',
+              font='arial'):
+        self.commands.append(('label', dict(text=text, x=x, y=y, fill=fill,
+                                            bold=bold, size=size,
+                                            align=align, font=font)))
+
+    def image(self, pixels, x, y, cache_key=None):
+        self.commands.append(('image', dict(x=x, y=y,
+                                            width=pixels.shape[1],
+                                            height=pixels.shape[0])))
+
+    def to_svg(self):
+        def paint(color):
+            if color is None:
+                return 'none'
+            return 'rgb({},{},{})'.format(*to_rgb(color))
+
+        lines = [f'<svg xmlns="http://www.w3.org/2000/svg" '
+                 f'width="{self.width}" height="{self.height}">']
+        for kind, args in self.commands:
+            if kind == 'polygon':
+                points = ' '.join(f'{x:.2f},{y:.2f}' for x, y in
+                                  zip(args['points'][0::2],
+                                      args['points'][1::2]))
+                stroke = ''
+                if args['border'] is not None:
+                    stroke = (f' stroke="{paint(args["border"])}"'
+                              f' stroke-width="{args["border_width"]}"')
+                lines.append(f'<polygon points="{points}" '
+                             f'fill="{paint(args["fill"])}"{stroke} '
+                             f'opacity="{args["opacity"] / 100}"/>')
+            elif kind == 'line':
+                lines.append(f'<line x1="{args["x1"]:.2f}" '
+                             f'y1="{args["y1"]:.2f}" x2="{args["x2"]:.2f}" '
+                             f'y2="{args["y2"]:.2f}" '
+                             f'stroke="{paint(args["fill"])}" '
+                             f'stroke-width="{args["width"]}"/>')
+            elif kind == 'circle':
+                lines.append(f'<circle cx="{args["x"]:.2f}" '
+                             f'cy="{args["y"]:.2f}" r="{args["radius"]}" '
+                             f'fill="{paint(args["fill"])}" '
+                             f'opacity="{args["opacity"] / 100}"/>')
+            elif kind == 'rect':
+                stroke = ''
+                if args['border'] is not None:
+                    stroke = (f' stroke="{paint(args["border"])}"'
+                              f' stroke-width="{args["border_width"]}"')
+                lines.append(f'<rect x="{args["x"]:.2f}" y="{args["y"]:.2f}" '
+                             f'width="{args["width"]}" '
+                             f'height="{args["height"]}" '
+                             f'fill="{paint(args["fill"])}"{stroke} '
+                             f'opacity="{args["opacity"] / 100}"/>')
+            elif kind == 'label':
+                weight = ' font-weight="bold"' if args['bold'] else ''
+                anchor = {'left': 'start', 'right': 'end'}.get(
+                    args['align'], 'middle')
+                lines.append(f'<text x="{args["x"]:.2f}" y="{args["y"]:.2f}" '
+                             f'fill="{paint(args["fill"])}"{weight} '
+                             f'font-family="{escape(args["font"])}" '
+                             f'font-size="{args["size"]}" '
+                             f'text-anchor="{anchor}" '
+                             f'dominant-baseline="middle">'
+                             f'{escape(str(args["text"]))}'
+                             f'</text>')
+            # Images aren't embedded
+        lines.append('</svg>')
+        return '\n'.join(lines)
+
+    def save_svg(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_svg())
+
+
+class NullBackend(Backend):
+    # Discards everything and only counts calls, for benchmarks
+    def __init__(self):
+        self.calls = Counter()
+
+    def polygon(self, points, fill, border=None, border_width=1,
+                opacity=100):
+        self.calls['polygon'] += 1
+
+    def line(self, x1, y1, x2, y2, fill, width=1):
+        self.calls['line'] += 1
+
+    def circle(self, x, y, radius, fill, opacity=100):
+        self.calls['circle'] += 1
+
+    def rect(self, x, y, width, height, fill, border=None, border_width=1,
+             opacity=100):
+        self.calls['rect'] += 1
+
+    def label(self, text, x, y, fill, bold=False, size=12, align='center',
+              font='arial'):
+        self.calls['label'] += 1
+
+    def image(self, pixels, x, y, cache_key=None):
+        self.calls['image'] += 1
@@ -50,6 +50,10 @@ class Camera:
 
         self.target = [0, 0, 0]  # Add target point tracking
 
+        # Bumped whenever projection_view_matrix changes so objects can
+        # reuse their projected vertices while the camera is still
+        self.version = 0
+
     def move(self, x, y, z):
         self.x += x
         self.y += y
@@ -66,6 +70,7 @@ class Camera:
 
         self.projection_view_matrix = matrix_multiply(
             self.perspective_matrix, self.view_matrix)
+        self.version += 1
 
     def resize(self, width, height):
         fov_rad = math.radians(self.fov)
@@ -82,6 +87,7 @@ class Camera:
 
         self.projection_view_matrix = matrix_multiply(
             self.perspective_matrix, self.view_matrix)
+        self.version += 1
 
     def orbit(self, dx, dy, sensitivity=0.01):
         # Orbit Camera
@@ -111,22 +117,15 @@ class Camera:
 
     def lookAt(self, position, target, up):
         # gluLookAt https://registry.khronos.org/OpenGL-Refpages/gl2.1/xhtml/gluLookAt.xml
-        z = normalize(subtract(position, target))
-        x = normalize(cross(up, z))
-        y = cross(z, x)
-
-        self.view_matrix = [
-            [x[0], x[1], x[2], -dot(x, position)],
-            [y[0], y[1], y[2], -dot(y, position)],
-            [z[0], z[1], z[2], -dot(z, position)],
-            [0, 0, 0, 1]
-        ]
+        view = Matrix4.look_at(position, target, up)
+        self.view_matrix = view.rows()
 
-        self.projection_view_matrix = matrix_multiply(
-            self.perspective_matrix, self.view_matrix)
+        self.projection_view_matrix = (
+            Matrix4.from_rows(self.perspective_matrix) @ view).rows()
 
-        self.gizmo_projection_view_matrix = matrix_multiply(
-            self.gizmo_perspective_matrix, self.view_matrix)
+        self.gizmo_projection_view_matrix = (
+            Matrix4.from_rows(self.gizmo_perspective_matrix) @ view).rows()
+        self.version += 1
 
     def position(self):
         return [self.x, self.y, self.z]
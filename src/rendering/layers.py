@@ -0,0 +1,88 @@
+from collections import Counter
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:  # compositing layers needs pillow
+    Image = None
+
+from rendering.backends import ImageBackend
+from profiler import profiler
+
+
+class Layer:
+    # One part of the frame, cached as an image. draw(app) draws it through
+    # app.backend and key(app) returns anything that changes whenever the
+    # drawing would, so the image is only redrawn when the key changes.
+    def __init__(self, name, key, draw):
+        self.name = name
+        self.key = key
+        self.draw = draw
+        self.image = None
+        self._key = None
+        self._backend = None
+
+
+def layers_supported():
+    return Image is not None
+
+
+def world_layers():
+    # The parts of the frame World draws, bottom to top: the ground grid,
+    # the scene's triangles and the edit mode markers with the gizmo
+    return [Layer(name, lambda app, name=name: app.world.layer_key(app, name),
+                  lambda app, name=name: app.world.render(app, name))
+            for name in ('grid', 'scene', 'overlay')]
+
+
+class LayerStack:
+    # Draws the frame as a stack of cached layer images. Each frame only
+    # the layers whose key changed are redrawn, into transparent offscreen
+    # images, and the stack is composited and drawn as one image. While
+    # nothing changes the previous composite is drawn again as is.
+    def __init__(self, layers):
+        self.layers = layers
+        self.frame = None
+        self.version = 0
+        self.redraws = Counter()  # layer name -> times redrawn
+
+    def invalidate(self):
+        for layer in self.layers:
+            layer._key = None
+
+    def render(self, app):
+        changed = False
+        for layer in self.layers:
+            key = (app.width, app.height, layer.key(app))
+            if key == layer._key:
+                continue
+
+            if layer._backend is None:
+                layer._backend = ImageBackend(app.width, app.height,
+                                              background=None)
+            backend = layer._backend
+            backend.begin_frame(app.width, app.height)
+
+            # Layers draw through app.backend like the rest of the app
+            window = app.backend
+            app.backend = backend
+            try:
+                layer.draw(app)
+            finally:
+                app.backend = window
+
+            layer.image = backend.canvas
+            layer._key = key
+            self.redraws[layer.name] += 1
+            changed = True
+
+        if changed or self.frame is None:
+            with profiler.scope('composite'):
+                frame = self.layers[0].image
+                for layer in self.layers[1:]:
+                    frame = Image.alpha_composite(frame, layer.image)
+                self.frame = np.asarray(frame)
+            self.version += 1
+
+        app.backend.image(self.frame, 0, 0, cache_key=('layers', self.version))
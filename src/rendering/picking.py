@@ -0,0 +1,84 @@
+import numpy as np
+
+from objects.bvh import BVH
+from objects.mesh import Mesh, screen_ray
+
+
+class ScenePicker:
+    # Finds the frontmost object under the mouse. The mouse is unprojected
+    # into a world-space ray, which is traced through a BVH over the
+    # world-space bounding boxes of every selectable mesh and then against
+    # the triangles of the meshes whose boxes it reaches, nearest box first.
+    # The BVH is rebuilt when meshes are added or removed and refit when
+    # one of them moves or is edited. While nothing changes a click only
+    # costs the BVH traversal.
+    def __init__(self):
+        self.bvh = None
+        self.meshes = []
+        self.markers = []
+        self._scene_key = None
+        self._members = None
+        self._versions = None
+
+    def update(self, world):
+        key = (world.version, Mesh.edits)
+        if key == self._scene_key:
+            return
+        self._scene_key = key
+
+        # Objects without faces (lights) are drawn as fixed-size screen
+        # markers and are tested in screen space instead
+        selectable = [obj for obj in world.objects if obj.is_selectable]
+        self.meshes = [obj for obj in selectable if len(obj.face_array)]
+        self.markers = [obj for obj in selectable
+                        if not len(obj.face_array)]
+
+        members = tuple(id(obj) for obj in self.meshes)
+        versions = tuple((obj.transform_version, obj.geometry_version)
+                         for obj in self.meshes)
+        if members == self._members and versions == self._versions:
+            return
+
+        bounds = [obj.world_bounds() for obj in self.meshes]
+        bounds_min = [low for low, _ in bounds]
+        bounds_max = [high for _, high in bounds]
+        if members == self._members:
+            self.bvh.refit(bounds_min, bounds_max)
+        else:
+            self.bvh = BVH(bounds_min, bounds_max, leaf_size=1)
+        self._members = members
+        self._versions = versions
+
+    def ray(self, app, x, y):
+        # World-space ray through a screen point
+        return screen_ray(app.camera.projection_view_matrix, x, y,
+                          app.width, app.height, app.is_ortho)
+
+    def pick(self, app, world, x, y):
+        # (object, t, face number) of the nearest hit, or None. Markers hit
+        # in screen space have no face number.
+        self.update(world)
+        origin, direction = self.ray(app, x, y)
+
+        def hit_prims(prims):
+            best = None
+            for prim in prims:
+                hit = self.meshes[prim].intersect_world_ray(origin, direction)
+                if hit is not None and (best is None or hit[0] < best[0]):
+                    best = (hit[0], prim, hit[1])
+            return best
+
+        best = None
+        hit = self.bvh.intersect_ray(origin.tolist(), direction.tolist(),
+                                     hit_prims)
+        if hit is not None:
+            best = (self.meshes[hit[1]], hit[0], hit[2])
+
+        for obj in self.markers:
+            if obj.check_selection(x, y):
+                # Distance along the ray to the marker's closest point
+                t = float(np.dot(np.subtract(obj.position(), origin),
+                                 direction) / np.dot(direction, direction))
+                if best is None or t < best[1]:
+                    best = (obj, t, None)
+        return best
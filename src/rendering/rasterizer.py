@@ -0,0 +1,291 @@
+import numpy as np
+
+from matrix_util import *
+from rendering.triangle_buffer import *
+
+OUTLINE_COLOR = (255, 165, 0)  # orange
+MAX_EDGE_SAMPLES = 1 << 16  # per outline edge, on and off screen
+
+
+class Rasterizer:
+    # Software rasterizer with a depth buffer. Draws a TriangleBuffer into
+    # an RGBA NumPy framebuffer that is shown as a single image, so the
+    # number of draw calls doesn't grow with the triangle count and
+    # intersecting triangles are resolved per pixel.
+    # https://www.scratchapixel.com/lessons/3d-basic-rendering/rasterization-practical-implementation/overview-rasterization-algorithm.html
+    #
+    # color and depth, if given, are height x width views to draw into
+    # instead of buffers of its own, such as a tile of a larger framebuffer.
+
+    def __init__(self, width, height, color=None, depth=None):
+        self.width = 0
+        self.height = 0
+        if color is None:
+            self.resize(width, height)
+        else:
+            self.attach(color, depth)
+
+    def resize(self, width, height):
+        if (width, height) == (self.width, self.height):
+            return
+        self.attach(np.zeros((height, width, 4), dtype=np.uint8),
+                    np.full((height, width), np.inf, dtype=np.float32))
+
+    def attach(self, color, depth):
+        # Draw into color (H x W x 4 uint8) and depth (H x W float32). Rows
+        # may be further apart than W pixels, as in a window of a larger
+        # buffer; pixels are then addressed as y * pitch + x in flat views
+        # running from the window's first pixel to its last, so nothing is
+        # copied.
+        self.height, self.width = depth.shape
+        self.color = color
+        self.depth = depth
+        self.pitch = depth.strides[0] // depth.strides[1]
+        self._color = _flat(color, self.pitch)
+        self._depth = _flat(depth, self.pitch)
+        # Same memory as one uint32 per pixel, so a pixel is one write
+        self.pixels = self._color.view(np.uint32).reshape(-1)
+
+    def close(self):
+        pass
+
+    def clear(self):
+        # Transparent background so whatever was drawn before the image
+        # (the grid) shows through
+        self.color[:] = 0
+        self.depth[:] = np.inf
+
+    def draw_buffer(self, buffer, edit_mode=False):
+        # Rasterize every polygon in the buffer and return the framebuffer
+        self.clear()
+        self.draw_arrays(*prepare_buffer(buffer, edit_mode))
+        return self.color
+
+    def draw_arrays(self, tris, zs, colors, opacities, outlined):
+        # Triangles as returned by prepare_buffer()
+        if not len(tris):
+            return
+
+        # Opaque triangles write depth, translucent ones are blended on top
+        # without writing it
+        opaque = opacities >= 100
+        self.draw_triangles(tris[opaque], zs[opaque],
+                            pack_rgba(colors[opaque]))
+        translucent = ~opaque
+        if translucent.any():
+            self.blend_triangles(tris[translucent], zs[translucent],
+                                 colors[translucent],
+                                 opacities[translucent] / 100)
+
+        if outlined.any():
+            self.draw_edges(tris[outlined], zs[outlined],
+                            pack_rgba(np.array([OUTLINE_COLOR]))[0])
+
+    def draw_triangles(self, tris, zs, colors):
+        idx, z, tri = self.fragments(tris, zs)
+
+        # Depth test: keep the smallest depth written to each pixel, then
+        # color the pixels with the fragments that won
+        depth = self._depth
+        np.minimum.at(depth, idx, z)
+        won = z == depth[idx]
+        self.pixels[idx[won]] = colors[tri[won]]
+
+    def blend_triangles(self, tris, zs, colors, alphas):
+        # Only the nearest translucent surface per pixel is blended
+        idx, z, tri = self.fragments(tris, zs)
+        visible = z < self._depth[idx]
+        idx, z, tri = idx[visible], z[visible], tri[visible]
+
+        nearest = np.full(len(self._depth), np.inf, dtype=np.float32)
+        np.minimum.at(nearest, idx, z)
+        won = np.nonzero(z == nearest[idx])[0]
+        idx, first = np.unique(idx[won], return_index=True)
+        tri = tri[won[first]]
+
+        color = self._color
+        alpha = alphas[tri][:, None]
+        dst_alpha = color[idx, 3:4] / 255
+        out_alpha = alpha + dst_alpha * (1 - alpha)
+        out = (colors[tri] * alpha +
+               color[idx, :3] * dst_alpha * (1 - alpha)) / out_alpha
+        color[idx, :3] = out.astype(np.uint8)
+        color[idx, 3] = (out_alpha[:, 0] * 255).astype(np.uint8)
+
+    def draw_edges(self, tris, zs, edge_color):
+        # Outline triangles with one sample per pixel along each edge,
+        # depth tested with a small bias so edges win over their own faces
+        start = tris.reshape(-1, 2)
+        end = tris[:, [1, 2, 0]].reshape(-1, 2)
+        z_start = zs.reshape(-1)
+        z_end = zs[:, [1, 2, 0]].reshape(-1)
+
+        # Only the samples that land on this framebuffer are generated, so
+        # a tile draws exactly the pixels the whole screen would have
+        lengths = np.ceil(np.abs(end - start).max(axis=1)).astype(np.int64)
+        lengths = np.clip(lengths, 1, MAX_EDGE_SAMPLES)
+        delta = end - start
+        t_lo = np.zeros(len(start))
+        t_hi = np.ones(len(start))
+        for axis, size in ((0, self.width), (1, self.height)):
+            d = delta[:, axis]
+            moving = d != 0
+            safe = np.where(moving, d, 1)
+            t0 = -start[:, axis] / safe
+            t1 = (size - start[:, axis]) / safe
+            inside = (start[:, axis] >= 0) & (start[:, axis] < size)
+            t_lo = np.where(moving, np.maximum(t_lo, np.minimum(t0, t1)),
+                            np.where(inside, t_lo, 1))
+            t_hi = np.where(moving, np.minimum(t_hi, np.maximum(t0, t1)),
+                            np.where(inside, t_hi, 0))
+        first = np.maximum(np.floor(t_lo * lengths), 0).astype(np.int64)
+        last = np.minimum(np.ceil(t_hi * lengths), lengths).astype(np.int64)
+        edge, step = _expand(np.maximum(last - first + 1, 0))
+        t = (first[edge] + step) / lengths[edge]
+
+        x = np.floor(start[edge, 0] + (end[edge, 0] - start[edge, 0]) * t)
+        y = np.floor(start[edge, 1] + (end[edge, 1] - start[edge, 1]) * t)
+        z = z_start[edge] + (z_end[edge] - z_start[edge]) * t
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        idx = (y[inside] * self.pitch + x[inside]).astype(np.int64)
+        z = z[inside]
+
+        depth = self._depth
+        visible = z - 1e-3 <= depth[idx]
+        self.pixels[idx[visible]] = edge_color
+
+    def fragments(self, tris, zs):
+        # Pixels whose centers are covered by each triangle, as flat pixel
+        # index, interpolated depth and triangle number. Every triangle is
+        # split into one horizontal span per pixel row, so only covered
+        # pixels are generated and no per-triangle Python loop is needed.
+        xs = tris[:, :, 0]
+        ys = tris[:, :, 1]
+
+        # Depth is affine in screen space: z = z0 + dz_dx * dx + dz_dy * dy
+        e1 = tris[:, 1] - tris[:, 0]
+        e2 = tris[:, 2] - tris[:, 0]
+        area = screen_windings(tris)
+        dz1 = zs[:, 1] - zs[:, 0]
+        dz2 = zs[:, 2] - zs[:, 0]
+        safe_area = np.where(area == 0, 1, area)
+        dz_dx = (dz1 * e2[:, 1] - dz2 * e1[:, 1]) / safe_area
+        dz_dy = (dz2 * e1[:, 0] - dz1 * e2[:, 0]) / safe_area
+
+        # Rows whose pixel centers fall inside each triangle
+        row0 = np.clip(np.ceil(ys.min(axis=1) - 0.5), 0, self.height)
+        row1 = np.clip(np.floor(ys.max(axis=1) - 0.5) + 1, 0, self.height)
+        rows = np.where(area != 0, row1 - row0, 0).astype(np.int64)
+        rows = np.maximum(rows, 0)
+        tri, offset = _expand(rows)
+        y = row0[tri] + offset
+        cy = y + 0.5
+
+        # Where the row crosses each of the three edges
+        left = np.full(len(tri), np.inf)
+        right = np.full(len(tri), -np.inf)
+        for a, b in ((0, 1), (1, 2), (2, 0)):
+            xa, ya = xs[tri, a], ys[tri, a]
+            xb, yb = xs[tri, b], ys[tri, b]
+            crosses = (np.minimum(ya, yb) <= cy) & (cy <= np.maximum(ya, yb)) \
+                & (ya != yb)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x = xa + (cy - ya) * (xb - xa) / (yb - ya)
+            left = np.where(crosses, np.minimum(left, x), left)
+            right = np.where(crosses, np.maximum(right, x), right)
+
+        col0 = np.clip(np.ceil(left - 0.5), 0, self.width)
+        col1 = np.clip(np.floor(right - 0.5) + 1, 0, self.width)
+        valid = np.isfinite(col0) & np.isfinite(col1)
+        spans = np.where(valid, col1 - col0, 0)
+        spans = np.maximum(spans, 0).astype(np.int64)
+
+        # Depth and pixel index at the start of each span, then step along
+        # it one pixel at a time
+        span_z = zs[tri, 0] + dz_dx[tri] * (col0 + 0.5 - xs[tri, 0]) + \
+            dz_dy[tri] * (cy - ys[tri, 0])
+        start = y.astype(np.int64) * self.pitch + \
+            np.where(valid, col0, 0).astype(np.int64)
+        offset = _expand(spans)[1]
+        idx = np.repeat(start, spans) + offset
+        z = np.repeat(span_z, spans) + np.repeat(dz_dx[tri], spans) * offset
+        return idx, z.astype(np.float32), np.repeat(tri, spans)
+
+
+def prepare_buffer(buffer, edit_mode=False):
+    # Triangles of the buffer as arrays: T x 3 x 2 screen points, T x 3
+    # depths, T x 3 uint8 colors, opacities and whether they are outlined
+    if not len(buffer):
+        return (np.zeros((0, 3, 2)), np.zeros((0, 3)),
+                np.zeros((0, 3), dtype=np.uint8), np.zeros(0),
+                np.zeros(0, dtype=bool))
+
+    tris, zs, color_ids, flags, opacities = triangulate_buffer(buffer)
+    if edit_mode:
+        opacities = np.where(flags & FLAG_EDITABLE, opacities, 50)
+    outlined = (flags & (FLAG_OUTLINE | FLAG_OUTLINE_THICK)) != 0
+    return tris, zs, palette_rgb()[color_ids], opacities, outlined
+
+
+def pack_rgba(colors):
+    # N x 3 uint8 colors to opaque RGBA pixels as uint32
+    rgba = np.full((len(colors), 4), 255, dtype=np.uint8)
+    rgba[:, :3] = colors
+    return rgba.view(np.uint32).reshape(-1)
+
+
+def _flat(view, pitch):
+    # 1-D view of a 2-D array of pixels (with any trailing channel axis)
+    # from its first pixel to its last, rows pitch pixels apart
+    rows, columns = view.shape[:2]
+    length = (rows - 1) * pitch + columns if rows and columns else 0
+    return np.lib.stride_tricks.as_strided(
+        view, (length,) + view.shape[2:], view.strides[1:])
+
+
+def _expand(counts):
+    # For counts [2, 3] returns ([0, 0, 1, 1, 1], [0, 1, 0, 1, 2]): the
+    # owner of every generated item and its position within the owner
+    owner = np.repeat(np.arange(len(counts)), counts)
+    offset = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+    return owner, offset
+
+
+def triangulate_buffer(buffer):
+    # Turn the buffer's polygons into T x 3 x 2 screen points and T x 3
+    # depths. Mesh triangles carry per-vertex depths; other polygons (the
+    # light octagon) are fanned into triangles at their average depth.
+    points = buffer.points
+    vertex_depths = buffer.vertex_depths
+    triangles = [i for i in range(len(points)) if len(points[i]) == 6]
+    tris = np.array([points[i] for i in triangles],
+                    dtype=float).reshape(-1, 3, 2)
+    zs = np.array([vertex_depths[i] if vertex_depths[i] is not None
+                   else [buffer.depths[i]] * 3 for i in triangles],
+                  dtype=float).reshape(-1, 3)
+    source = triangles
+
+    fans = []
+    fan_zs = []
+    fan_source = []
+    for i, polygon in enumerate(points):
+        if len(polygon) <= 6:
+            continue
+        # Triangles (0, k, k + 1) for k = 1 .. n - 2
+        for k in range(2, len(polygon) - 2, 2):
+            fans.append(polygon[0:2] + polygon[k:k + 4])
+            fan_zs.append([buffer.depths[i]] * 3)
+            fan_source.append(i)
+    if fans:
+        tris = np.concatenate([tris, np.array(fans).reshape(-1, 3, 2)])
+        zs = np.concatenate([zs, np.array(fan_zs)])
+        source = source + fan_source
+
+    source = np.array(source, dtype=np.int64)
+    finite = np.isfinite(tris).all(axis=(1, 2)) & np.isfinite(zs).all(axis=1)
+    source = source[finite]
+    return (tris[finite], zs[finite],
+            np.array(buffer.color_ids, dtype=np.int64)[source],
+            np.array(buffer.flags, dtype=np.int64)[source],
+            np.array(buffer.opacities, dtype=float)[source])
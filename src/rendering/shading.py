@@ -1,6 +1,14 @@
-from cmu_graphics import *
+import numpy as np
+
 from matrix_util import *
 
+# One shared color per gray level instead of a new color per triangle
+_gray_levels = [(level, level, level) for level in range(256)]
+
+
+def gray(level):
+    return _gray_levels[level]
+
 
 class ShadingModel:
     def __init__(self, diffuse=1.0, specular=1.0):
@@ -10,6 +18,11 @@ class ShadingModel:
     def shade(self):
         raise NotImplementedError
 
+    def shade_faces(self, normals, light_dir):
+        # Colors for many faces at once. Subclasses can override this with
+        # a vectorized version; the default shades one face at a time.
+        return [self.shade(normal, light_dir) for normal in normals]
+
 
 class Lambertian(ShadingModel):
     # https://lavalle.pl/vr/node197.html
@@ -23,7 +36,19 @@ class Lambertian(ShadingModel):
 
         # Scale to 0-255 and clamp
         intensity = int(min(max(intensity * 255, 50), 170))
-        return rgb(intensity, intensity, intensity)
+        return gray(intensity)
+
+    def shade_faces(self, normals, light_dir):
+        if not isinstance(normals, np.ndarray):
+            return super().shade_faces(normals, light_dir)
+
+        # Same as shade() for an Fx3 array of normals
+        lengths = np.linalg.norm(normals, axis=1)
+        lengths[lengths == 0] = 1
+        intensity = self.diffuse * np.maximum(
+            0.2, (normals @ normalize(light_dir)) / lengths)
+        levels = np.clip(intensity * 255, 50, 170).astype(int)
+        return [gray(level) for level in levels.tolist()]
 
 
 class Phong(ShadingModel):
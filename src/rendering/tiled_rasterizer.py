@@ -0,0 +1,190 @@
+import os
+import weakref
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from rendering.rasterizer import *
+
+
+class TiledRasterizer:
+    # Rasterizer that splits the screen into square tiles, bins triangles
+    # into the tiles they overlap and rasterizes the tiles in worker
+    # processes. Workers write their tiles straight into a color and depth
+    # buffer in shared memory. Tiles don't overlap, so no two workers touch
+    # the same pixel and there is nothing to send back or merge. The
+    # frame's triangles are copied into shared memory once too, so a job
+    # is only the tiles' bounds and where their triangles are listed.
+
+    def __init__(self, width, height, tile_size=128, workers=None):
+        self.tile_size = tile_size
+        self.workers = workers or os.cpu_count() or 1
+        self.width = 0
+        self.height = 0
+        self._shared = []     # the current framebuffer's SharedMemory
+        self._triangles = []  # the SharedMemory holding frame triangles
+
+        # Create the shared memory before forking the workers so they
+        # inherit the same resource tracker instead of starting their own
+        self.resize(width, height)
+        self.pool = Pool(self.workers)
+        self._finalizer = weakref.finalize(self, _release, self.pool,
+                                           self._shared, self._triangles)
+
+    def resize(self, width, height):
+        if (width, height) == (self.width, self.height):
+            return
+        self.width = width
+        self.height = height
+
+        # Color (RGBA) followed by depth (float32) in one block
+        shm = shared_memory.SharedMemory(create=True,
+                                         size=width * height * 8)
+        self.color = np.ndarray((height, width, 4), dtype=np.uint8,
+                                buffer=shm.buf)
+        self.depth = np.ndarray((height, width), dtype=np.float32,
+                                buffer=shm.buf, offset=width * height * 4)
+        _release(None, self._shared)
+        self._shared.append(shm)
+
+    def close(self):
+        self.color = self.depth = None
+        self._finalizer()
+
+    def clear(self):
+        self.color[:] = 0
+        self.depth[:] = np.inf
+
+    def draw_buffer(self, buffer, edit_mode=False):
+        self.clear()
+        arrays = prepare_buffer(buffer, edit_mode)
+        tiles, members = bin_triangles(arrays[0], self.width, self.height,
+                                       self.tile_size)
+        if not tiles:
+            return self.color
+        triangles, layout = self.share(arrays + (members,))
+
+        # Interleave tiles across jobs so busy parts of the screen are
+        # shared between workers
+        jobs = min(len(tiles), self.workers * 4)
+        name = self._shared[0].name
+        self.pool.map(_draw_tiles, [(name, self.width, self.height,
+                                     triangles, layout, tiles[i::jobs])
+                                    for i in range(jobs)])
+        return self.color
+
+    def share(self, arrays):
+        # Copy arrays into the shared triangle block, growing it if they
+        # don't fit. Returns its name and each array's (offset, dtype,
+        # shape) in it.
+        layout = []
+        size = 0
+        for array in arrays:
+            size += -size % 8
+            layout.append((size, array.dtype.str, array.shape))
+            size += array.nbytes
+        if not self._triangles or self._triangles[0].size < size:
+            # Twice the size needed so a growing scene doesn't reallocate
+            # every frame
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=max(2 * size, 1))
+            _release(None, self._triangles)
+            self._triangles.append(shm)
+        shm = self._triangles[0]
+        for (offset, dtype, shape), array in zip(layout, arrays):
+            np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)[...] = \
+                array
+        return shm.name, layout
+
+
+def bin_triangles(tris, width, height, tile_size):
+    # Returns (x0, y0, x1, y1, start, end) for every tile that at least one
+    # triangle's bounding box overlaps, and the triangle numbers grouped by
+    # tile: members[start:end] are the tile's
+    if not len(tris):
+        return [], np.zeros(0, dtype=np.int64)
+    columns = -(-width // tile_size)
+    rows = -(-height // tile_size)
+
+    lo = np.floor(tris.min(axis=1) / tile_size).astype(np.int64)
+    hi = np.floor(tris.max(axis=1) / tile_size).astype(np.int64)
+    visible = (hi[:, 0] >= 0) & (hi[:, 1] >= 0) & \
+        (lo[:, 0] < columns) & (lo[:, 1] < rows)
+    lo = np.maximum(lo, 0)
+    hi = np.minimum(hi, [columns - 1, rows - 1])
+    span_x = hi[:, 0] - lo[:, 0] + 1
+    counts = np.where(visible, span_x * (hi[:, 1] - lo[:, 1] + 1), 0)
+
+    # One (triangle, tile) pair per overlapped tile, grouped by tile
+    tri = np.repeat(np.arange(len(tris)), counts)
+    k = np.arange(len(tri)) - np.repeat(np.cumsum(counts) - counts, counts)
+    tile = (lo[tri, 1] + k // span_x[tri]) * columns + \
+        lo[tri, 0] + k % span_x[tri]
+    order = np.argsort(tile, kind='stable')
+    tile = tile[order]
+    tri = tri[order]
+
+    starts = np.flatnonzero(np.r_[True, tile[1:] != tile[:-1]])
+    tiles = []
+    for start, end in zip(starts.tolist(),
+                          np.r_[starts[1:], len(tile)].tolist()):
+        ty, tx = divmod(int(tile[start]), columns)
+        x0 = tx * tile_size
+        y0 = ty * tile_size
+        tiles.append((x0, y0, min(x0 + tile_size, width),
+                      min(y0 + tile_size, height), start, end))
+    return tiles, tri
+
+
+def _release(pool, *shared):
+    # Stop the workers and free the shared blocks
+    if pool is not None:
+        pool.terminate()
+    for blocks in shared:
+        while blocks:
+            shm = blocks.pop()
+            shm.close()
+            shm.unlink()
+
+
+# Worker process state
+_framebuffer = {}  # shared memory name -> (shm, color, depth)
+_triangles = {}    # shared memory name -> shm of the triangle block
+
+
+def _attach(name, width, height):
+    if name not in _framebuffer:
+        # A new name means the window was resized; drop the old mapping
+        _framebuffer.clear()
+        shm = shared_memory.SharedMemory(name=name)
+        color = np.ndarray((height, width, 4), dtype=np.uint8,
+                           buffer=shm.buf)
+        depth = np.ndarray((height, width), dtype=np.float32,
+                           buffer=shm.buf, offset=width * height * 4)
+        _framebuffer[name] = (shm, color, depth)
+    return _framebuffer[name][1:]
+
+
+def _attach_triangles(name, layout):
+    # The block only changes name when it grows, but the arrays in it
+    # change size every frame
+    if name not in _triangles:
+        _triangles.clear()
+        _triangles[name] = shared_memory.SharedMemory(name=name)
+    shm = _triangles[name]
+    return [np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+            for offset, dtype, shape in layout]
+
+
+def _draw_tiles(job):
+    name, width, height, triangles, layout, tiles = job
+    color, depth = _attach(name, width, height)
+    tris, zs, colors, opacities, outlined, members = \
+        _attach_triangles(triangles, layout)
+    for x0, y0, x1, y1, start, end in tiles:
+        # Draw straight into the tile's part of the framebuffer
+        tile = Rasterizer(x1 - x0, y1 - y0, color[y0:y1, x0:x1],
+                          depth[y0:y1, x0:x1])
+        mine = members[start:end]
+        tile.draw_arrays(tris[mine] - [x0, y0], zs[mine], colors[mine],
+                         opacities[mine], outlined[mine])
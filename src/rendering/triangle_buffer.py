@@ -0,0 +1,81 @@
+import numpy as np
+
+from rendering.backends import to_rgb
+
+# Per-triangle flags
+FLAG_EDITABLE = 1       # belongs to an editable mesh
+FLAG_OUTLINE = 2        # thin orange border (selected mesh)
+FLAG_OUTLINE_THICK = 4  # thick orange border (selected light)
+
+# Fill colors shared by every buffer, indexed by color id
+palette = []
+_palette_ids = {}
+_palette_rgb = []  # (r, g, b) of each palette entry for the rasterizer
+
+
+def color_id(color):
+    # Colors are names ('white') or (r, g, b) tuples
+    if color not in _palette_ids:
+        _palette_ids[color] = len(palette)
+        palette.append(color)
+        _palette_rgb.append(to_rgb(color))
+    return _palette_ids[color]
+
+
+def palette_rgb():
+    # Palette as a P x 3 uint8 array, indexed by color id
+    return np.array(_palette_rgb, dtype=np.uint8).reshape(-1, 3)
+
+
+class TriangleBuffer:
+    # Structure-of-arrays triangle list shared by all objects in a frame.
+    # Each column holds one entry per polygon so the draw loop doesn't need
+    # a dict per triangle.
+    def __init__(self):
+        self.points = []     # flat [x0, y0, x1, y1, ...] screen coordinates
+        self.depths = []     # average NDC depth used for ordering
+        self.color_ids = []  # index into palette
+        self.flags = []
+        self.opacities = []
+        self.vertex_depths = []  # per-vertex depths or None, for the rasterizer
+
+    def __len__(self):
+        return len(self.depths)
+
+    def clear(self):
+        self.points.clear()
+        self.depths.clear()
+        self.color_ids.clear()
+        self.flags.clear()
+        self.opacities.clear()
+        self.vertex_depths.clear()
+
+    def append(self, points, depth, color, flags=0, opacity=100,
+               vertex_depths=None):
+        self.points.append(points)
+        self.depths.append(depth)
+        self.color_ids.append(color_id(color))
+        self.flags.append(flags)
+        self.opacities.append(opacity)
+        self.vertex_depths.append(vertex_depths)
+
+    def extend(self, points, depths, color_ids, flags=0, opacity=100,
+               vertex_depths=None):
+        # Add a batch of polygons that share the same flags and opacity.
+        # Without vertex depths the rasterizer draws them at their average
+        # depth.
+        self.points.extend(points)
+        self.depths.extend(depths)
+        self.color_ids.extend(color_ids)
+        self.flags.extend([flags] * len(depths))
+        self.opacities.extend([opacity] * len(depths))
+        if vertex_depths is None:
+            self.vertex_depths.extend([None] * len(depths))
+        else:
+            self.vertex_depths.extend(vertex_depths)
+
+    def back_to_front(self):
+        # Indices ordered from farthest to nearest (painter's algorithm).
+        # The sort is stable so equal depths keep their emission order.
+        depths = np.asarray(self.depths, dtype=float)
+        return np.argsort(-depths, kind='stable').tolist()
@@ -1,54 +1,148 @@
-from cmu_graphics import *
 from objects.lights import *
+from rendering.triangle_buffer import *
+from rendering.rasterizer import Rasterizer
+from rendering.tiled_rasterizer import TiledRasterizer
+from rendering.picking import ScenePicker
+from profiler import profiler
 
 
 class World:
     def __init__(self, camera, width, height):
         self.camera = camera
         self.objects = []
+        self.version = 0  # bumped when objects are added or removed
         self.light = None
         self.width = width
         self.height = height
+        self.triangles = TriangleBuffer()
+        self.rasterizer = None
+        self._rasterizer_key = None
+        self.picker = ScenePicker()
 
     def add_object(self, obj):
         if isinstance(obj, Light):
             self.light = obj
         self.objects.append(obj)
+        self.version += 1
 
     def remove_object(self, obj):
         if obj in self.objects:
             self.objects.remove(obj)
+            self.version += 1
+
+    def clear(self):
+        self.objects = []
+        self.light = None
+        self.version += 1
+
+    def pick(self, app, x, y):
+        # Frontmost selectable object under a screen point as (object, t,
+        # face number), or None
+        return self.picker.pick(app, self, x, y)
 
     def get_light_direction(self):
         if self.light:
             return self.light.get_view_direction()
 
-    def render(self, app):
+    def resize(self, app):
         if app.width != self.width or app.height != self.height:
             self.camera.resize(app.width, app.height)
             self.width = app.width
             self.height = app.height
 
+    def render(self, app, layer=None):
+        # Draws every object, or only the objects of one layer ('grid',
+        # 'scene' or 'overlay') so the layers can be cached separately, see
+        # rendering/layers.py
+        self.resize(app)
+        app.backend.begin_frame(app.width, app.height)
+
         # Collect all triangles from all objects
-        all_triangles = []
+        buffer = self.triangles
+        buffer.clear()
         for obj in self.objects:
-            triangles = obj.render(app)
-            if triangles:
-                all_triangles.extend(triangles)
+            if layer is None or obj.layer == layer:
+                obj.render(app, buffer)
+            if layer is None or layer == 'overlay':
+                obj.draw_overlay(app)
+
+        if app.use_rasterizer:
+            # One image per frame instead of a polygon per triangle. Layers
+            # without triangles don't need one.
+            if len(buffer):
+                with profiler.scope('raster'):
+                    pixels = self.rasterize(app, buffer)
+                with profiler.scope('draw'):
+                    app.backend.image(pixels, 0, 0)
+        else:
+            with profiler.scope('sort'):
+                order = buffer.back_to_front()
 
-        # Sort all triangles by depth
-        all_triangles.sort(key=lambda tri: tri['depth'], reverse=True)
+            with profiler.scope('draw'):
+                self.draw_triangles(app, buffer, order)
 
-        # Draw all triangles in sorted order
-        for tri in all_triangles:
-            if app.edit_mode and not tri.get('is_editable', False):
-                drawPolygon(*tri['points'], fill=tri['color'], opacity=50)
+        app.backend.end_frame()
+
+    def rasterize(self, app, buffer):
+        # Depth-buffered render of the buffer into a window-sized RGBA array.
+        # With more than one raster worker the screen is split into tiles
+        # that are rasterized in parallel.
+        key = (app.raster_workers, app.raster_tile_size)
+        if key != self._rasterizer_key:
+            if self.rasterizer is not None:
+                self.rasterizer.close()
+            if app.raster_workers > 1:
+                self.rasterizer = TiledRasterizer(
+                    app.width, app.height, app.raster_tile_size,
+                    app.raster_workers)
+            else:
+                self.rasterizer = Rasterizer(app.width, app.height)
+            self._rasterizer_key = key
+        self.rasterizer.resize(app.width, app.height)
+        return self.rasterizer.draw_buffer(buffer, app.edit_mode)
+
+    def draw_triangles(self, app, buffer, order):
+        # Draw all triangles from back to front
+        polygon = app.backend.polygon
+        points = buffer.points
+        color_ids = buffer.color_ids
+        flags = buffer.flags
+        opacities = buffer.opacities
+        for i in order:
+            tri_flags = flags[i]
+            if app.edit_mode and not tri_flags & FLAG_EDITABLE:
+                polygon(points[i], palette[color_ids[i]], opacity=50)
+            elif tri_flags & (FLAG_OUTLINE | FLAG_OUTLINE_THICK):
+                polygon(points[i], palette[color_ids[i]], border='orange',
+                        border_width=2 if tri_flags & FLAG_OUTLINE_THICK
+                        else 0.5,
+                        opacity=opacities[i])
             else:
-                drawPolygon(*tri['points'],
-                            fill=tri['color'],
-                            border=tri.get('border', None),
-                            borderWidth=tri.get('borderWidth', 0),
-                            opacity=tri.get('opacity', 100))
+                polygon(points[i], palette[color_ids[i]],
+                        opacity=opacities[i])
+
+    def layer_key(self, app, layer):
+        # Changes whenever something drawn on the layer may have changed
+        key = (self.camera.version, app.is_ortho, app.width, app.height)
+        if layer == 'grid':
+            return key
+
+        if layer == 'scene':
+            return key + (app.edit_mode, id(app.selected_object),
+                          app.use_rasterizer, app.lod_pixel_error,
+                          tuple((id(obj), obj.transform_version,
+                                 obj.geometry_version, obj.lods_ready)
+                                for obj in self.objects
+                                if obj.layer == 'scene'))
+
+        # The gizmo only follows the camera, edit mode adds the selection
+        if not app.edit_mode:
+            return key
+        return key + (id(app.selected_object),
+                      tuple((obj.selection_mode, obj.selected_vertex,
+                             obj.selected_face, obj.transform_version,
+                             obj.geometry_version)
+                            for obj in self.objects if obj.is_editable))
 
     def onMouseMove(self, mouseX, mouseY, edit_mode=False):
         if edit_mode:
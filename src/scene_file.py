@@ -0,0 +1,316 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from objects.assets import GeometryAsset
+from objects.gizmo import Gizmo
+from objects.instanced_mesh import InstancedMesh
+from objects.lights import Light, PointLight
+from objects.mesh import Mesh
+from objects.primatives import Cube, CubeArray, Grid, ImportedMesh, Plane
+
+# Scenes are saved as .pyprism files: a header, the vertices, indices and
+# instance data of every mesh as raw little-endian arrays, and a JSON table
+# of the objects (type, name, transform, flags and where their arrays are),
+# the light and the camera. Loading memory-maps the file once and hands the
+# meshes views into it, so opening a scene costs time in the number of
+# objects rather than their size. Meshes sharing geometry share one copy.
+#
+# Saving again to the file last saved or loaded appends only the arrays
+# that changed since, then a new table, and finally points the header at
+# the new table, so an interrupted save leaves the previous one readable.
+
+# magic, format version, table offset, table length, padded to 32 bytes so
+# the arrays that follow are aligned
+_HEADER = struct.Struct('<4sIQQ8x')
+_MAGIC = b'PPSC'
+_VERSION = 1
+_ALIGN = 16
+
+# A save rewrites the whole file when more than this fraction of it would
+# be arrays and tables no longer in use
+COMPACT_FRACTION = 0.5
+
+# Object types a scene can hold, by the name saved with them. Other objects
+# in the world are not saved.
+_CLASSES = {cls.__name__: cls for cls in (
+    Mesh, Cube, Plane, ImportedMesh, Grid, InstancedMesh, CubeArray,
+    PointLight, Gizmo)}
+
+
+def _file_state(path):
+    # Changes if anyone else writes the file
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _nbytes(record):
+    return int(np.prod(record['shape'])) * np.dtype(record['dtype']).itemsize
+
+
+class _Writer:
+    # Writes arrays one after another from offset, each aligned
+    def __init__(self, f, offset):
+        self.f = f
+        self.offset = offset
+        self.written = 0
+
+    def align(self):
+        self.offset += -self.offset % _ALIGN
+        return self.offset
+
+    def write(self, array, dtype, width=None):
+        # Returns where the array went as {'offset', 'dtype', 'shape'}
+        array = np.ascontiguousarray(array, dtype=dtype)
+        if width is not None:
+            array = array.reshape(-1, width)
+        self.f.seek(self.align())
+        self.f.write(array.tobytes())
+        record = {'offset': self.offset, 'dtype': dtype,
+                  'shape': list(array.shape)}
+        self.offset += array.nbytes
+        self.written += array.nbytes
+        return record
+
+
+class SceneFile:
+    # A .pyprism file and what has been saved to it. Keep one per file so
+    # that saves after the first only write what changed.
+    def __init__(self, path):
+        self.path = path
+        # Arrays in the file by the object they were saved from, as
+        # {id(source): (source, version, records)}. source is the mesh, or
+        # the GeometryAsset of meshes sharing geometry.
+        self._stored = {}
+        # File size and modification time after our last save or load
+        self._state = None
+        # The file mapped by the last load
+        self._data = None
+
+    def save(self, app):
+        # Writes the app's world and camera. Returns the bytes written.
+        if self._state is not None and \
+                self._state == _file_state(self.path):
+            written, size, live = self._write(app, append=True)
+            if size - live <= COMPACT_FRACTION * size:
+                return written
+        return self._write(app, append=False)[0]
+
+    def _write(self, app, append):
+        # Returns bytes written, file size and bytes still in use
+        if append:
+            path = self.path
+            f = open(path, 'r+b')
+            offset = os.path.getsize(path)
+            stored = self._stored
+        else:
+            # Write to a temporary file first so readers never see a
+            # partial scene
+            path = f'{self.path}.{os.getpid()}.tmp'
+            f = open(path, 'wb')
+            f.write(bytes(_HEADER.size))
+            offset = _HEADER.size
+            stored = {}
+
+        kept = {}
+
+        def store(source, version, arrays):
+            # Records of the arrays from arrays(), written unless the file
+            # already has them for this version of source, from an earlier
+            # save or from another mesh sharing them
+            cached = kept.get(id(source)) or stored.get(id(source))
+            if cached is not None and cached[0] is source and \
+                    cached[1] == version:
+                records = cached[2]
+            else:
+                records = {name: writer.write(*array)
+                           for name, array in arrays().items()}
+            kept[id(source)] = (source, version, records)
+            return records
+
+        with f:
+            writer = _Writer(f, offset)
+            table = {
+                'camera': self.camera_state(app),
+                'objects': [self.object_entry(obj, store)
+                            for obj in app.world.objects
+                            if type(obj).__name__ in _CLASSES],
+            }
+            data = json.dumps(table).encode()
+            table_offset = writer.align()
+            f.seek(table_offset)
+            f.write(data)
+            f.truncate()
+            f.flush()
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, _VERSION, table_offset, len(data)))
+
+        if not append:
+            # Let go of the map of the file being replaced, which some
+            # systems won't replace while it is open. Meshes opened from
+            # it keep their views of the old file until they are edited.
+            self._data = None
+            os.replace(path, self.path)
+        self._stored = kept
+        self._state = _file_state(self.path)
+        size = table_offset + len(data)
+        live = _HEADER.size + len(data) + sum(
+            _nbytes(record) for _, _, records in kept.values()
+            for record in records.values())
+        return writer.written + len(data) + _HEADER.size, size, live
+
+    @staticmethod
+    def camera_state(app):
+        camera = app.camera
+        return {'target': list(camera.target), 'azimuth': camera.azimuth,
+                'elevation': camera.elevation, 'radius': camera.radius,
+                'fov': camera.fov, 'prev_fov': camera.prev_fov,
+                'ortho': app.is_ortho}
+
+    def object_entry(self, obj, store):
+        entry = {'type': type(obj).__name__}
+        if isinstance(obj, Light):
+            entry.update(intensity=obj.intensity, position=obj.position())
+        elif isinstance(obj, Gizmo):
+            entry['size'] = obj.size
+        elif isinstance(obj, InstancedMesh):
+            # The instances' geometry is the base mesh's
+            entry.update(self.mesh_entry(obj))
+            entry['base'] = self.object_entry(obj.base, store)
+            # Instance data is rewritten whenever the object moves
+            entry['instances'] = store(
+                obj, ('instances', obj.transform_version), lambda: {
+                    'transforms': (obj.instance_transforms, '<f8'),
+                    'colors': (obj.instance_colors, '<f8')})
+        else:
+            entry.update(self.mesh_entry(obj))
+            if obj.asset is not None:
+                source, version = obj.asset, None
+            else:
+                source, version = obj, obj.geometry_version
+            # Indices are saved as 64-bit so they map straight to intp
+            entry['geometry'] = store(source, version, lambda: {
+                'vertices': (obj.vertices, '<f8', 4),
+                'indices': (obj.indices, '<i8')})
+        return entry
+
+    @staticmethod
+    def mesh_entry(mesh):
+        return {'name': getattr(mesh, 'name', None),
+                'transform': np.asarray(mesh.transform_matrix, dtype=float)
+                .ravel().tolist(),
+                'editable': mesh.is_editable,
+                'selectable': mesh.is_selectable,
+                'culling': mesh.backface_culling}
+
+    def load(self, app):
+        # Replaces the app's world and camera with the scene. Returns the
+        # objects added. Raises ValueError if the file isn't a scene.
+        with open(self.path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError('Truncated scene file')
+            magic, version, table_offset, table_length = \
+                _HEADER.unpack(header)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError('Not a scene file')
+            f.seek(table_offset)
+            data = f.read(table_length)
+        if len(data) != table_length:
+            raise ValueError('Truncated scene file')
+        table = json.loads(data)
+
+        self._data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        self._stored = {}
+        assets = {}
+        objects = [self.restore(entry, assets) for entry in table['objects']]
+
+        app.world.clear()
+        for obj in objects:
+            app.world.add_object(obj)
+        self.restore_camera(app, table['camera'])
+        self._state = _file_state(self.path)
+        return objects
+
+    def array(self, record):
+        # Read-only view of an array in the file
+        shape = tuple(record['shape'])
+        nbytes = _nbytes(record)
+        offset = record['offset']
+        if offset + nbytes > len(self._data):
+            raise ValueError('Truncated scene file')
+        return self._data[offset:offset + nbytes].view(
+            record['dtype']).reshape(shape)
+
+    def restore(self, entry, assets):
+        # assets holds the GeometryAsset made for each vertex array so far
+        cls = _CLASSES.get(entry['type'])
+        if cls is None:
+            raise ValueError(f"Unknown object type {entry['type']}")
+        if issubclass(cls, Light):
+            return cls(entry['intensity'], *entry['position'])
+        if cls is Gizmo:
+            return Gizmo(entry['size'])
+
+        # Meshes are restored from their saved state rather than built
+        # by their class's constructor
+        mesh = cls.__new__(cls)
+        if issubclass(cls, InstancedMesh):
+            InstancedMesh.__init__(mesh, self.restore(entry['base'], assets))
+            records = entry['instances']
+            mesh.instance_transforms = np.array(
+                self.array(records['transforms']))
+            mesh.instance_colors = np.array(self.array(records['colors']))
+        else:
+            records = entry['geometry']
+            vertices = self.array(records['vertices'])
+            indices = self.array(records['indices'])
+            key = records['vertices']['offset']
+            if issubclass(cls, Grid):
+                # Lines aren't triangles a GeometryAsset holds
+                Mesh.__init__(mesh, vertices.tolist(), indices.tolist())
+            else:
+                # Meshes that shared geometry share it again, copied on
+                # the first edit like meshes loaded from the same file
+                if key not in assets:
+                    assets[key] = GeometryAsset(self.path, vertices, indices)
+                asset = assets[key]
+                Mesh.__init__(mesh, asset.vertices, asset.indices)
+                mesh.asset = asset
+
+        if entry['name'] is not None:
+            mesh.name = entry['name']
+        mesh.transform_matrix = np.reshape(entry['transform'],
+                                           (4, 4)).tolist()
+        mesh.is_editable = entry['editable']
+        mesh.is_selectable = entry['selectable']
+        mesh.backface_culling = entry['culling']
+        mesh.mark_transform_dirty()
+
+        # Arrays already in the file don't need saving again
+        if isinstance(mesh, InstancedMesh):
+            self._stored[id(mesh)] = (
+                mesh, ('instances', mesh.transform_version), records)
+        elif mesh.asset is not None:
+            self._stored[id(mesh.asset)] = (mesh.asset, None, records)
+        else:
+            self._stored[id(mesh)] = (mesh, mesh.geometry_version, records)
+        return mesh
+
+    @staticmethod
+    def restore_camera(app, state):
+        camera = app.camera
+        camera.target = list(state['target'])
+        camera.azimuth = state['azimuth']
+        camera.elevation = state['elevation']
+        camera.radius = state['radius']
+        camera.fov = state['fov']
+        camera.prev_fov = state['prev_fov']
+        app.is_ortho = state['ortho']
+        camera.resize(app.width, app.height)
+        camera.orbit(0, 0)
@@ -1,6 +1,3 @@
-from cmu_graphics import *
-
-
 def drawUi(app):
     drawPanel(app)
     drawSceneObjectsList(app)
@@ -11,31 +8,49 @@ def drawUi(app):
         drawHelpPopup(app)
 
 
+def uiKey(app):
+    # Everything drawUi() depends on, the UI layer is redrawn when it changes
+    obj = app.selected_object
+    selected = None
+    if obj is not None:
+        lod = obj.lod
+        selected = (id(obj), len(obj.vertices), len(obj.indices),
+                    obj.selection_mode, lod.index if lod is not None else None,
+                    len(getattr(obj, 'instance_transforms', ())),
+                    getattr(obj, 'selected_instance', None))
+    objects = tuple((id(obj), getattr(obj, 'name', None))
+                    for obj in app.world.objects if obj.is_selectable)
+    return (app.edit_mode, app.transform_mode, app.axis_constraint,
+            app.show_help, app.show_add_menu, app.help_x, app.help_y,
+            app.add_menu_y, objects, selected)
+
+
 def drawPanel(app):
-    drawRect(0, 0, app.width//5, app.height, fill=rgb(30, 30, 30), opacity=90)
+    app.backend.rect(0, 0, app.width//5, app.height, (30, 30, 30),
+                     opacity=90)
 
 
-def drawText(text, x, y, fill='white', font='arial', size=12, align='left',
-             highlight_width=0, highlight_height=0, highlight_fill='black',
-             bold=False):
+def drawText(app, text, x, y, fill='white', font='arial', size=12,
+             align='left', highlight_width=0, highlight_height=0,
+             highlight_fill='black', bold=False):
     if highlight_width > 0 or highlight_height > 0:
-        drawRect(x - 10, y - highlight_height//2, highlight_width,
-                 highlight_height, fill=highlight_fill)
-    drawLabel(text, x, y, fill=fill,
-              size=size, font=font, align=align, bold=bold)
+        app.backend.rect(x - 10, y - highlight_height//2, highlight_width,
+                         highlight_height, highlight_fill)
+    app.backend.label(text, x, y, fill, bold=bold, size=size, align=align,
+                      font=font)
 
 
 def drawSceneObjectsList(app):
     # Scene Objects
-    drawText('Scene', 10, 30, size=14, highlight_width=app.width//5,
-             highlight_height=32, highlight_fill=rgb(40, 40, 40), bold=True)
+    drawText(app, 'Scene', 10, 30, size=14, highlight_width=app.width//5,
+             highlight_height=32, highlight_fill=(40, 40, 40), bold=True)
 
     y_start = 32
     idx = 0
     for obj in app.world.objects:
         if obj.is_selectable:
             idx += 1
-            bg_color = rgb(40, 40, 40) if idx % 2 == 0 else rgb(50, 50, 50)
+            bg_color = (40, 40, 40) if idx % 2 == 0 else (50, 50, 50)
             y = y_start + (idx * 20)
             # so that the list doesn't go below into properties panel
             if y >= app.height//2:
@@ -43,13 +58,13 @@ def drawSceneObjectsList(app):
 
             # Highlight selected object
             if obj == app.selected_object:
-                drawRect(0, y - 10, app.width//5, 20,
-                         fill=bg_color, border='orange', borderWidth=1)
+                app.backend.rect(0, y - 10, app.width//5, 20, bg_color,
+                                 border='orange', border_width=1)
             else:
-                drawRect(0, y - 10, app.width//5, 20, fill=bg_color)
+                app.backend.rect(0, y - 10, app.width//5, 20, bg_color)
 
             name = obj.name if hasattr(obj, 'name') else type(obj).__name__
-            drawText(name, 15, y, size=12)
+            drawText(app, name, 15, y, size=12)
 
 
 def drawObjectListItem(app, obj, background):
@@ -58,7 +73,7 @@ def drawObjectListItem(app, obj, background):
     w = 200
     h = 20
 
-    drawText(type(obj).__name__, x + 5, y + 10, highlight_width=w -
+    drawText(app, type(obj).__name__, x + 5, y + 10, highlight_width=w -
              10, highlight_height=h, highlight_fill=background)
 
 
@@ -70,78 +85,91 @@ def drawPropertiesPanel(app):
     y = app.height // 2
 
     # Properties Header
-    drawText('Properties', 10, y, size=14, highlight_width=app.width//5,
-             highlight_height=27, highlight_fill=rgb(40, 40, 40), bold=True)
+    drawText(app, 'Properties', 10, y, size=14, highlight_width=app.width//5,
+             highlight_height=27, highlight_fill=(40, 40, 40), bold=True)
 
     y += 30
     # Mode Section
-    drawText('Mode:', 15, y, size=12)
+    drawText(app, 'Mode:', 15, y, size=12)
     mode_color = 'orange' if app.edit_mode else 'white'
-    drawText('Edit' if app.edit_mode else 'Object',
+    drawText(app, 'Edit' if app.edit_mode else 'Object',
              60, y, fill=mode_color, size=12)
 
     # Object Properties
     y += 20
-    drawText(f'Vertices: {len(app.selected_object.vertices)}', 15, y, size=12)
+    drawText(app, f'Vertices: {len(app.selected_object.vertices)}', 15, y,
+             size=12)
 
     if app.selected_object.is_editable:
-        drawText(f'Trianges: {len(app.selected_object.indices) // 3}',
+        drawText(app, f'Trianges: {len(app.selected_object.indices) // 3}',
                  15, y + 20, size=12)
 
+    # Instance count and the instance picked last, in the row editable
+    # meshes use for their triangle count
+    if hasattr(app.selected_object, 'instance_transforms'):
+        text = f'Instances: {len(app.selected_object.instance_transforms)}'
+        if app.selected_object.selected_instance is not None:
+            text += f' (#{app.selected_object.selected_instance})'
+        drawText(app, text, 15, y + 20, size=12)
+
+    # Level of detail drawn last frame
+    lod = app.selected_object.lod
+    if lod is not None:
+        y += 20
+        drawText(app, f'LOD: {lod.index} ({len(lod)} tris)', 15, y + 20,
+                 fill='orange' if lod.index else 'white', size=12)
+
     # Selection Mode
     if app.edit_mode:
         y += 50
-        drawText('Select:', 15, y, size=12)
+        drawText(app, 'Select:', 15, y, size=12)
         vertex_color = 'orange' if \
             app.selected_object.selection_mode == 'vertex' else 'white'
         face_color = 'orange' if \
             app.selected_object.selection_mode == 'face' else 'white'
-        drawText('Vertex (1)', 60, y, fill=vertex_color, size=12)
-        drawText('Face (2)', 60, y + 20, fill=face_color, size=12)
+        drawText(app, 'Vertex (1)', 60, y, fill=vertex_color, size=12)
+        drawText(app, 'Face (2)', 60, y + 20, fill=face_color, size=12)
 
     # Transform Section
     y += 60
-    drawText('Transform:', 15, y, size=12)
+    drawText(app, 'Transform:', 15, y, size=12)
     move_color = 'orange' if app.transform_mode == 'move' else 'white'
     rotate_color = 'orange' if app.transform_mode == 'rotate' else 'white'
     scale_color = 'orange' if app.transform_mode == 'scale' else 'white'
-    drawText('Move (G)', 90, y, fill=move_color, size=12)
-    drawText('Rotate (R)', 90, y + 20, fill=rotate_color, size=12)
-    drawText('Scale (S)', 90, y + 40, fill=scale_color, size=12)
+    drawText(app, 'Move (G)', 90, y, fill=move_color, size=12)
+    drawText(app, 'Rotate (R)', 90, y + 20, fill=rotate_color, size=12)
+    drawText(app, 'Scale (S)', 90, y + 40, fill=scale_color, size=12)
 
     # Axis Constraint
     if app.transform_mode:
         y += 70
-        drawText('Axis:', 15, y, size=12)
+        drawText(app, 'Axis:', 15, y, size=12)
         x_color = 'orange' if app.axis_constraint == 'x' else 'white'
         y_color = 'orange' if app.axis_constraint == 'y' else 'white'
         z_color = 'orange' if app.axis_constraint == 'z' else 'white'
-        drawText('X', 70, y, fill=x_color, size=12)
-        drawText('Y', 90, y, fill=y_color, size=12)
-        drawText('Z', 110, y, fill=z_color, size=12)
+        drawText(app, 'X', 70, y, fill=x_color, size=12)
+        drawText(app, 'Y', 90, y, fill=y_color, size=12)
+        drawText(app, 'Z', 110, y, fill=z_color, size=12)
 
 
 def drawHelpButton(app):
-    drawCircle(app.help_x, app.help_y, 10, fill=rgb(60, 60, 60))
-    drawLabel('?', app.help_x, app.help_y, size=14, bold=True, fill='white')
+    app.backend.circle(app.help_x, app.help_y, 10, (60, 60, 60))
+    app.backend.label('?', app.help_x, app.help_y, 'white', bold=True, size=14)
 
 
 def drawHelpPopup(app):
-    drawRect(0, 0, app.width, app.height, fill='black', opacity=50)
+    app.backend.rect(0, 0, app.width, app.height, 'black', opacity=50)
 
-    w = 420
-    h = 540
-    x = app.width//2 - w//2
-    y = app.height//2 - h//2
-    drawRect(x, y, w, h, fill=rgb(40, 40, 40), border='white')
-
-    help_text = [
+    # Two columns of sections
+    help_text = [[
         ('Navigation', [
             'Space + Mouse: Orbit camera',
             'q + Mouse: Zoom camera',
             'w + Mouse: Pan camera',
             'X/Y/Z: Snap view to axis',
-            '5: Toggle orthographic view'
+            '5: Toggle orthographic view',
+            '6: Toggle depth-buffered rasterizer',
+            '7: Toggle cached layer compositing'
         ]),
         ('Selection', [
             'Click: Select object',
@@ -154,39 +182,90 @@ def drawHelpPopup(app):
             'R: Rotate',
             'S: Scale',
             'X/Y/Z: Constraint to axis'
-        ]),
+        ])
+    ], [
         ('Modeling', [
-            'E: Extrude (in face mode)',
-            'Backspace: Delete selected object'
+            '+/-: Grow/shrink face selection',
+            'L: Select face loop under the mouse',
+            'E: Extrude selected faces',
+            'Backspace: Delete selected object',
+            'Ctrl+Z / Ctrl+Y: Undo / redo'
         ]),
-        ('Click anywhere to close', [])
-    ]
-
-    ty = y + 40
-    for section, items in help_text:
-        drawText(section, x + 20, ty, size=14, bold=True)
-        ty += 30
-        for item in items:
-            drawText(item, x + 40, ty, size=12)
-            ty += 20
-        ty += 10
+        ('File', [
+            'Ctrl+S / Ctrl+O: Save / open scene.pyprism'
+        ]),
+        ('Profiling', [
+            'P: Toggle frame profiler',
+            'Shift+P: Export profile_trace.json/.csv'
+        ])
+    ]]
+
+    # Sized to the text: each section takes 40 pixels for its heading and
+    # 20 per line, and the closing line goes below the longer column
+    column_w = 340
+    column_h = max(sum(40 + 20 * len(items) for section, items in column)
+                   for column in help_text)
+    w = column_w * len(help_text) + 20
+    h = column_h + 70
+    x = app.width//2 - w//2
+    y = app.height//2 - h//2
+    app.backend.rect(x, y, w, h, (40, 40, 40), border='white')
+
+    for i, column in enumerate(help_text):
+        tx = x + i * column_w
+        ty = y + 40
+        for section, items in column:
+            drawText(app, section, tx + 20, ty, size=14, bold=True)
+            ty += 30
+            for item in items:
+                drawText(app, item, tx + 40, ty, size=12)
+                ty += 20
+            ty += 10
+    drawText(app, 'Click anywhere to close', x + 20, y + h - 30, size=14,
+             bold=True)
 
 
 def drawAddObjectMenu(app):
     # Add button
     y = app.add_menu_y
-    drawText('+ Add', 10, y, size=14, highlight_width=app.width//5,
-             highlight_height=25, highlight_fill=rgb(40, 40, 40))
+    drawText(app, '+ Add', 10, y, size=14, highlight_width=app.width//5,
+             highlight_height=25, highlight_fill=(40, 40, 40))
 
     if app.show_add_menu:
         # Menu background
-        options = ['Cube', 'Plane', 'Suzanne', 'Sphere', 'Teapot']
+        options = ['Cube', 'Plane', 'Suzanne', 'Sphere', 'Teapot',
+                   'Cube Array']
         menu_y = y + 25
         menu_h = 25 * len(options)
-        drawRect(10, menu_y, app.width//5-20, menu_h,
-                 fill=rgb(50, 50, 50), border=rgb(60, 60, 60))
+        app.backend.rect(10, menu_y, app.width//5-20, menu_h, (50, 50, 50),
+                         border=(60, 60, 60))
 
         # Menu options
         for i, option in enumerate(options):
             option_y = menu_y + (i * 25) + 12
-            drawText(option, 20, option_y, size=12)
+            drawText(app, option, 20, option_y, size=12)
+
+
+def drawProfilerOverlay(app, profiler):
+    # Per-stage p50/p95/p99 frame times over the recent frames
+    stages = profiler.stages()
+    w = 280
+    h = 40 + 18 * len(stages)
+    x = app.width - w - 10
+    y = app.height - h - 10
+    app.backend.rect(x, y, w, h, (30, 30, 30), opacity=85)
+
+    drawText(app, f'Profiler ({len(profiler.frames)} frames)', x + 10, y + 12,
+             size=12, bold=True)
+    drawText(app, 'p50', x + 130, y + 30, size=11, bold=True)
+    drawText(app, 'p95', x + 180, y + 30, size=11, bold=True)
+    drawText(app, 'p99', x + 230, y + 30, size=11, bold=True)
+
+    ty = y + 48
+    for stage in stages:
+        p50, p95, p99 = profiler.percentiles(stage)
+        drawText(app, stage, x + 10, ty, size=11, bold=stage == 'frame')
+        drawText(app, f'{p50:.2f}', x + 130, ty, size=11)
+        drawText(app, f'{p95:.2f}', x + 180, ty, size=11)
+        drawText(app, f'{p99:.2f}', x + 230, ty, size=11)
+        ty += 18
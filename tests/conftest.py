@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# Keep the geometry cache the tests fill out of the home directory. Set
+# before anything imports objects.obj_loader, which reads it once.
+os.environ['PYPRISM_CACHE_DIR'] = tempfile.mkdtemp(prefix='pyprism-tests-')
+
+
+@pytest.fixture
+def model():
+    # Path of one of the bundled models by file name
+    return lambda name: os.path.join(ROOT, name)
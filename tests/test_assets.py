@@ -0,0 +1,70 @@
+import types
+
+import numpy as np
+import pytest
+
+from objects import assets
+from objects.primatives import ImportedMesh
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    registry = assets.AssetRegistry()
+    monkeypatch.setattr(assets, 'registry', registry)
+    return registry
+
+
+@pytest.fixture
+def app():
+    return types.SimpleNamespace(
+        edit_mode=True, transform_mode='move', axis_constraint=None,
+        camera=types.SimpleNamespace(get_view_direction=lambda: [0, 0, 1]))
+
+
+def test_meshes_from_one_file_share_geometry(model, registry):
+    meshes = [ImportedMesh(model('teapot.obj')) for _ in range(10)]
+    asset = meshes[0].asset
+    assert len(registry.assets) == 1
+    for mesh in meshes:
+        assert mesh.asset is asset
+        assert mesh.vertices is asset.vertices
+        assert mesh.indices is asset.indices
+        assert mesh.face_array is asset.faces
+    assert registry.nbytes() == asset.vertices.nbytes + asset.indices.nbytes
+
+    ImportedMesh(model('sphere.obj'))
+    assert len(registry.assets) == 2
+
+
+def test_cached_geometry_is_not_copied(model):
+    ImportedMesh(model('suzanne.obj'))  # fills the cache
+    assets.registry.assets.clear()
+    asset = ImportedMesh(model('suzanne.obj')).asset
+    # Views of the cache's memory map, not copies of it
+    for array in (asset.vertices, asset.indices, asset.faces):
+        assert not array.flags.owndata
+        assert not array.flags.writeable
+    assert asset.indices.dtype == np.uint32
+
+
+def test_editing_copies_only_that_mesh(model, app):
+    first = ImportedMesh(model('sphere.obj'))
+    second = ImportedMesh(model('sphere.obj'))
+    asset = first.asset
+    before = np.array(asset.vertices)
+
+    first.selected_vertex = 4
+    first.transform(app, 10, 10)
+    assert first.asset is None
+    assert isinstance(first.vertices, list)
+    assert first.vertices[4] != before[4].tolist()
+    assert second.asset is asset
+    np.testing.assert_array_equal(asset.vertices, before)
+    np.testing.assert_array_equal(second.vertex_array, before)
+
+
+def test_retain_drops_other_assets(model, registry):
+    ImportedMesh(model('sphere.obj'))
+    ImportedMesh(model('suzanne.obj'))
+    registry.retain([model('suzanne.obj')])
+    assert [asset.name for asset in registry.assets.values()] == ['suzanne']
@@ -0,0 +1,68 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+import batch_render
+import ui
+from rendering.backends import ImageBackend, NullBackend, RecordingBackend
+
+
+def labels(backend):
+    return [args for kind, args in backend.commands if kind == 'label']
+
+
+def test_svg_escapes_text_and_font():
+    backend = RecordingBackend()
+    backend.begin_frame(100, 50)
+    backend.rect(0, 0, 100, 50, 'black', border='white')
+    backend.label('<b>&"', 10, 10, 'white', bold=True, font='a&b')
+    root = ET.fromstring(backend.to_svg())
+    text = root.find('{http://www.w3.org/2000/svg}text')
+    assert text.text == '<b>&"'
+    assert text.get('font-family') == 'a&b'
+    assert text.get('font-weight') == 'bold'
+
+
+def test_draw_text_passes_font_through():
+    backend = RecordingBackend()
+    app = batch_render.make_app(200, 100, backend)
+    ui.drawText(app, 'hello', 10, 10, font='monospace', size=16)
+    [args] = labels(backend)
+    assert args['font'] == 'monospace' and args['size'] == 16
+
+
+def test_help_popup_fits_its_content():
+    backend = RecordingBackend()
+    app = batch_render.make_app(1250, 800, backend)
+    ui.drawHelpPopup(app)
+    # The first rect dims the screen, the second is the popup
+    popup = [args for kind, args in backend.commands if kind == 'rect'][1]
+    assert 0 <= popup['x'] and popup['x'] + popup['width'] <= app.width
+    assert 0 <= popup['y'] and popup['y'] + popup['height'] <= app.height
+    assert popup['height'] < 600
+    texts = labels(backend)
+    assert texts[-1]['text'] == 'Click anywhere to close'
+    for args in texts:
+        assert popup['x'] < args['x'] < popup['x'] + popup['width']
+        assert popup['y'] < args['y'] < popup['y'] + popup['height']
+    # Nothing is left below the last line
+    assert max(args['y'] for args in texts) + 40 >= (popup['y'] +
+                                                     popup['height'])
+
+
+def test_null_backend_counts_calls():
+    backend = NullBackend()
+    backend.polygon([0, 0, 1, 0, 0, 1], 'red')
+    backend.polygon([0, 0, 1, 0, 0, 1], 'red')
+    backend.label('x', 0, 0, 'white', font='monospace')
+    assert backend.calls == {'polygon': 2, 'label': 1}
+
+
+def test_image_backend_fills_polygons():
+    backend = ImageBackend(20, 20, background=(0, 0, 0))
+    backend.begin_frame(20, 20)
+    backend.rect(5, 5, 10, 10, (255, 0, 0))
+    pixels = backend.to_array()
+    assert tuple(pixels[10, 10, :3]) == (255, 0, 0)
+    assert tuple(pixels[1, 1, :3]) == (0, 0, 0)
+    assert np.count_nonzero(pixels[..., 0]) == 100
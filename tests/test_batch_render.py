@@ -0,0 +1,56 @@
+import json
+import os
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import ImportedMesh
+from rendering.backends import NullBackend
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPHERE = os.path.join(ROOT, 'sphere.obj')
+
+
+def test_obj_is_a_scene_of_one_model():
+    [scene] = batch_render.load_scenes(SPHERE)
+    assert scene == {'name': 'sphere', 'objects': [{'model': SPHERE}]}
+
+
+def test_scene_file_models_are_relative_to_it(tmp_path):
+    path = tmp_path / 'row.json'
+    path.write_text(json.dumps([{'objects': [{'model': 'a.obj'}]},
+                                {'name': 'b', 'objects': []}]))
+    first, second = batch_render.load_scenes(str(path))
+    assert first['name'] == 'row_0' and second['name'] == 'b'
+    assert first['objects'][0]['model'] == str(tmp_path / 'a.obj')
+
+
+def test_build_scene_adds_a_light_and_the_models():
+    app = batch_render.make_app(64, 64, NullBackend())
+    meshes = batch_render.build_scene(app, {
+        'objects': [{'model': SPHERE, 'translate': [2, 0, 0],
+                     'scale': [2, 2, 2]}]})
+    assert [type(mesh) for mesh in meshes] == [ImportedMesh]
+    assert any(isinstance(obj, PointLight) for obj in app.world.objects)
+    assert meshes[0].transform_matrix[0][0] == 2
+    assert meshes[0].transform_matrix[0][3] == 2
+
+
+def test_same_named_inputs_get_their_own_folders(tmp_path):
+    for folder in 'ab':
+        os.makedirs(tmp_path / folder)
+        with open(SPHERE) as src, open(tmp_path / folder / 'chair.obj',
+                                       'w') as dst:
+            dst.write(src.read())
+    scenes = [scene for folder in 'ab' for scene in
+              batch_render.load_scenes(str(tmp_path / folder / 'chair.obj'))]
+    out = tmp_path / 'renders'
+    paths = batch_render.render_all(scenes, str(out),
+                                    batch_render.viewpoints(2), 32, 32,
+                                    workers=1)
+    assert sorted(os.listdir(out)) == ['chair', 'chair_2']
+    assert len(set(paths)) == 4 and all(map(os.path.exists, paths))
+
+
+def test_output_names_skip_taken_suffixes():
+    scenes = [{'name': 'a'}, {'name': 'a_2'}, {'name': 'a'}]
+    assert batch_render.output_names(scenes) == ['a', 'a_2', 'a_3']
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+import bench_render
+import headless
+from objects.mesh import Mesh
+
+
+def result(p50):
+    return {'frame_ms': {'p50': p50}}
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = {'a': result(10), 'b': result(10), 'c': result(10)}
+    results = {'a': result(12), 'b': result(13), 'c': result(5),
+               'new': result(100)}
+    assert bench_render.compare(results, baseline, 0.25) == ['b']
+
+
+def test_slower_lists_the_cases_to_measure_again():
+    baseline = {'a': result(10), 'b': result(10)}
+    results = {'a': result(14), 'b': result(11), 'new': result(100)}
+    assert bench_render.slower(results, baseline, 0.25) == ['a']
+
+
+def test_best_run_is_the_fastest():
+    runs = [result(12), result(9), result(30)]
+    assert bench_render.best_run(runs) is runs[1]
+
+
+def test_orbit_script_has_one_step_per_frame():
+    for frames in (1, 7, 120):
+        steps = headless.orbit_script(frames)
+        assert len(steps) == frames
+    # The elevation sweep returns to where it started and the zoom comes
+    # back out
+    steps = headless.orbit_script(120)
+    assert sum(step[1] for step in steps) == pytest.approx(0)
+    assert sum(step[2] for step in steps) == 0
+
+
+def test_run_case_reports_every_stage(monkeypatch):
+    monkeypatch.setattr(Mesh, 'use_numpy', Mesh.use_numpy)
+    case = bench_render.run_case('sphere.obj', True, False, False, frames=8,
+                                 width=320, height=240)
+    assert case['faces'] == 320
+    assert 0 < case['drawn_triangles_per_frame'] < case['faces']
+    assert case['draw_calls_per_frame'] > 0
+    assert set(case['frame_ms']) == {'p50', 'p95', 'p99'}
+    assert {'transform', 'shading', 'sort', 'draw'} <= \
+        set(case['stages_p50_ms'])
+
+
+def test_lod_case_draws_coarser_levels(monkeypatch):
+    monkeypatch.setattr(Mesh, 'use_numpy', Mesh.use_numpy)
+    full = bench_render.run_case('sphere.obj', True, False, False, frames=8,
+                                 width=320, height=240)
+    lod = bench_render.run_case('sphere.obj', True, False, True, frames=8,
+                                width=320, height=240)
+    assert full['lod_level_per_frame'] == 0
+    assert lod['lod_level_per_frame'] >= 1
+    assert 0 < lod['drawn_triangles_per_frame'] < \
+        full['drawn_triangles_per_frame']
+
+
+def test_baseline_has_every_case():
+    with open(bench_render.BASELINE) as f:
+        results = json.load(f)['results']
+    for model in bench_render.MODELS:
+        name = os.path.splitext(model)[0]
+        for path in ('numpy', 'python', 'raster', 'lod'):
+            assert f'{name}/{path}' in results
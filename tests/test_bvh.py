@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+import batch_render
+from matrix_util import points_in_triangles, screen_windings
+from objects import obj_loader
+from objects.bvh import BVH, TriangleBVH, intersect_triangles
+from objects.lights import PointLight
+from objects.primatives import ImportedMesh
+from rendering.backends import NullBackend
+
+
+@pytest.fixture
+def teapot(model):
+    vertices, indices = obj_loader.load_obj(model('teapot.obj'))
+    return np.array(vertices), np.asarray(indices, dtype=np.int64) \
+        .reshape(-1, 3)
+
+
+def brute_force(vertices, faces, origin, direction):
+    tri = vertices[:, :3][faces]
+    t = intersect_triangles(origin, direction, tri[:, 0],
+                            tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    face = int(np.argmin(t))
+    return None if t[face] == np.inf else (float(t[face]), face)
+
+
+def rays(count, seed=0):
+    # Rays from a sphere around the model aimed near its middle
+    rng = np.random.default_rng(seed)
+    origins = rng.normal(size=(count, 3))
+    origins *= 10 / np.linalg.norm(origins, axis=1, keepdims=True)
+    targets = rng.uniform(-1, 1, (count, 3))
+    return zip(origins, targets - origins)
+
+
+def assert_same_hit(hit, expected):
+    if expected is None:
+        assert hit is None
+    else:
+        assert hit is not None
+        assert hit[0] == pytest.approx(expected[0])
+
+
+def test_raycast_matches_brute_force(teapot):
+    vertices, faces = teapot
+    bvh = TriangleBVH(vertices, faces)
+    hits = 0
+    for origin, direction in rays(200):
+        expected = brute_force(vertices, faces, origin, direction)
+        assert_same_hit(bvh.intersect(origin, direction), expected)
+        hits += expected is not None
+    assert hits > 20
+
+
+def test_refit_after_moving_vertices(teapot):
+    vertices, faces = teapot
+    bvh = TriangleBVH(vertices, faces)
+    moved = vertices.copy()
+    moved[:, :3] = moved[:, :3] * [1.5, 0.5, 1] + [0.3, 0, 0]
+    moved[::7, 1] += 0.2
+    bvh.refit_triangles(moved, faces)
+    for origin, direction in rays(200, seed=1):
+        assert_same_hit(bvh.intersect(origin, direction),
+                        brute_force(moved, faces, origin, direction))
+
+
+def test_refit_boxes_contain_primitives():
+    rng = np.random.default_rng(2)
+    low = rng.uniform(-5, 5, (100, 3))
+    bvh = BVH(low, low + 1, leaf_size=2)
+    low += rng.uniform(-1, 1, (100, 3))
+    bvh.refit(low, low + 1)
+    for node in range(len(bvh.left)):
+        prims = bvh.order[bvh.start[node]:bvh.start[node] + bvh.size[node]]
+        assert (low[prims] >= np.array(bvh.node_min[node]) - 1e-12).all()
+        assert (low[prims] + 1 <= np.array(bvh.node_max[node]) + 1e-12).all()
+
+
+def test_empty_bvh_misses():
+    bvh = TriangleBVH(np.zeros((0, 4)), np.zeros((0, 3), dtype=np.int64))
+    assert bvh.intersect([0, 0, 0], [0, 0, 1]) is None
+
+
+def lit_app():
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.world.add_object(PointLight(10))
+    return app
+
+
+def test_face_pick_is_the_front_face(model):
+    app = lit_app()
+    app.lod_pixel_error = 0
+    app.edit_mode = True  # back faces are drawn and could be hit
+    mesh = ImportedMesh(model('sphere.obj'))
+    app.world.add_object(mesh)
+    app.world.render(app)
+    screen = np.array(mesh.screen_coords)
+    faces = np.asarray(mesh.indices, dtype=np.intp).reshape(-1, 3)
+    centers = screen[faces].mean(axis=1)
+    front = screen_windings(screen[faces]) < 0
+
+    for face in np.nonzero(front)[0][::5].tolist():
+        x, y = centers[face, :2]
+        picked = mesh.face_at(x, y) // 3
+        assert front[picked]
+        assert points_in_triangles([x, y], screen[faces[picked], :2])
+
+    # Clicking next to the mesh misses
+    assert mesh.face_at(1, 1) is None
+
+
+def test_face_pick_follows_vertex_moves(model):
+    app = lit_app()
+    mesh = ImportedMesh(model('sphere.obj'))
+    mesh.make_geometry_private()
+    app.world.add_object(mesh)
+    app.world.render(app)
+    x, y = app.width / 2, app.height / 2
+    assert mesh.face_at(x, y) is not None
+    bvh = mesh.bvh
+
+    # Squash the sphere away from the middle of the screen
+    for vertex in mesh.vertices:
+        vertex[0] = vertex[0] * 0.1 + 3
+    mesh.mark_geometry_dirty()
+    app.world.render(app)
+    assert mesh.face_at(x, y) is None
+    assert mesh.bvh is bvh  # refit, not rebuilt
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import Cube, ImportedMesh, Plane
+from rendering.backends import NullBackend
+from rendering.triangle_buffer import TriangleBuffer
+
+
+@pytest.fixture
+def app():
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.world.add_object(PointLight(10, 3, 4, -5))
+    app.lod_pixel_error = 0
+    return app
+
+
+def drawn(app, mesh, use_numpy=True):
+    mesh.use_numpy = use_numpy
+    mesh._triangles_key = None
+    buffer = TriangleBuffer()
+    mesh.render(app, buffer)
+    return buffer
+
+
+def facing_camera(app, mesh):
+    # Faces whose world-space normal points at the camera
+    matrix = np.array(mesh.transform_matrix, dtype=float)
+    points = (np.asarray(mesh.vertices, dtype=float) @ matrix.T)[:, :3]
+    tri = points[np.asarray(mesh.indices, dtype=np.intp).reshape(-1, 3)]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    to_camera = np.array(app.camera.position()) - tri.mean(axis=1)
+    return np.einsum('ij,ij->i', normals, to_camera) > 0
+
+
+@pytest.mark.parametrize('name', ['sphere.obj', 'suzanne.obj', 'teapot.obj'])
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_culling_keeps_faces_facing_the_camera(app, model, name, use_numpy):
+    mesh = ImportedMesh(model(name))
+    mesh.apply_rotation(1.2, [0, 1, 1])
+    faces = len(mesh.indices) // 3
+    kept = len(drawn(app, mesh, use_numpy))
+    assert kept == facing_camera(app, mesh).sum()
+    if name == 'sphere.obj':
+        # Seen in perspective, less than half of a sphere faces the camera
+        assert 0.2 * faces < kept < 0.5 * faces
+
+    mesh.backface_culling = False
+    assert len(drawn(app, mesh, use_numpy)) == faces
+
+
+def test_edit_mode_keeps_back_faces(app, model):
+    mesh = ImportedMesh(model('sphere.obj'))
+    faces = len(mesh.indices) // 3
+    app.edit_mode = True
+    assert len(drawn(app, mesh)) == faces
+    mesh.cull_in_edit_mode = True
+    assert len(drawn(app, mesh)) < faces
+
+
+def test_objects_behind_the_camera_are_dropped(app):
+    cube = Cube(1)
+    cube.apply_translation(np.array(app.camera.position()) * 2)
+    assert len(drawn(app, cube)) == 0
+    assert len(drawn(app, cube, use_numpy=False)) == 0
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_triangles_crossing_the_near_plane_are_clipped(app, use_numpy):
+    # A floor reaching far behind the camera
+    floor = Plane(200)
+    floor.apply_rotation(-np.pi / 2, [1, 0, 0])
+    floor.apply_translation([0, -1, 0])
+    app.use_rasterizer = True  # keeps the unclipped vertex depths
+    buffer = drawn(app, floor, use_numpy)
+    assert len(buffer) > 2  # each clipped quad triangle became two
+
+    points = np.array(buffer.points, dtype=float)
+    depths = np.array(buffer.vertex_depths, dtype=float)
+    assert np.isfinite(points).all()
+    assert (depths >= -1 - 1e-9).all() and (depths <= 1).all()
+    # Clipped to the near plane, so the floor runs off the bottom of the
+    # window instead of flipping over to the top
+    assert points[:, 1::2].max() > app.height
+    assert points[:, 1::2].min() > 0
@@ -0,0 +1,102 @@
+import types
+
+import pytest
+
+from objects.halfedge import HalfEdgeMesh
+from objects.primatives import ImportedMesh
+
+
+def grid(n):
+    # n x n quads in the plane, each split into two triangles. Returns the
+    # indices and the vertex count.
+    indices = []
+    for y in range(n):
+        for x in range(n):
+            a = y * (n + 1) + x
+            b, c, d = a + 1, a + n + 2, a + n + 1
+            indices += [a, b, c, a, c, d]
+    return indices, (n + 1) ** 2
+
+
+def assert_consistent(mesh):
+    # Twins run the other way, and match a mesh built from scratch
+    for h, twin in enumerate(mesh.twin):
+        if twin != -1:
+            assert mesh.twin[twin] == h
+            assert mesh.origin[twin] == mesh.dest(h)
+            assert mesh.dest(twin) == mesh.origin[h]
+    fresh = HalfEdgeMesh(mesh.origin, len(mesh.outgoing))
+    assert sorted(map(sorted, zip(range(len(mesh.twin)), mesh.twin))) == \
+        sorted(map(sorted, zip(range(len(fresh.twin)), fresh.twin)))
+    for v, h in enumerate(mesh.outgoing):
+        assert h == -1 or mesh.origin[h] == v
+
+
+def test_connectivity_of_grid():
+    indices, count = grid(4)
+    mesh = HalfEdgeMesh(indices, count)
+    assert_consistent(mesh)
+    assert len(mesh.boundary_loops()) == 1
+    assert len(mesh.boundary_loops()[0]) == 16
+    center = 2 * 5 + 2
+    assert mesh.valence(center) == 6
+    assert not mesh.is_boundary_vertex(center)
+    assert mesh.is_boundary_vertex(0)
+
+
+def test_grow_and_shrink():
+    indices, count = grid(6)
+    mesh = HalfEdgeMesh(indices, count)
+    face = 2 * (3 * 6 + 3)
+    grown = mesh.grow({face})
+    assert grown == {face} | set(mesh.face_neighbors(face))
+    assert len(grown) == 4
+    assert mesh.shrink(grown) == {face}
+    assert mesh.grow(mesh.grow(grown)) > grown
+    assert mesh.shrink({face}) == set()
+
+
+def test_extrude_region_keeps_closed_mesh_closed(model):
+    mesh = ImportedMesh(model('sphere.obj'))
+    halfedges = HalfEdgeMesh(mesh.indices, len(mesh.vertices))
+    faces = halfedges.grow(halfedges.grow({0}))
+    boundary = halfedges.region_boundary(faces)
+    faces_before = halfedges.face_count
+
+    copies = halfedges.extrude_region(faces)
+    assert len(copies) == len(boundary)
+    assert halfedges.face_count == faces_before + 2 * len(boundary)
+    assert -1 not in halfedges.twin
+    assert_consistent(halfedges)
+    # The region only uses the copies of its boundary vertices now
+    for face in faces:
+        for h in range(3 * face, 3 * face + 3):
+            assert halfedges.origin[h] not in copies
+
+
+def test_extrude_selected_faces_of_mesh(model):
+    mesh = ImportedMesh(model('sphere.obj'))
+    app = types.SimpleNamespace(camera=types.SimpleNamespace(
+        get_view_direction=lambda: [0, 0, 1]))
+    mesh.selection_mode = 'face'
+    mesh.selected_face = 0
+    mesh.grow_selection()
+    region = mesh.region_faces()
+    vertex_count = len(mesh.vertices)
+
+    def center():
+        corners = [mesh.vertices[mesh.indices[3 * face + i]]
+                   for face in region for i in range(3)]
+        return [sum(c[k] for c in corners) / len(corners) for k in range(3)]
+
+    start = center()
+    mesh.start_extrude_selected_face()
+    assert mesh.asset is None  # copied on write
+    assert center() == pytest.approx(start)
+    mesh.update_extrusion(app, -50)
+    assert center() != start
+    assert len(mesh.vertices) > vertex_count
+    assert -1 not in HalfEdgeMesh(mesh.indices, len(mesh.vertices)).twin
+    mesh.finish_extrusion()
+    assert mesh.selected_face is None
+    assert mesh.halfedges.face_count == len(mesh.indices) // 3
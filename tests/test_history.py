@@ -0,0 +1,170 @@
+import types
+
+import numpy as np
+import pytest
+
+from history import History
+from objects.lights import PointLight
+from objects.primatives import CubeArray, ImportedMesh
+
+
+@pytest.fixture
+def app():
+    return types.SimpleNamespace(
+        edit_mode=False, transform_mode=None, axis_constraint=None,
+        camera=types.SimpleNamespace(get_view_direction=lambda: [0, 0, 1]))
+
+
+@pytest.fixture
+def mesh(model):
+    return ImportedMesh(model('sphere.obj'))
+
+
+def state(obj):
+    return (np.array(obj.vertices, dtype=float).reshape(-1, 4),
+            np.array(obj.indices, dtype=np.int64),
+            np.array(obj.transform_matrix, dtype=float))
+
+
+def assert_state(obj, expected):
+    for a, b in zip(state(obj), expected):
+        np.testing.assert_array_equal(a, b)
+
+
+def drag(history, app, obj, mode, moves=5):
+    # One gesture: press a transform key, move the mouse, release
+    app.transform_mode = mode
+    history.begin(obj)
+    for i in range(moves):
+        obj.transform(app, 3 + i, -2 * i)
+    history.end()
+
+
+def extrude(history, app, obj, moves=5):
+    history.begin(obj)
+    obj.start_extrude_selected_face()
+    for _ in range(moves):
+        obj.update_extrusion(app, -4)
+    obj.finish_extrusion()
+    history.end()
+
+
+def test_undo_and_redo_every_kind_of_edit(app, mesh):
+    history = History()
+    states = [state(mesh)]
+    drag(history, app, mesh, 'move')
+    states.append(state(mesh))
+    drag(history, app, mesh, 'rotate')
+    states.append(state(mesh))
+
+    app.edit_mode = True
+    mesh.selected_vertex = 7
+    drag(history, app, mesh, 'move')
+    states.append(state(mesh))
+
+    mesh.selection_mode = 'face'
+    mesh.selected_face = 30
+    mesh.grow_selection()
+    drag(history, app, mesh, 'move')
+    states.append(state(mesh))
+
+    mesh.selected_face = 90
+    mesh.selected_region = {30}
+    extrude(history, app, mesh)
+    states.append(state(mesh))
+
+    assert len(history.undo_stack) == 5
+    for expected in reversed(states[:-1]):
+        assert history.undo() is mesh
+        assert_state(mesh, expected)
+    assert history.undo() is None
+    for expected in states[1:]:
+        assert history.redo() is mesh
+        assert_state(mesh, expected)
+    assert history.redo() is None
+
+
+def test_gesture_without_change_is_not_recorded(app, mesh):
+    history = History()
+    history.begin(mesh)
+    history.end()
+    app.transform_mode = 'move'
+    history.begin(mesh)
+    mesh.transform(app, 0, 0)
+    history.end()
+    assert not history.undo_stack
+
+
+def test_new_edit_clears_redo(app, mesh):
+    history = History()
+    drag(history, app, mesh, 'move')
+    drag(history, app, mesh, 'scale')
+    history.undo()
+    assert history.redo_stack
+    drag(history, app, mesh, 'rotate')
+    assert not history.redo_stack
+
+
+def test_steps_store_only_what_changed(app, mesh):
+    history = History()
+    app.edit_mode = True
+    mesh.selected_vertex = 3
+    drag(history, app, mesh, 'move')
+    # Header, one row number, the vertex before and after
+    assert history.nbytes() == 8 * 4 + 4 + 2 * 32
+
+    mesh.selection_mode = 'face'
+    mesh.selected_face = 0
+    extrude(history, app, mesh)
+    added = len(mesh.vertices) * 32 + len(mesh.indices) * 8
+    assert history.nbytes() < added
+
+
+def test_undo_drops_selection_past_restored_geometry(app, mesh):
+    history = History()
+    mesh.selection_mode = 'face'
+    mesh.selected_face = 0
+    extrude(history, app, mesh)
+    mesh.selected_face = len(mesh.indices) - 3
+    mesh.selected_region = {len(mesh.indices) // 3 - 1}
+    history.undo()
+    assert mesh.selected_face is None
+    assert mesh.selected_region == set()
+
+
+def test_light_moves_are_undone(app):
+    light = PointLight(10, 1, 2, 3)
+    history = History()
+    drag(history, app, light, 'move')
+    moved = light.position()
+    assert moved != [1, 2, 3]
+    history.undo()
+    assert light.position() == [1, 2, 3]
+    history.redo()
+    assert light.position() == moved
+
+
+def test_instance_moves_are_undone(app):
+    cubes = CubeArray((2, 2, 2))
+    start = cubes.instance_transforms.copy()
+    cubes.selected_instance = 3
+    history = History()
+    drag(history, app, cubes, 'move')
+    moved = cubes.instance_transforms.copy()
+    assert not np.array_equal(moved[3], start[3])
+    np.testing.assert_array_equal(np.delete(moved, 3, axis=0),
+                                  np.delete(start, 3, axis=0))
+
+    version = cubes.transform_version
+    history.undo()
+    np.testing.assert_array_equal(cubes.instance_transforms, start)
+    assert cubes.transform_version > version
+    history.redo()
+    np.testing.assert_array_equal(cubes.instance_transforms, moved)
+
+
+def test_limit_keeps_latest_steps(app, mesh):
+    history = History(limit=3)
+    for _ in range(5):
+        drag(history, app, mesh, 'move', moves=1)
+    assert len(history.undo_stack) == 3
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.instanced_mesh import InstancedMesh, grid_transforms
+from objects.lights import PointLight
+from objects.primatives import Cube, CubeArray
+from rendering.backends import NullBackend
+
+
+def triangles(app):
+    # Rounded screen triangles of the frame, leaving out the light
+    return sorted(tuple(round(value, 3) for value in points)
+                  for points in app.world.triangles.points
+                  if len(points) == 6)
+
+
+def lit_app():
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.world.add_object(PointLight(10))
+    return app
+
+
+def test_bulk_add_matches_one_at_a_time():
+    transforms = grid_transforms((3, 2, 1), 2.0)
+    colors = ['red', (0, 255, 0), 'white', (1, 2, 3), 'blue', 'orange']
+    one = InstancedMesh(Cube())
+    ids = [one.add_instance(matrix, color)
+           for matrix, color in zip(transforms, colors)]
+    bulk = InstancedMesh(Cube())
+    assert list(bulk.add_instances(transforms, colors)) == ids
+    np.testing.assert_array_equal(bulk.instance_transforms,
+                                  one.instance_transforms)
+    np.testing.assert_array_equal(bulk.instance_colors, one.instance_colors)
+
+    version = bulk.transform_version
+    assert list(bulk.add_instances(transforms[:2])) == [6, 7]
+    assert bulk.transform_version > version
+    assert bulk.instance_colors[6:].tolist() == [[255, 255, 255]] * 2
+
+
+def test_colors_must_match_transforms():
+    with pytest.raises(ValueError):
+        InstancedMesh(Cube()).add_instances(grid_transforms((2, 1, 1)),
+                                            ['red'])
+
+
+def test_cube_array_shades_along_x():
+    cubes = CubeArray((4, 3, 2))
+    assert len(cubes.instance_transforms) == 24
+    xs = cubes.instance_transforms[:, 0, 3]
+    assert cubes.instance_colors[xs.argmin()].tolist() == [120, 150, 255]
+    assert cubes.instance_colors[xs.argmax()].tolist() == [255, 165, 80]
+
+
+def test_instances_draw_like_separate_meshes():
+    transforms = grid_transforms((3, 1, 2), 1.5)
+    app = lit_app()
+    app.world.add_object(InstancedMesh(Cube(), transforms))
+    app.world.render(app)
+    instanced = triangles(app)
+
+    app = lit_app()
+    for matrix in transforms:
+        cube = Cube()
+        cube.transform_matrix = matrix.tolist()
+        app.world.add_object(cube)
+    app.world.render(app)
+    assert instanced and instanced == triangles(app)
+
+
+def test_pick_finds_the_instance_under_the_mouse():
+    app = lit_app()
+    transforms = grid_transforms((3, 1, 1), 2.0)
+    mesh = InstancedMesh(Cube(), transforms)
+    app.world.add_object(mesh)
+    app.world.render(app)
+    screen = np.asarray(mesh.screen_coords)[:, :2].reshape(3, -1, 2)
+    for instance, points in enumerate(screen):
+        x, y = points.mean(axis=0)
+        obj, t, face = app.world.pick(app, x, y)
+        assert obj is mesh
+        assert mesh.instance_of_face(face) == instance
+        mesh.on_pick(face)
+        assert mesh.selected_instance == instance
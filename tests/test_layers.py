@@ -0,0 +1,63 @@
+import pytest
+
+import batch_render
+from objects import assets
+from objects.lights import PointLight
+from objects.primatives import Cube, ImportedMesh
+from rendering.backends import RecordingBackend
+from rendering.layers import LayerStack, world_layers
+
+
+def layered_app():
+    app = batch_render.make_app(320, 240, RecordingBackend())
+    app.world.add_object(PointLight(10))
+    return app, LayerStack(world_layers())
+
+
+def test_unchanged_frame_redraws_nothing():
+    app, stack = layered_app()
+    app.world.add_object(Cube())
+    stack.render(app)
+    stack.render(app)
+    assert stack.redraws == {'grid': 1, 'scene': 1, 'overlay': 1}
+    # The composite is drawn again as the same cached image
+    images = [args for kind, args in app.backend.commands]
+    assert len(images) == 2 and stack.version == 1
+
+
+@pytest.mark.parametrize('change, redrawn', [
+    (lambda app, cube: cube.apply_translation([1, 0, 0]), {'scene'}),
+    (lambda app, cube: app.camera.orbit(5, 0),
+     {'grid', 'scene', 'overlay'}),
+    (lambda app, cube: setattr(app, 'lod_pixel_error', 2), {'scene'}),
+])
+def test_only_changed_layers_are_redrawn(change, redrawn):
+    app, stack = layered_app()
+    cube = Cube()
+    app.world.add_object(cube)
+    stack.render(app)
+    before = dict(stack.redraws)
+    change(app, cube)
+    stack.render(app)
+    assert {name for name in stack.redraws
+            if stack.redraws[name] != before[name]} == redrawn
+
+
+def test_scene_is_redrawn_when_background_levels_finish(model, monkeypatch):
+    monkeypatch.setattr(assets, 'registry', assets.AssetRegistry())
+    app, stack = layered_app()
+    app.lod_in_background = True
+    mesh = ImportedMesh(model('teapot.obj'))
+    app.world.add_object(mesh)
+    # Far enough out for a coarser level
+    app.camera.radius = 60
+    app.camera.orbit(0, 0)
+
+    stack.render(app)
+    assert mesh.lod is None and not mesh.lods_ready
+    mesh.asset._lods_thread.join()
+
+    stack.render(app)
+    assert mesh.lod is not None and mesh.lod.index > 0
+    stack.render(app)
+    assert stack.redraws['scene'] == 2
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from objects import obj_loader
+from objects.halfedge import HalfEdgeMesh
+from objects.lod import build_levels, decimate
+
+
+@pytest.fixture
+def sphere(model):
+    vertices, indices = obj_loader.load_obj(model('sphere.obj'))
+    return np.array(vertices), np.asarray(indices, dtype=np.intp) \
+        .reshape(-1, 3)
+
+
+def test_levels_shrink_by_ratio(sphere):
+    vertices, faces = sphere
+    levels = build_levels(vertices, faces, ratio=0.5, min_faces=64)
+    assert levels[0].faces is faces and levels[0].error == 0
+    assert len(levels) > 2
+    for index, (coarse, fine) in enumerate(zip(levels[1:], levels), 1):
+        assert coarse.index == index
+        assert len(coarse) <= len(fine) * 0.5
+        assert coarse.error >= fine.error
+    assert len(levels[-1]) >= 64 * 0.5
+
+
+def test_levels_are_valid_surfaces(sphere):
+    vertices, faces = sphere
+    for level in build_levels(vertices, faces)[1:]:
+        # Faces only use the original vertices, none repeat a corner, and
+        # the closed sphere stays closed
+        assert level.faces.min() >= 0
+        assert level.faces.max() < len(vertices)
+        f = level.faces
+        assert not ((f[:, 0] == f[:, 1]) | (f[:, 1] == f[:, 2]) |
+                    (f[:, 2] == f[:, 0])).any()
+        assert -1 not in HalfEdgeMesh(f.ravel(), len(vertices)).twin
+        assert level.face_normals.shape == (len(f), 3)
+        assert not level.faces.flags.writeable
+
+
+def test_flat_region_collapses_without_error():
+    # Interior vertices of a plane cost nothing to remove
+    n = 8
+    xs, ys = np.meshgrid(np.arange(n + 1), np.arange(n + 1))
+    vertices = np.stack([xs.ravel(), ys.ravel(), np.zeros(xs.size),
+                         np.ones(xs.size)], axis=1).astype(float)
+    faces = []
+    for y in range(n):
+        for x in range(n):
+            a = y * (n + 1) + x
+            faces += [[a, a + 1, a + n + 2], [a, a + n + 2, a + n + 1]]
+    faces = np.array(faces)
+    (level, error), = decimate(vertices, faces, [len(faces) // 2])
+    assert len(level) <= len(faces) // 2
+    assert error == pytest.approx(0, abs=1e-9)
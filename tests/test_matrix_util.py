@@ -0,0 +1,106 @@
+import math
+
+import numpy as np
+import pytest
+
+from matrix_util import (Matrix4, Vec3, identity_matrix, matrix_multiply,
+                         matrix_vector_multiply, normal_matrix,
+                         rotation_matrix, scaling_matrix, translation_matrix)
+
+
+def array(matrix):
+    return np.array(matrix, dtype=float).reshape(4, 4)
+
+
+def random_matrices(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Matrix4(rng.uniform(-2, 2, 16).tolist()) for _ in range(count)]
+
+
+def test_product_matches_numpy():
+    for a, b in zip(random_matrices(10), random_matrices(10, seed=1)):
+        np.testing.assert_allclose(array(a @ b), array(a) @ array(b))
+        np.testing.assert_allclose(matrix_multiply(a.rows(), b.rows()),
+                                   array(a) @ array(b))
+
+
+def test_rows_round_trip():
+    m = random_matrices(1)[0]
+    assert Matrix4.from_rows(m.rows()) == m
+    assert Matrix4.from_rows(m) is m
+    np.testing.assert_array_equal(array(m.transpose()), array(m).T)
+
+
+def test_fused_constructors_match_products():
+    t = Matrix4.translation(1, 2, 3)
+    r = Matrix4.rotation(0.7, [1, 2, 3])
+    s = Matrix4.scaling(2, 3, 4)
+    np.testing.assert_allclose(
+        array(Matrix4.trs((1, 2, 3), 0.7, (1, 2, 3), (2, 3, 4))),
+        array(t @ r @ s))
+    m = random_matrices(1)[0]
+    np.testing.assert_allclose(array(m.translated(1, 2, 3)), array(t @ m))
+    np.testing.assert_allclose(array(m.rotated(0.7, [1, 2, 3])),
+                               array(r @ m))
+    np.testing.assert_allclose(array(m.scaled(2, 3, 4)), array(s @ m))
+
+
+def test_list_helpers_agree_with_matrix4():
+    assert translation_matrix(1, 2, 3) == Matrix4.translation(1, 2, 3).rows()
+    assert scaling_matrix(2, 3, 4) == Matrix4.scaling(2, 3, 4).rows()
+    assert rotation_matrix(0.5, [0, 0, 1]) == \
+        Matrix4.rotation(0.5, [0, 0, 1]).rows()
+    assert matrix_vector_multiply(identity_matrix(), [1, 2, 3, 1]) == \
+        [1, 2, 3, 1]
+
+
+def test_rotation_about_z():
+    x, y, z, w = Matrix4.rotation(math.pi / 2, [0, 0, 1]).transform(
+        [1, 0, 0, 1])
+    assert (x, y, z, w) == pytest.approx((0, 1, 0, 1))
+
+
+def test_inverse():
+    affine = Matrix4.trs((1, -2, 3), 1.1, (0, 1, 1), (2, 0.5, 3))
+    projective = random_matrices(5, seed=2)
+    for m in [affine] + projective:
+        np.testing.assert_allclose(array(m.inverse()),
+                                   np.linalg.inv(array(m)), atol=1e-9)
+    with pytest.raises(ValueError):
+        Matrix4.scaling(1, 0, 1).inverse()
+    with pytest.raises(ValueError):
+        Matrix4((1, 2, 3, 4) * 4).inverse()
+
+
+def test_normal_matrix_is_inverse_transpose():
+    m = Matrix4.trs((1, 2, 3), 0.4, (1, 1, 0), (1, 2, 5))
+    np.testing.assert_allclose(normal_matrix(m.rows()),
+                               np.linalg.inv(array(m)[:3, :3]).T, atol=1e-12)
+
+
+def test_transform_points():
+    m = Matrix4.trs((1, 2, 3), 0.3, (0, 1, 0), (2, 2, 2))
+    points = np.random.default_rng(3).uniform(-1, 1, (20, 3))
+    homogeneous = np.c_[points, np.ones(20)]
+    expected = homogeneous @ array(m).T
+    np.testing.assert_allclose(m.transform_points(homogeneous), expected)
+    np.testing.assert_allclose(m.transform_points(points), expected[:, :3])
+    np.testing.assert_allclose(m.transform(homogeneous[0]), expected[0])
+
+
+def test_vec3():
+    a = Vec3(1, 2, 3)
+    b = Vec3.of([4, 5, 6])
+    assert Vec3.of(a) is a
+    assert a + b == [5, 7, 9]
+    assert b - a == (3, 3, 3)
+    assert 2 * a == a * 2 == Vec3(2, 4, 6)
+    assert -a == [-1, -2, -3]
+    assert a.dot(b) == 32
+    assert a.cross(b) == list(np.cross([1, 2, 3], [4, 5, 6]))
+    assert a.length() == pytest.approx(math.sqrt(14))
+    assert a.normalized().length() == pytest.approx(1)
+    assert Vec3().normalized() == [0, 0, 0]
+    assert list(a) == a.tolist() == [1, 2, 3]
+    assert len(a) == 3 and a[2] == 3
+    assert a != 'abc'
@@ -0,0 +1,86 @@
+import numpy as np
+
+from objects import obj_loader
+from objects.mesh_optimizer import (compact_vertices, degenerate_triangles,
+                                    morton_order, optimize_mesh,
+                                    weld_vertices)
+
+
+def split_quad():
+    # Two triangles of a unit square that don't share their vertices, one
+    # copy nudged by less than the tolerance
+    vertices = np.array([[0, 0, 0, 1], [1, 0, 0, 1], [1, 1, 0, 1],
+                         [0, 0, 0, 1], [1, 1, 1e-9, 1], [0, 1, 0, 1]],
+                        dtype=float)
+    return vertices, np.array([0, 1, 2, 3, 4, 5], dtype=np.uint32)
+
+
+def test_weld_merges_close_points_only():
+    points = np.array([[0, 0, 0], [0.5e-3, 0, 0], [2e-3, 0, 0],
+                       [0, 0, 1]], dtype=float)
+    merged = weld_vertices(points, 1e-3)
+    assert merged[0] == merged[1]
+    assert len(set(merged.tolist())) == 3
+
+
+def test_weld_merges_across_cell_borders():
+    # Points on either side of a cell boundary still weld
+    points = np.array([[0.999e-3, 0, 0], [1.001e-3, 0, 0]])
+    merged = weld_vertices(points - [0.5e-3, 0, 0], 1e-3)
+    assert merged[0] == merged[1]
+
+
+def test_optimize_welds_seams():
+    vertices, indices = split_quad()
+    optimized, faces, report = optimize_mesh(vertices, indices)
+    assert report == {'vertices': (6, 4), 'triangles': (2, 2)}
+    assert len(optimized) == 4
+    assert sorted(set(faces.tolist())) == [0, 1, 2, 3]
+
+
+def test_degenerate_triangles_are_dropped():
+    points = np.array([[0, 0, 0], [1, 0, 0], [2, 0, 0], [0, 1, 0]], float)
+    faces = np.array([[0, 1, 2], [0, 1, 3], [0, 0, 3]])
+    assert degenerate_triangles(points, faces, 1e-9).tolist() == \
+        [True, False, True]
+
+
+def test_morton_order_keeps_neighbors_together():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 1, (1000, 3))
+    order = morton_order(centers)
+    assert sorted(order.tolist()) == list(range(1000))
+    # Consecutive points along the curve are much closer than at random
+    along = np.linalg.norm(np.diff(centers[order], axis=0), axis=1).mean()
+    shuffled = np.linalg.norm(np.diff(centers, axis=0), axis=1).mean()
+    assert along < shuffled / 3
+
+
+def test_compact_numbers_vertices_by_first_use():
+    vertices = np.arange(5 * 4, dtype=float).reshape(5, 4)
+    kept, faces = compact_vertices(vertices, np.array([[4, 2, 0]]))
+    assert faces.tolist() == [[0, 1, 2]]
+    np.testing.assert_array_equal(kept, vertices[[4, 2, 0]])
+
+
+def test_optimized_model_has_same_surface(model):
+    vertices, indices = obj_loader.parse_obj(model('suzanne.obj'))
+    optimized, faces, report = optimize_mesh(vertices, indices)
+    assert report['vertices'][1] <= report['vertices'][0]
+    # Every remaining triangle is one of the original ones
+    original = {tuple(sorted(map(tuple, tri)))
+                for tri in vertices[:, :3][indices.reshape(-1, 3)].tolist()}
+    kept = [tuple(sorted(map(tuple, tri))) for tri in
+            optimized[:, :3][faces.reshape(-1, 3)].tolist()]
+    assert all(tri in original for tri in kept)
+
+
+def test_all_degenerate_model_optimizes_to_nothing():
+    # Every triangle collapses to a line once the seam is welded
+    vertices = np.array([[0, 0, 0, 1], [1, 0, 0, 1], [2, 0, 0, 1],
+                         [1, 1e-9, 0, 1]], dtype=float)
+    indices = np.array([0, 1, 2, 0, 3, 2], dtype=np.uint32)
+    optimized, faces, report = optimize_mesh(vertices, indices)
+    assert report == {'vertices': (4, 0), 'triangles': (2, 0)}
+    assert optimized.shape == (0, 4)
+    assert faces.dtype == np.uint32 and not len(faces)
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from objects import obj_loader
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(obj_loader, 'CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_parse_triangulates_polygons(tmp_path):
+    path = write(tmp_path / 'quad.obj', '\n'.join([
+        'v 0 0 0', 'v 1 0 0', 'v 1 1 0', 'v 0 1 0 1.0', 'v 2 2 2',
+        'vn 0 0 1',
+        'f 1/1/1 2/2/1 3/3/1 4/4/1',  # quad, fanned into two triangles
+        'f -3//1 -2//1 -1//1',        # negative indices count back
+        'f 1 2',                      # not a face
+    ]))
+    vertices, indices = obj_loader.parse_obj(path)
+    assert vertices.shape == (5, 4)
+    assert (vertices[:, 3] == 1).all()
+    assert indices.dtype == np.uint32
+    assert indices.tolist() == [0, 1, 2, 0, 2, 3, 2, 3, 4]
+
+
+def test_parse_rejects_out_of_range_index(tmp_path):
+    path = write(tmp_path / 'bad.obj', 'v 0 0 0\nv 1 0 0\nf 1 2 3\n')
+    with pytest.raises(ValueError):
+        obj_loader.parse_obj(path)
+
+
+def test_cache_round_trip(model, cache_dir):
+    path = model('suzanne.obj')
+    parsed = obj_loader.load_obj(path, use_cache=False)
+    first = obj_loader.load_obj(path)
+    assert os.path.exists(obj_loader.cache_path(path))
+
+    cached = obj_loader.load_obj(path)
+    assert isinstance(cached[0], np.memmap)
+    for a, b, c in zip(parsed, first, cached):
+        np.testing.assert_array_equal(a, b)
+        np.testing.assert_array_equal(a, c)
+
+
+def test_cache_invalidated_when_file_changes(tmp_path, cache_dir):
+    path = write(tmp_path / 'tri.obj', 'v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n')
+    before = obj_loader.cache_path(path)
+    assert len(obj_loader.load_obj(path)[0]) == 3
+
+    write(tmp_path / 'tri.obj', 'v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\n'
+          'f 1 2 3\nf 2 4 3\n')
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert obj_loader.cache_path(path) != before
+    vertices, indices = obj_loader.load_obj(path)
+    assert len(vertices) == 4 and len(indices) == 6
+
+
+def test_corrupt_cache_is_parsed_again(model, cache_dir):
+    path = model('sphere.obj')
+    expected = obj_loader.load_obj(path, use_cache=False)
+    obj_loader.load_obj(path)
+    with open(obj_loader.cache_path(path), 'r+b') as f:
+        f.truncate(40)
+
+    vertices, indices = obj_loader.load_obj(path)
+    np.testing.assert_array_equal(vertices, expected[0])
+    np.testing.assert_array_equal(indices, expected[1])
+
+
+def test_unoptimized_load_keeps_file_order(model, cache_dir):
+    path = model('sphere.obj')
+    parsed = obj_loader.parse_obj(path)
+    vertices, indices = obj_loader.load_obj(path, optimize=False)
+    np.testing.assert_array_equal(vertices, parsed[0])
+    np.testing.assert_array_equal(indices, parsed[1])
+    assert obj_loader.cache_path(path, optimize=False) != \
+        obj_loader.cache_path(path)
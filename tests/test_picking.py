@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import Cube
+from rendering.backends import NullBackend
+
+
+def scene(*objects):
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.world.add_object(PointLight(10, 0, 20, 0))
+    for obj in objects:
+        app.world.add_object(obj)
+    app.world.render(app)
+    return app
+
+
+def toward_camera(app, fraction):
+    # Point that far from the target along the line to the camera
+    camera = app.camera
+    return (np.array([camera.x, camera.y, camera.z]) * fraction).tolist()
+
+
+def center(app):
+    # The camera looks at the origin through the middle of the screen
+    return app.width / 2, app.height / 2
+
+
+@pytest.mark.parametrize('small_first', [True, False])
+def test_small_object_in_front_wins(small_first):
+    big = Cube(2)
+    small = Cube(0.4)
+    objects = [small, big] if small_first else [big, small]
+    app = scene(*objects)
+    small.apply_translation(toward_camera(app, 0.7))
+    obj, t, face = app.world.pick(app, *center(app))
+    assert obj is small
+    assert 0 < t and face is not None
+
+
+def test_pick_follows_moves_and_removals():
+    big = Cube(2)
+    small = Cube(0.4)
+    app = scene(big, small)
+    small.apply_translation(toward_camera(app, 0.7))
+    assert app.world.pick(app, *center(app))[0] is small
+
+    # Out of the way, the big cube behind it is hit
+    small.apply_translation([0, 10, 0])
+    assert app.world.pick(app, *center(app))[0] is big
+
+    app.world.remove_object(big)
+    assert app.world.pick(app, *center(app)) is None
+
+
+def test_nearer_hit_has_smaller_t():
+    near = Cube(0.4)
+    far = Cube(0.4)
+    app = scene(near, far)
+    near.apply_translation(toward_camera(app, 0.5))
+    far.apply_translation(toward_camera(app, -0.5))
+    t_near = app.world.pick(app, *center(app))[1]
+    app.world.remove_object(near)
+    obj, t_far, face = app.world.pick(app, *center(app))
+    assert obj is far and t_near < t_far
+
+
+def test_unselectable_objects_are_skipped():
+    big = Cube(2)
+    cover = Cube(0.4)
+    cover.is_selectable = False
+    app = scene(big, cover)
+    cover.apply_translation(toward_camera(app, 0.7))
+    assert app.world.pick(app, *center(app))[0] is big
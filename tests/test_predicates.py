@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from matrix_util import (barycentrics, clip_polygon_near, clip_segments,
+                         clip_segments_near, point_in_triangle,
+                         point_segment_distance, points_in_triangles,
+                         screen_winding, screen_windings, triangle_areas,
+                         triangle_normals)
+
+
+@pytest.fixture
+def tris():
+    return np.random.default_rng(0).uniform(0, 100, (500, 3, 2))
+
+
+def test_batched_matches_scalar(tris):
+    points = np.random.default_rng(1).uniform(0, 100, (500, 2))
+    expected = [point_in_triangle(p[0], p[1], *t)
+                for p, t in zip(points.tolist(), tris.tolist())]
+    assert points_in_triangles(points, tris).tolist() == expected
+    assert any(expected) and not all(expected)
+    np.testing.assert_allclose(
+        screen_windings(tris), [screen_winding(*t) for t in tris.tolist()])
+
+
+def test_point_in_triangle_either_winding():
+    tri = [(0, 0), (10, 0), (0, 10)]
+    for corners in (tri, tri[::-1]):
+        assert point_in_triangle(2, 2, *corners)
+        assert point_in_triangle(5, 0, *corners)  # on an edge
+        assert not point_in_triangle(8, 8, *corners)
+    assert not point_in_triangle(1, 0, (0, 0), (1, 0), (2, 0))
+
+
+def test_huge_triangles_need_no_tolerance():
+    tri = np.array([[-1e7, -1e7], [1e7, -1e7], [0, 1e7]])
+    assert points_in_triangles([[0.5, 0.5], [1e7, 1e7]], tri).tolist() == \
+        [True, False]
+
+
+def test_broadcasting(tris):
+    points = np.array([[50, 50], [10, 90]])
+    inside = points_in_triangles(points[:, None], tris[None])
+    assert inside.shape == (2, len(tris))
+    np.testing.assert_array_equal(inside[0],
+                                  points_in_triangles(points[0], tris))
+
+
+def test_barycentrics_and_areas():
+    tri = np.array([[0, 0], [4, 0], [0, 4]], dtype=float)
+    weights = barycentrics([[1, 1], [0, 0]], tri)
+    np.testing.assert_allclose(weights.sum(axis=-1), 1)
+    np.testing.assert_allclose(weights[1], [1, 0, 0])
+    assert np.isnan(barycentrics([1, 1], np.zeros((3, 2)))).all()
+    assert triangle_areas(tri) == 8
+    tri3 = np.array([[0, 0, 0], [4, 0, 0], [0, 0, 4]], dtype=float)
+    assert triangle_areas(tri3) == 8
+
+
+def test_triangle_normals():
+    vertices = np.array([[0, 0, 0, 1], [2, 0, 0, 1], [0, 2, 0, 1],
+                         [5, 5, 5, 1]], dtype=float)
+    faces = [0, 1, 2, 3, 3, 3]
+    np.testing.assert_allclose(triangle_normals(vertices, faces),
+                               [[0, 0, 4], [0, 0, 0]])
+    np.testing.assert_allclose(
+        triangle_normals(vertices, faces, normalized=True),
+        [[0, 0, 1], [0, 0, 0]])
+
+
+def test_point_segment_distance():
+    assert point_segment_distance(5, 3, 0, 0, 10, 0) == 3
+    assert point_segment_distance(-3, 4, 0, 0, 10, 0) == 5
+    assert point_segment_distance(3, 4, 0, 0, 0, 0) == 5
+
+
+def test_clip_segments():
+    starts = [[-10, 5], [2, 2], [-5, -5], [20, 20], [5, np.inf]]
+    ends = [[20, 5], [8, 8], [-1, 15], [30, 30], [5, 5]]
+    with np.errstate(all='raise'):
+        new_starts, new_ends, visible = clip_segments(starts, ends,
+                                                      0, 0, 10, 10)
+    assert visible.tolist() == [True, True, False, False, False]
+    np.testing.assert_allclose(new_starts[:2], [[0, 5], [2, 2]])
+    np.testing.assert_allclose(new_ends[:2], [[10, 5], [8, 8]])
+
+
+def test_clip_segments_near_matches_polygon_clip():
+    starts = np.array([[0, 0, -2, 1], [0, 0, 1, 1], [1, 1, -3, 1],
+                       [0, 0, 0, 1]], dtype=float)
+    ends = np.array([[0, 0, 1, 1], [1, 0, -3, 1], [2, 2, -4, 1],
+                     [1, 1, 0, 1]], dtype=float)
+    with np.errstate(all='raise'):
+        new_starts, new_ends, visible = clip_segments_near(starts, ends)
+    assert visible.tolist() == [True, True, False, True]
+    for i in (0, 1):
+        # Clipping the segment as a two-point polygon keeps the same
+        # points, the crossing point twice
+        clipped = clip_polygon_near([starts[i].tolist(), ends[i].tolist()])
+        assert set(map(tuple, clipped)) == {tuple(new_starts[i].tolist()),
+                                            tuple(new_ends[i].tolist())}
@@ -0,0 +1,93 @@
+import csv
+import json
+
+import batch_render
+import profiler as profiler_module
+from objects.lights import PointLight
+from objects.primatives import Cube
+from profiler import Profiler
+from rendering.backends import NullBackend
+
+
+def record(profiler, frames):
+    # One frame per entry of {stage: milliseconds}
+    for stages in frames:
+        profiler.begin_frame()
+        for name, ms in stages.items():
+            profiler.add(name, ms * 1e6)
+        profiler.end_frame()
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    with profiler.scope('draw'):
+        pass
+    assert profiler.scope('draw') is profiler.scope('sort')
+    record(profiler, [{'draw': 1}])
+    assert not profiler.frames and profiler.frame_count == 0
+
+
+def test_nearest_rank_percentiles():
+    profiler = Profiler()
+    profiler.enabled = True
+    record(profiler, [{'draw': ms} for ms in range(1, 101)])
+    assert profiler.percentiles('draw') == [50, 95, 99]
+    # Frames where a stage didn't run count as 0
+    record(profiler, [{}] * 100)
+    assert profiler.percentiles('draw', (50, 75)) == [0, 50]
+    assert profiler.percentiles('missing') == [0, 0, 0]
+
+
+def test_ring_buffer_keeps_recent_frames():
+    profiler = Profiler(history=10)
+    profiler.enabled = True
+    record(profiler, [{'draw': ms} for ms in range(25)])
+    assert len(profiler.frames) == 10 and profiler.frame_count == 25
+    assert profiler.percentiles('draw', (0, 100)) == [15, 24]
+
+
+def test_scopes_in_one_frame_add_up():
+    profiler = Profiler()
+    profiler.enabled = True
+    profiler.begin_frame()
+    for _ in range(3):
+        with profiler.scope('transform'):
+            pass
+    profiler.add('transform', 1e6)
+    profiler.end_frame()
+    frame = profiler.frames[0]
+    assert frame['transform'] > 1e6
+    assert profiler.stages() == ['transform', 'frame']
+
+
+def test_export(tmp_path):
+    profiler = Profiler(history=2)
+    profiler.enabled = True
+    record(profiler, [{'sort': 1, 'draw': 2}, {'draw': 4}, {'sort': 3}])
+    profiler.export_json(tmp_path / 'trace.json')
+    profiler.export_csv(tmp_path / 'trace.csv')
+
+    trace = json.loads((tmp_path / 'trace.json').read_text())
+    assert [frame['index'] for frame in trace['frames']] == [1, 2]
+    assert trace['frames'][0]['draw'] == 4
+    assert trace['frames'][0]['sort'] == 0
+    assert trace['summary']['sort']['p99'] == 3
+    with open(tmp_path / 'trace.csv', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['index', 'draw_ms', 'sort_ms', 'frame_ms']
+    assert [row[0] for row in rows[1:]] == ['1', '2']
+
+
+def test_world_render_is_timed_by_stage(monkeypatch):
+    shared = profiler_module.profiler
+    monkeypatch.setattr(shared, 'enabled', True)
+    shared.reset()
+    app = batch_render.make_app(320, 240, NullBackend())
+    app.world.add_object(PointLight(10))
+    app.world.add_object(Cube())
+    shared.begin_frame()
+    app.world.render(app)
+    shared.end_frame()
+    assert {'transform', 'shading', 'sort', 'draw', 'frame'} <= \
+        set(shared.stages())
+    shared.reset()
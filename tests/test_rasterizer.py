@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import ImportedMesh
+from rendering.backends import RecordingBackend
+from rendering.rasterizer import Rasterizer, pack_rgba
+from rendering.triangle_buffer import FLAG_OUTLINE, TriangleBuffer
+
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+
+def add(buffer, points, depths, color, flags=0, opacity=100):
+    buffer.append(list(points), sum(depths) / 3, color, flags, opacity,
+                  list(depths))
+
+
+def pixel(color, x, y):
+    return tuple(color[y, x].tolist())
+
+
+@pytest.mark.parametrize('near_first', [True, False])
+def test_nearer_triangle_wins_in_either_order(near_first):
+    square = [0, 0, 40, 0, 0, 40]
+    triangles = [(square, [0.5] * 3, RED), (square, [0.2] * 3, BLUE)]
+    if near_first:
+        triangles.reverse()
+    buffer = TriangleBuffer()
+    for points, depths, color in triangles:
+        add(buffer, points, depths, color)
+    color = Rasterizer(40, 40).draw_buffer(buffer)
+    assert pixel(color, 5, 5) == BLUE + (255,)
+    assert pixel(color, 39, 39) == (0, 0, 0, 0)  # left transparent
+
+
+def test_intersecting_triangles_resolve_per_pixel():
+    # Two triangles over the same pixels whose depths cross in the middle
+    buffer = TriangleBuffer()
+    add(buffer, [0, 0, 100, 0, 0, 100], [0.1, 0.9, 0.1], RED)
+    add(buffer, [0, 0, 100, 0, 0, 100], [0.9, 0.1, 0.9], BLUE)
+    color = Rasterizer(100, 100).draw_buffer(buffer)
+    assert pixel(color, 10, 10)[:3] == RED
+    assert pixel(color, 80, 10)[:3] == BLUE
+
+
+def test_shared_edges_leave_no_gaps():
+    rasterizer = Rasterizer(37, 23)
+    tris = np.array([[[0, 0], [37, 0], [0, 23]],
+                     [[37, 0], [37, 23], [0, 23]]], dtype=float)
+    idx, z, tri = rasterizer.fragments(tris, np.zeros((2, 3)))
+    assert set(idx.tolist()) == set(range(37 * 23))
+    # Only pixels whose centers lie on the shared edge can be hit twice
+    assert len(idx) - 37 * 23 <= 1
+
+
+def test_translucent_triangles_blend_without_hiding_what_is_behind():
+    buffer = TriangleBuffer()
+    add(buffer, [0, 0, 20, 0, 0, 20], [0.1] * 3, RED, opacity=50)
+    add(buffer, [0, 0, 20, 0, 0, 20], [0.5] * 3, BLUE)
+    color = Rasterizer(20, 20).draw_buffer(buffer)
+    r, g, b, a = pixel(color, 2, 2)
+    assert 100 < r < 155 and 100 < b < 155 and a == 255
+
+
+def test_outlines_are_drawn_over_their_faces():
+    buffer = TriangleBuffer()
+    add(buffer, [2, 2, 30, 2, 2, 30], [0.5] * 3, RED, FLAG_OUTLINE)
+    color = Rasterizer(32, 32).draw_buffer(buffer)
+    assert pixel(color, 10, 2)[:3] == (255, 165, 0)
+    assert pixel(color, 8, 8)[:3] == RED
+
+
+def test_pack_rgba():
+    packed = pack_rgba(np.array([[1, 2, 3]], dtype=np.uint8))
+    assert packed.view(np.uint8).tolist() == [1, 2, 3, 255]
+
+
+def test_scene_is_one_image_whatever_the_triangle_count(model):
+    calls = []
+    for name in ('sphere.obj', 'teapot.obj'):
+        app = batch_render.make_app(320, 240, RecordingBackend())
+        app.use_rasterizer = True
+        app.world.add_object(PointLight(10))
+        app.world.add_object(ImportedMesh(model(name)))
+        app.world.render(app)
+        calls.append([kind for kind, args in app.backend.commands])
+    assert calls[0] == calls[1] == ['image']
@@ -0,0 +1,103 @@
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.mesh import Mesh
+from objects.primatives import Grid, ImportedMesh
+from rendering.backends import NullBackend
+
+
+@pytest.fixture
+def app():
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.world.add_object(PointLight(10, 3, 4, -5))
+    app.transform_mode = 'move'
+    app.axis_constraint = None
+    return app
+
+
+@pytest.fixture
+def mesh(app, model):
+    mesh = ImportedMesh(model('suzanne.obj'))
+    app.world.add_object(mesh)
+    return mesh
+
+
+def count_projections(monkeypatch, obj):
+    calls = []
+    project = obj.project_vertices
+
+    def counted(app):
+        calls.append(1)
+        return project(app)
+    monkeypatch.setattr(obj, 'project_vertices', counted)
+    return calls
+
+
+def test_idle_frames_reuse_projection_and_triangles(app, mesh, monkeypatch):
+    calls = count_projections(monkeypatch, mesh)
+    app.world.render(app)
+    triangles = mesh._triangles
+    for _ in range(3):
+        app.world.render(app)
+    assert len(calls) == 1
+    assert mesh._triangles is triangles
+
+
+@pytest.mark.parametrize('change', [
+    lambda app, mesh: app.camera.orbit(10, 0),
+    lambda app, mesh: app.camera.pan(5, 5),
+    lambda app, mesh: app.camera.zoom(app, 10),
+    lambda app, mesh: setattr(app, 'is_ortho', True),
+    lambda app, mesh: setattr(app, 'width', 800),
+    lambda app, mesh: mesh.apply_translation([1, 0, 0]),
+    lambda app, mesh: mesh.apply_rotation(0.3, [0, 1, 0]),
+    lambda app, mesh: mesh.apply_scaling([2, 2, 2]),
+])
+def test_changes_upstream_reproject(app, mesh, monkeypatch, change):
+    calls = count_projections(monkeypatch, mesh)
+    app.world.render(app)
+    before = mesh.screen_coords
+    change(app, mesh)
+    app.world.render(app)
+    assert len(calls) == 2
+    assert mesh.screen_coords != before
+
+
+def test_vertex_edit_reprojects_and_rebuilds_triangles(app, mesh):
+    app.world.render(app)
+    edits = Mesh.edits
+    points = list(app.world.triangles.points)
+
+    app.edit_mode = True
+    app.selected_object = mesh
+    mesh.selected_vertex = 5
+    before = mesh.screen_coords[5]
+    mesh.transform(app, 20, -10)
+    assert Mesh.edits > edits
+    app.world.render(app)
+    assert mesh.screen_coords[5] != before
+    assert app.world.triangles.points != points
+
+
+def test_grid_reprojects_only_when_camera_moves(app, monkeypatch):
+    grid = Grid(size=5)
+    app.world.add_object(grid)
+    calls = count_projections(monkeypatch, grid)
+    app.world.render(app)
+    app.world.render(app)
+    assert len(calls) == 1
+    app.camera.orbit(20, 0)
+    app.world.render(app)
+    assert len(calls) == 2
+
+
+def test_camera_version_bumps_on_every_change(app):
+    camera = app.camera
+    for change in (lambda: camera.move(1, 0, 0),
+                   lambda: camera.resize(800, 600),
+                   lambda: camera.lookAt([0, 0, -5], [0, 0, 0], [0, 1, 0]),
+                   lambda: camera.orbit(5, 5)):
+        version = camera.version
+        change()
+        assert camera.version > version
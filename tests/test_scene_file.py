@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pytest
+
+import batch_render
+import scene_file as scene_file_module
+from objects.gizmo import Gizmo
+from objects.lights import PointLight
+from objects.primatives import CubeArray, Grid, ImportedMesh
+from rendering.backends import NullBackend
+from scene_file import SceneFile
+
+
+def make_app():
+    return batch_render.make_app(320, 240, NullBackend())
+
+
+@pytest.fixture
+def scene(model):
+    # A grid, a light, two meshes sharing geometry, one of them moved, an
+    # edited copy and a block of instanced cubes
+    app = make_app()
+    app.world.add_object(Grid(size=5))
+    app.world.add_object(PointLight(10, 1, 2, 3))
+    for i in range(2):
+        mesh = ImportedMesh(model('suzanne.obj'))
+        mesh.apply_translation([i, 0, 0])
+        app.world.add_object(mesh)
+    edited = ImportedMesh(model('sphere.obj'))
+    edited.make_geometry_private()
+    edited.vertices[0][1] += 0.5
+    edited.mark_geometry_dirty()
+    app.world.add_object(edited)
+    cubes = CubeArray((2, 2, 2))
+    cubes.set_instance_transform(1, np.diag([2, 2, 2, 1]))
+    app.world.add_object(cubes)
+    app.world.add_object(Gizmo())
+    app.camera.orbit(30, 5)
+    app.is_ortho = True
+    return app
+
+
+def summary(app):
+    # What a scene file should bring back, object by object
+    objects = []
+    for obj in app.world.objects:
+        entry = [type(obj).__name__]
+        if isinstance(obj, PointLight):
+            entry.append(obj.position())
+        elif hasattr(obj, 'transform_matrix'):
+            entry += [np.asarray(obj.vertices, dtype=float).tolist(),
+                      np.asarray(obj.indices).tolist(),
+                      np.asarray(obj.transform_matrix).tolist(),
+                      getattr(obj, 'name', None), obj.is_editable]
+            if isinstance(obj, CubeArray):
+                entry.append(obj.instance_transforms.tolist())
+        objects.append(entry)
+    camera = app.camera
+    return objects, (camera.target, camera.azimuth, camera.elevation,
+                     camera.radius, app.is_ortho)
+
+
+def test_round_trip(scene, tmp_path):
+    path = str(tmp_path / 'scene.pyprism')
+    assert SceneFile(path).save(scene) > 0
+
+    opened = make_app()
+    SceneFile(path).load(opened)
+    assert summary(opened) == summary(scene)
+
+    # Meshes that shared geometry share it again, and are copied on edit
+    meshes = [obj for obj in opened.world.objects
+              if type(obj) is ImportedMesh]
+    assert meshes[0].asset is meshes[1].asset is not None
+    assert meshes[2].asset is not None
+    assert type(opened.world.objects[0]) is Grid
+
+
+def test_save_again_appends_only_changes(scene, tmp_path):
+    path = str(tmp_path / 'scene.pyprism')
+    scene_file = SceneFile(path)
+    first = scene_file.save(scene)
+    size = os.path.getsize(path)
+
+    mesh = next(obj for obj in scene.world.objects
+                if type(obj) is ImportedMesh)
+    mesh.apply_translation([0, 1, 0])
+    moved = scene_file.save(scene)
+    assert moved < first / 10
+    assert os.path.getsize(path) < 2 * size
+
+    opened = make_app()
+    SceneFile(path).load(opened)
+    assert summary(opened) == summary(scene)
+
+
+def test_saving_opened_scene(scene, tmp_path):
+    # Saving the scene opened from a file rewrites nothing that is there
+    path = str(tmp_path / 'scene.pyprism')
+    SceneFile(path).save(scene)
+    opened = make_app()
+    scene_file = SceneFile(path)
+    scene_file.load(opened)
+    assert scene_file.save(opened) < os.path.getsize(path) / 10
+
+    again = make_app()
+    SceneFile(path).load(again)
+    assert summary(again) == summary(scene)
+
+
+def test_rewrite_over_opened_file(scene, tmp_path, monkeypatch):
+    # Rewriting the file the scene was opened from leaves the meshes
+    # reading from it intact
+    monkeypatch.setattr(scene_file_module, 'COMPACT_FRACTION', -1)
+    path = str(tmp_path / 'scene.pyprism')
+    SceneFile(path).save(scene)
+    opened = make_app()
+    scene_file = SceneFile(path)
+    scene_file.load(opened)
+    expected = summary(opened)
+    assert scene_file.save(opened) >= os.path.getsize(path) / 2
+    assert summary(opened) == expected
+
+    again = make_app()
+    SceneFile(path).load(again)
+    assert summary(again) == expected
+
+
+def test_rejects_other_files(tmp_path, model):
+    with pytest.raises(ValueError):
+        SceneFile(model('sphere.obj')).load(make_app())
+    path = tmp_path / 'short.pyprism'
+    path.write_bytes(b'PPSC')
+    with pytest.raises(ValueError):
+        SceneFile(str(path)).load(make_app())
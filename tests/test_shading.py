@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import Cube, ImportedMesh
+from rendering.backends import NullBackend
+from rendering.shading import Lambertian, gray
+from rendering.triangle_buffer import palette
+
+
+@pytest.fixture
+def app():
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.world.add_object(PointLight(10, 3, 4, -5))
+    return app
+
+
+def test_batched_shading_matches_per_face():
+    rng = np.random.default_rng(0)
+    normals = rng.normal(size=(200, 3))
+    normals[0] = 0  # degenerate face
+    light = [1, -2, 0.5]
+    model = Lambertian()
+    assert model.shade_faces(normals, light) == \
+        [model.shade(n, light) for n in normals.tolist()]
+    assert model.shade_faces(normals[:3].tolist(), light) == \
+        model.shade_faces(normals[:3], light)
+
+
+def test_colors_are_shared():
+    assert gray(100) is gray(100)
+    colors = Lambertian().shade_faces(np.ones((5, 3)), [1, 1, 1])
+    assert all(color is colors[0] for color in colors)
+
+
+def test_world_normals_follow_rotation_and_scale(model):
+    mesh = ImportedMesh(model('suzanne.obj'))
+    mesh.apply_rotation(0.8, [1, 2, 0])
+    mesh.apply_scaling([3, 1, 0.5])
+    normals = mesh.world_face_normals()
+
+    # Normals stay perpendicular to the transformed triangles' edges
+    matrix = np.array(mesh.transform_matrix, dtype=float)
+    points = (np.asarray(mesh.vertices, dtype=float) @ matrix.T)[:, :3]
+    tri = points[np.asarray(mesh.indices, dtype=np.intp).reshape(-1, 3)]
+    for edge in (tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0]):
+        cosine = np.einsum('ij,ij->i', normals, edge) / (
+            np.linalg.norm(normals, axis=1) * np.linalg.norm(edge, axis=1))
+        np.testing.assert_allclose(cosine, 0, atol=1e-9)
+
+
+def test_rotated_cube_is_shaded_by_rotated_normals(app):
+    cube = Cube(2)
+    app.world.add_object(cube)
+    light = app.world.get_light_direction()
+    cube.apply_rotation(2.5, [0, 1, 0])
+    rotation = np.array(cube.transform_matrix, dtype=float)[:3, :3]
+    expected = Lambertian().shade_faces(
+        np.asarray(cube.face_normals(), dtype=float) @ rotation.T, light)
+    assert [palette[c] for c in cube.face_colors(app)] == expected
+    assert len(set(expected)) > 1
+
+
+def test_normals_only_recomputed_after_geometry_edits(app):
+    cube = Cube(2)
+    app.world.add_object(cube)
+    normals = cube.face_normals()
+    cube.apply_rotation(0.5, [0, 1, 0])
+    cube.apply_translation([1, 0, 0])
+    assert cube.face_normals() is normals
+
+    colors = cube.face_colors(app)
+    assert cube.face_colors(app) is colors
+    cube.vertices[0] = [-3, -3, 3, 1]
+    cube.mark_geometry_dirty()
+    assert cube.face_normals() is not normals
+    assert cube.face_colors(app) is not colors
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import Cube, ImportedMesh
+from rendering.backends import NullBackend
+from rendering.rasterizer import Rasterizer
+from rendering.tiled_rasterizer import TiledRasterizer, bin_triangles
+from rendering.triangle_buffer import TriangleBuffer
+
+
+@pytest.fixture
+def scene_buffer(model):
+    # The triangles of a teapot and an outlined cube, as the world hands
+    # them to the rasterizer
+    app = batch_render.make_app(300, 200, NullBackend())
+    app.use_rasterizer = True
+    app.world.add_object(PointLight(10))
+    app.world.add_object(ImportedMesh(model('teapot.obj')))
+    cube = Cube(2)
+    cube.apply_translation([1, 0, 0])
+    app.world.add_object(cube)
+    app.selected_object = cube
+    app.world.render(app)
+    return app.world.triangles
+
+
+@pytest.mark.parametrize('tile_size', [16, 50, 128, 512])
+def test_tiles_match_single_process(scene_buffer, tile_size):
+    expected = Rasterizer(300, 200)
+    expected.draw_buffer(scene_buffer)
+    tiled = TiledRasterizer(300, 200, tile_size=tile_size, workers=2)
+    try:
+        tiled.draw_buffer(scene_buffer)
+        assert np.array_equal(tiled.color, expected.color)
+        assert np.array_equal(tiled.depth, expected.depth)
+        assert tiled.color.any()
+    finally:
+        tiled.close()
+
+
+def test_resize_and_empty_frame():
+    tiled = TiledRasterizer(64, 64, tile_size=32, workers=1)
+    try:
+        tiled.resize(100, 30)
+        color = tiled.draw_buffer(TriangleBuffer())
+        assert color.shape == (30, 100, 4) and not color.any()
+    finally:
+        tiled.close()
+
+
+def test_triangles_are_binned_into_every_tile_they_overlap():
+    tris = np.array([[[5, 5], [60, 5], [5, 20]],       # tiles 0 and 1
+                     [[-50, -50], [-40, -50], [-50, -40]],  # off screen
+                     [[70, 40], [90, 40], [70, 60]]], dtype=np.float32)
+    tiles, members = bin_triangles(tris, 100, 64, 32)
+    binned = {(x0, y0): members[start:end].tolist()
+              for x0, y0, x1, y1, start, end in tiles}
+    assert binned == {(0, 0): [0], (32, 0): [0], (64, 32): [2]}
+    assert (96, 32, 100, 64) not in [tile[:4] for tile in tiles]
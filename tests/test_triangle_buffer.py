@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import Cube
+from rendering.backends import RecordingBackend
+from rendering.triangle_buffer import (FLAG_EDITABLE, FLAG_OUTLINE,
+                                       TriangleBuffer, color_id, palette,
+                                       palette_rgb)
+
+
+def test_columns_line_up():
+    buffer = TriangleBuffer()
+    buffer.append([0, 0, 1, 0, 0, 1], 0.5, 'white', FLAG_OUTLINE, 80)
+    buffer.extend([[0, 0, 2, 0, 0, 2]] * 2, [0.1, 0.9], [color_id('red')] * 2,
+                  FLAG_EDITABLE, vertex_depths=[[0.1] * 3, [0.9] * 3])
+    assert len(buffer) == 3
+    assert buffer.flags == [FLAG_OUTLINE, FLAG_EDITABLE, FLAG_EDITABLE]
+    assert buffer.opacities == [80, 100, 100]
+    assert buffer.vertex_depths == [None, [0.1] * 3, [0.9] * 3]
+    assert palette[buffer.color_ids[0]] == 'white'
+    buffer.clear()
+    assert len(buffer) == 0 and not buffer.points
+
+
+def test_palette_ids_are_reused():
+    first = color_id((1, 2, 3))
+    assert color_id((1, 2, 3)) == first
+    assert palette_rgb()[first].tolist() == [1, 2, 3]
+    orange = color_id('orange')
+    assert palette_rgb()[orange].tolist() == [255, 165, 0]
+
+
+def test_back_to_front_is_a_stable_sort():
+    buffer = TriangleBuffer()
+    depths = [0.3, 0.9, 0.3, 0.1, 0.9]
+    buffer.extend([[0] * 6] * len(depths), depths, [0] * len(depths))
+    assert buffer.back_to_front() == [1, 4, 0, 2, 3]
+    order = np.random.default_rng(0).uniform(size=1000)
+    buffer.clear()
+    buffer.extend([[0] * 6] * 1000, order.tolist(), [0] * 1000)
+    assert buffer.back_to_front() == sorted(
+        range(1000), key=lambda i: -order[i])
+
+
+@pytest.mark.parametrize('edit_mode', [False, True])
+def test_world_draws_far_triangles_first(edit_mode):
+    app = batch_render.make_app(320, 240, RecordingBackend())
+    app.edit_mode = edit_mode
+    app.world.add_object(PointLight(10, 3, 4, -5))
+    near, far = Cube(1), Cube(1)
+    near.apply_translation([0.3, 0, 2])  # the camera is on the +z side
+    far.apply_translation([0, 0, -2])
+    app.world.add_object(near)
+    app.world.add_object(far)
+    app.selected_object = near
+    app.world.render(app)
+
+    buffer = app.world.triangles
+    polygons = [args for kind, args in app.backend.commands
+                if kind == 'polygon']
+    order = buffer.back_to_front()
+    assert len(polygons) == len(buffer) >= 4
+    depths = [buffer.depths[i] for i in order]
+    assert depths == sorted(depths, reverse=True)
+    for args, i in zip(polygons, order):
+        assert args['points'] == buffer.points[i]
+    # The selected mesh is outlined in object mode, translucent in edit mode
+    outlined = [args['border'] == 'orange' for args in polygons]
+    assert any(outlined) != edit_mode
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.mesh import VERTEX_TIE_DISTANCE
+from objects.primatives import ImportedMesh
+from objects.vertex_grid import VertexGrid
+from rendering.backends import NullBackend
+
+
+def brute_force(screen, x, y, radius, tie_distance=0.0):
+    # The per-vertex loop the grid replaces
+    distance = np.hypot(screen[:, 0] - x, screen[:, 1] - y)
+    inside = np.nonzero(distance < radius)[0]
+    if not len(inside):
+        return None
+    tied = inside[distance[inside] <= distance[inside].min() + tie_distance]
+    return int(tied[np.argmin(screen[tied, 2])])
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(0)
+    screen = np.column_stack([rng.uniform(-20, 300, (500, 2)),
+                              rng.uniform(0, 1, 500)])
+    grid = VertexGrid(screen)
+    for x, y in rng.uniform(-30, 310, (300, 2)).tolist():
+        for radius in (3, 5, 20):
+            assert grid.nearest(x, y, radius) == \
+                brute_force(screen, x, y, radius)
+
+
+def test_nothing_within_radius():
+    grid = VertexGrid(np.array([[10.0, 10.0, 0.5]]))
+    assert grid.nearest(10, 16, 5) is None
+    assert grid.nearest(10, 14.9, 5) == 0
+    assert VertexGrid(np.zeros((0, 3))).nearest(0, 0, 5) is None
+
+
+def test_tie_goes_to_the_vertex_in_front():
+    # Two vertices about as far from the mouse, the second one nearer the
+    # camera
+    screen = np.array([[100.0, 100.0, 0.9], [100.5, 100.0, 0.2],
+                       [104.0, 100.0, 0.1]])
+    grid = VertexGrid(screen)
+    assert grid.nearest(99.9, 100, 5) == 0
+    assert grid.nearest(99.9, 100, 5, tie_distance=1) == 1
+
+
+def test_invalid_and_far_off_points_are_left_out():
+    screen = np.array([[10.0, 10.0, 0.5], [11.0, 10.0, 0.1],
+                       [np.nan, 10.0, 0.0], [1e9, 1e9, 0.0]])
+    grid = VertexGrid(screen, valid=np.array([True, False, True, True]))
+    assert grid.ids.tolist() == [0]
+    assert grid.nearest(11, 10, 5) == 0
+
+
+@pytest.mark.parametrize('edit_mode', [False, True])
+def test_mesh_vertex_pick_matches_the_loop(model, edit_mode):
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.lod_pixel_error = 0
+    app.edit_mode = edit_mode
+    app.world.add_object(PointLight(10))
+    mesh = ImportedMesh(model('suzanne.obj'))
+    app.world.add_object(mesh)
+    app.world.render(app)
+    screen = np.asarray(mesh.screen_array)
+    for x, y in screen[::7, :2].tolist():
+        assert mesh.nearest_vertex(x + 1, y, 5) == \
+            brute_force(screen, x + 1, y, 5, VERTEX_TIE_DISTANCE)
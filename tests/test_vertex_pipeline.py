@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import batch_render
+from objects.lights import PointLight
+from objects.primatives import Cube, ImportedMesh
+from rendering.backends import NullBackend
+from rendering.triangle_buffer import TriangleBuffer
+
+
+@pytest.fixture
+def app():
+    app = batch_render.make_app(640, 480, NullBackend())
+    app.lod_pixel_error = 0  # both paths draw every face
+    app.world.add_object(PointLight(10, 3, 4, -5))
+    app.camera.orbit(40, 20)
+    return app
+
+
+def render(app, mesh, use_numpy):
+    mesh.use_numpy = use_numpy
+    buffer = TriangleBuffer()
+    mesh.render(app, buffer)
+    return buffer
+
+
+def assert_same_triangles(a, b):
+    assert len(a) == len(b) > 0
+    np.testing.assert_allclose(a.points, b.points)
+    np.testing.assert_allclose(a.depths, b.depths)
+    assert a.color_ids == b.color_ids
+
+
+@pytest.mark.parametrize('name', ['sphere.obj', 'suzanne.obj', 'teapot.obj'])
+def test_numpy_matches_pure_python(app, model, name):
+    mesh = ImportedMesh(model(name))
+    mesh.apply_rotation(0.6, [1, 1, 0])
+    mesh.apply_scaling([1.5, 1, 1])
+    fast = render(app, mesh, True)
+    fast_coords = mesh.screen_coords
+    # A fresh mesh so nothing cached by the NumPy path is reused
+    slow_mesh = ImportedMesh(model(name))
+    slow_mesh.transform_matrix = mesh.transform_matrix
+    slow = render(app, slow_mesh, False)
+
+    np.testing.assert_allclose(fast_coords, slow_mesh.screen_coords)
+    assert_same_triangles(fast, slow)
+
+
+def test_orthographic_matches_pure_python(app):
+    app.is_ortho = True
+    fast = render(app, Cube(2), True)
+    slow = render(app, Cube(2), False)
+    assert_same_triangles(fast, slow)
+
+
+def test_projection_matches_matrix_product(app):
+    cube = Cube(2)
+    cube.apply_translation([1, 2, 3])
+    cube.use_numpy = True
+    screen = cube.project_vertices(app)
+    clip = np.array(cube.vertices, dtype=float) @ (
+        np.array(app.camera.projection_view_matrix) @
+        np.array(cube.transform_matrix)).T
+    ndc = clip[:, :3] / clip[:, 3:]
+    np.testing.assert_allclose(screen[:, 0], (ndc[:, 0] + 1) * 320)
+    np.testing.assert_allclose(screen[:, 1], (1 - ndc[:, 1]) * 240)
+    np.testing.assert_allclose(screen[:, 2], ndc[:, 2])